@@ -0,0 +1,72 @@
+"""
+Go-live fan-out duration per 100k followers.
+
+The follower cursor and the database are replaced with in-process stand-ins, so this measures
+the engine itself: document building, chunking, BSON encoding of each insert_many batch
+(what the driver does before sending) and the rate limiter. Real runs add one round trip per
+page read and per chunk written.
+
+    python benchmarks/bench_fanout.py
+"""
+import time
+import uuid
+import asyncio
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.binary import UuidRepresentation
+
+from instalive_live_app.notifications import fanout as fanout_module
+from instalive_live_app.notifications.fanout import FanoutEngine
+from instalive_live_app.notifications.models import NotificationType
+
+FOLLOWERS = 100_000
+CODEC = CodecOptions(uuid_representation=UuidRepresentation.STANDARD)
+
+
+async def pages(host_id):
+    ids = [uuid.uuid4() for _ in range(FOLLOWERS)]
+    for i in range(0, len(ids), fanout_module.FANOUT_PAGE_SIZE):
+        yield ids[i:i + fanout_module.FANOUT_PAGE_SIZE]
+
+
+async def discard(docs):
+    pass
+
+
+async def encode(docs):
+    for doc in docs:
+        bson.encode(doc, codec_options=CODEC)
+
+
+async def run(writer, rate):
+    engine = FanoutEngine(page_source=pages, writer=writer, rate=rate)
+    return await engine.fan_out(
+        host_id=uuid.uuid4(),
+        followers_count=FOLLOWERS,
+        title="Live Now",
+        body="Someone you follow is live: Friday night stream",
+        type=NotificationType.LIVE,
+        related_entity_id=str(uuid.uuid4()),
+    )
+
+
+def main():
+    # Never switch to fan-out-on-read here; that path writes a single document
+    fanout_module.FANOUT_ON_READ_THRESHOLD = FOLLOWERS + 1
+    rows = [
+        ("build + chunk, unthrottled", discard, float("inf")),
+        ("build + bson encode, unthrottled", encode, float("inf")),
+        (f"build + bson encode @ {fanout_module.FANOUT_WRITES_PER_SECOND:.0f}/s", encode,
+         fanout_module.FANOUT_WRITES_PER_SECOND),
+    ]
+    print(f"{FOLLOWERS} followers, pages of {fanout_module.FANOUT_PAGE_SIZE}, chunks of {fanout_module.FANOUT_CHUNK_SIZE}")
+    for name, writer, rate in rows:
+        start = time.process_time()
+        result = asyncio.run(run(writer, rate))
+        cpu = time.process_time() - start
+        print(f"{name:<40}{result.written:>8} written{result.duration_seconds:>8.2f}s wall{cpu:>8.2f}s cpu")
+
+
+if __name__ == "__main__":
+    main()
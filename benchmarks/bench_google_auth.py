@@ -0,0 +1,71 @@
+"""
+Google login verification latency: blocking userinfo call vs the async verifier.
+
+Google is replaced by the in-process stub from tests/google_stub.py with a simulated
+round trip (GOOGLE_RTT seconds). "Blocking" runs the old pattern, a synchronous request
+on the event loop, so concurrent logins queue up behind each other.
+
+    python -m benchmarks.bench_google_auth
+"""
+import time
+import asyncio
+import statistics
+
+from instalive_live_app.users.utils.google_auth import GoogleTokenVerifier
+from tests.google_stub import GoogleStub, CLIENT_ID
+
+GOOGLE_RTT = 0.08
+CONCURRENT_LOGINS = 50
+
+
+def summarize(name, samples, wall):
+    samples = sorted(samples)
+    p50 = statistics.median(samples) * 1000
+    p99 = samples[int(len(samples) * 0.99) - 1] * 1000
+    print(f"{name:<36}{p50:>10.2f}{p99:>10.2f}{wall * 1000:>12.1f}")
+
+
+async def timed(coro, start=None):
+    """Latency as a user sees it: from when the burst of logins arrived until this one finished."""
+    start = time.perf_counter() if start is None else start
+    await coro
+    return time.perf_counter() - start
+
+
+async def main():
+    stub = GoogleStub(latency=GOOGLE_RTT)
+    for i in range(CONCURRENT_LOGINS):
+        stub.add_access_token(f"token-{i}", f"user{i}@example.com")
+    id_tokens = [stub.id_token(f"user{i}@example.com") for i in range(CONCURRENT_LOGINS)]
+
+    async def blocking_login(i):
+        # time.sleep stands in for requests.get: the loop can't serve anyone else meanwhile
+        time.sleep(GOOGLE_RTT)
+
+    print(f"{CONCURRENT_LOGINS} concurrent logins, simulated Google RTT {GOOGLE_RTT * 1000:.0f} ms")
+    print(f"{'path':<36}{'p50 ms':>10}{'p99 ms':>10}{'wall ms':>12}")
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(*(timed(blocking_login(i), start) for i in range(CONCURRENT_LOGINS)))
+    summarize("blocking requests.get (old)", samples, time.perf_counter() - start)
+
+    verifier = GoogleTokenVerifier(client_ids=[CLIENT_ID], transport=stub.transport)
+    start = time.perf_counter()
+    samples = await asyncio.gather(*(timed(verifier.verify_access_token(f"token-{i}"), start) for i in range(CONCURRENT_LOGINS)))
+    summarize("access token, cold (async)", samples, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(*(timed(verifier.verify_access_token(f"token-{i}"), start) for i in range(CONCURRENT_LOGINS)))
+    summarize("access token, cached", samples, time.perf_counter() - start)
+
+    # First ID token pays for the JWKS fetch, the rest verify locally
+    await verifier.verify_id_token(id_tokens[0])
+    start = time.perf_counter()
+    samples = [await timed(verifier.verify_id_token(t)) for t in id_tokens]
+    summarize("id token, local JWKS verify", samples, time.perf_counter() - start)
+
+    await verifier.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
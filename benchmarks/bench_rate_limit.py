@@ -0,0 +1,69 @@
+"""
+Per-request overhead of RateLimitMiddleware, called directly as ASGI (no server, no HTTP parsing).
+
+Redis is left out so the numbers show the middleware's own cost; a limited route
+adds one EVAL round trip on top when Redis is up.
+
+    python benchmarks/bench_rate_limit.py
+"""
+import time
+import asyncio
+
+from jose import jwt
+
+from instalive_live_app.core import rate_limit
+from instalive_live_app.core.rate_limit import RateLimitMiddleware, RateLimiter, RateLimitRule
+
+REQUESTS = 50_000
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+def scope(path, headers=()):
+    return {"type": "http", "method": "POST", "path": path, "headers": list(headers), "client": ("10.0.0.1", 1234)}
+
+
+async def measure(handler, request_scope):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await handler(request_scope, receive, send)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+async def main():
+    async def no_redis():
+        return None
+    rate_limit.get_redis = no_redis
+    rate_limit.SECRET_KEY = "bench-secret"
+    # A bucket that never runs dry, so every request takes the allowed path
+    rules = [
+        RateLimitRule(name="ip", method="POST", path="/ip", capacity=10**9, period_seconds=1),
+        RateLimitRule(name="user", method="POST", path="/user", capacity=10**9, period_seconds=1, key="identity"),
+    ]
+    middleware = RateLimitMiddleware(app, rules=rules, limiter=RateLimiter())
+    token = jwt.encode({"sub": "user-1"}, "bench-secret", algorithm="HS256")
+
+    baseline = await measure(app, scope("/ip"))
+    print(f"{'path':<34}{'us/request':>12}{'overhead us':>14}")
+    for name, request_scope in [
+        ("no rule", scope("/other")),
+        ("ip rule, local bucket", scope("/ip")),
+        ("identity rule, local bucket", scope("/user", [(b"authorization", f"Bearer {token}".encode())])),
+    ]:
+        cost = await measure(middleware, request_scope)
+        print(f"{name:<34}{cost:>12.2f}{cost - baseline:>14.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
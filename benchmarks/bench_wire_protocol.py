@@ -0,0 +1,94 @@
+"""
+Bytes on the wire and CPU per 10k chat messages: JSON (old path) vs the encode-once frames.
+
+Old path: every recipient gets `websocket.send_json(data)`, i.e. one json.dumps per recipient,
+plus a json.loads of the Redis payload.
+New path: the Redis text is forwarded as-is to JSON clients, msgpack is encoded once per message.
+Compressed sizes approximate permessage-deflate with context takeover (one deflate stream per socket).
+
+    python benchmarks/bench_wire_protocol.py
+"""
+import json
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+from instalive_live_app.chating.utils.wire import OutboundFrame, msgpack
+
+N = 10_000
+RECIPIENTS = 2  # receiver + sender echo
+
+
+def make_payload(i: int) -> dict:
+    return {
+        "type": "message",
+        "id": str(uuid.uuid4()),
+        "sender_id": str(uuid.uuid4()),
+        "receiver_id": str(uuid.uuid4()),
+        "message": f"hey, are you joining the stream tonight? #{i}",
+        "image_url": None,
+        "replied_to_id": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "temp_id": f"tmp-{i}",
+        "reactions": [],
+    }
+
+
+def deflated_size(frames) -> int:
+    compressor = zlib.compressobj(wbits=-15)
+    total = 0
+    for frame in frames:
+        total += len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+
+def main():
+    payloads = [make_payload(i) for i in range(N)]
+    published = [json.dumps(p) for p in payloads]
+
+    # Old path: parse once, re-serialize per recipient
+    start = time.process_time()
+    old_frames = []
+    for raw in published:
+        data = json.loads(raw)
+        for _ in range(RECIPIENTS):
+            old_frames.append(json.dumps(data).encode())
+    old_cpu = time.process_time() - start
+
+    # New path, JSON clients: forward the published text
+    start = time.process_time()
+    json_frames = []
+    for raw in published:
+        frame = OutboundFrame(text=raw)
+        frame.payload  # routing still needs receiver/sender ids
+        for _ in range(RECIPIENTS):
+            json_frames.append(frame.text.encode())
+    json_cpu = time.process_time() - start
+
+    rows = [
+        ("json (per-recipient dumps)", old_frames[::RECIPIENTS], old_cpu),
+        ("json (encode once)", json_frames[::RECIPIENTS], json_cpu),
+    ]
+
+    if msgpack is not None:
+        start = time.process_time()
+        msgpack_frames = []
+        for raw in published:
+            frame = OutboundFrame(text=raw)
+            for _ in range(RECIPIENTS):
+                msgpack_frames.append(frame.binary)
+        msgpack_cpu = time.process_time() - start
+        rows.append(("msgpack (encode once)", msgpack_frames[::RECIPIENTS], msgpack_cpu))
+    else:
+        print("msgpack not installed; skipping binary path")
+
+    print(f"{N} messages, {RECIPIENTS} recipients each")
+    print(f"{'path':<28}{'raw bytes':>12}{'deflate bytes':>15}{'cpu ms':>10}")
+    for name, frames, cpu in rows:
+        raw_bytes = sum(len(f) for f in frames)
+        print(f"{name:<28}{raw_bytes:>12}{deflated_size(frames):>15}{cpu * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
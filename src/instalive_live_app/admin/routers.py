@@ -1,5 +1,5 @@
 from typing import List, Optional, Union
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, status, BackgroundTasks
 from instalive_live_app.users.utils.get_current_user import get_current_user
 from instalive_live_app.users.models.user_models import UserModel
 from instalive_live_app.users.models.moderator_models import ModeratorModel
@@ -12,8 +12,10 @@ from instalive_live_app.admin.schemas import (
 )
 from instalive_live_app.admin.utils import get_system_config, log_admin_action
 from datetime import datetime
-from instalive_live_app.finance.models.transaction import TransactionModel, TransactionReason
+from instalive_live_app.finance.models.transaction import TransactionModel, TransactionReason, APPLIED_TRANSACTIONS
 from instalive_live_app.finance.models.payout import PayoutRequestModel, PayoutStatus, PayoutConfigModel
+from instalive_live_app.core.retention import retention
+from instalive_live_app.streaming.utils.reconciler import stream_reconciler
 import calendar
 
 
@@ -196,6 +198,7 @@ async def get_revenue_trend(
         {
             "$match": {
                 "reason": TransactionReason.TOPUP,
+                **APPLIED_TRANSACTIONS,
                 "created_at": {
                     "$gte": start_date,
                     "$lte": end_date
@@ -247,7 +250,7 @@ async def get_finance_overview(
     # 1. Total Token Sales (USD)
     # Aggregate all TOPUP transactions
     sales_pipeline = [
-        {"$match": {"reason": TransactionReason.TOPUP}},
+        {"$match": {"reason": TransactionReason.TOPUP, **APPLIED_TRANSACTIONS}},
         {"$group": {"_id": None, "total_coins": {"$sum": "$amount"}}}
     ]
     sales_result = await TransactionModel.get_motor_collection().aggregate(sales_pipeline).to_list(length=1)
@@ -280,3 +283,50 @@ async def get_finance_overview(
         profit_margin_usd=profit_margin_usd,
         pending_payouts_usd=total_pending_usd
     )
+
+
+
+@router.get("/retention")
+async def get_retention_status(
+    current_user: Union[UserModel, ModeratorModel] = Depends(get_admin_or_moderator)
+):
+    """
+    Retention policies and the report of the last run (documents archived/deleted, bytes reclaimed).
+    """
+    return {
+        "policies": retention.policies,
+        "last_report": retention.last_report,
+    }
+
+
+@router.get("/streams/reconciler")
+async def get_reconciler_status(
+    current_user: Union[UserModel, ModeratorModel] = Depends(get_admin_or_moderator)
+):
+    """
+    Drift between stream status and LiveKit rooms: the last reconciliation run (orphaned
+    streams ended, streams resumed) and totals across runs.
+    """
+    return await stream_reconciler.status()
+
+
+@router.post("/retention/run", status_code=status.HTTP_202_ACCEPTED)
+async def run_retention(
+    background_tasks: BackgroundTasks,
+    current_user: Union[UserModel, ModeratorModel] = Depends(get_admin_or_moderator)
+):
+    """
+    Start a retention run now. Poll GET /admin/retention for the report.
+    """
+    if retention.is_running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Retention run already in progress")
+
+    background_tasks.add_task(retention.run)
+    await log_admin_action(
+        actor=current_user,
+        action="Started Retention Run",
+        target="Retention",
+        severity="Medium",
+        details=", ".join(p.collection for p in retention.policies if p.enabled)
+    )
+    return {"message": "Retention run started"}
@@ -1,8 +1,9 @@
 from uuid import UUID, uuid4
 from beanie import Link
 from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 from instalive_live_app.core.base.base import BaseCollection
 from instalive_live_app.users.models.user_models import UserModel
 
@@ -15,10 +16,51 @@ class ChatMessageModel(BaseCollection):
     receiver: Link[UserModel]
     message: Optional[str] = None
     image_url: Optional[str] = None
+    image_variants: Dict[str, str] = {}
     is_read: bool = False
     replied_to_id: Optional[UUID] = None
     reactions: List[Reaction] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Bumped on every change (new message, reaction, read receipt) so clients can sync since a cursor
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     class Settings:
         name = "chat_messages"
+        indexes = [
+            IndexModel([("receiver.$id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("sender.$id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)]),
+        ]
+
+    @classmethod
+    async def set_reaction(cls, message_id: UUID, user_id: str, emoji: str) -> Optional[Tuple[str, str]]:
+        """
+        Atomically replace the user's reaction on a message.
+        Returns (sender_id, receiver_id) of the message, or None if it doesn't exist.
+        """
+        # Single pipeline update: drop any previous reaction by this user and append the new one.
+        # Only the link ids are projected back, so no user documents are loaded.
+        doc = await cls.get_motor_collection().find_one_and_update(
+            {"_id": message_id},
+            [
+                {
+                    "$set": {
+                        "reactions": {
+                            "$concatArrays": [
+                                {
+                                    "$filter": {
+                                        "input": {"$ifNull": ["$reactions", []]},
+                                        "cond": {"$ne": ["$$this.user_id", user_id]}
+                                    }
+                                },
+                                [{"user_id": user_id, "emoji": emoji}]
+                            ]
+                        },
+                        "updated_at": datetime.now(timezone.utc)
+                    }
+                }
+            ],
+            projection={"sender": 1, "receiver": 1}
+        )
+        if not doc:
+            return None
+        return str(doc["sender"].id), str(doc["receiver"].id)
@@ -1,127 +1,63 @@
-import json
-import os
-import uuid
-import asyncio
 import logging
-from typing import List, Dict, Optional
+from datetime import datetime, timezone
+from typing import List, Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File, Request, status
 from instalive_live_app.users.utils.get_current_user import get_current_user, get_ws_current_user
 from instalive_live_app.users.models.user_models import UserModel
 from instalive_live_app.users.schemas.user_schemas import UserResponse
 from instalive_live_app.chating.models.chat_model import ChatMessageModel
-from instalive_live_app.chating.schemas.chat import ChatMessageResponse, ConversationResponse
+from instalive_live_app.chating.schemas.chat import ChatMessageResponse, ConversationResponse, SyncResponse
+from instalive_live_app.chating.utils.sync_cursor import encode_cursor, decode_cursor, sync_query, SYNC_SORT
 from instalive_live_app.users.utils.populate_kyc import populate_user_kyc
+from instalive_live_app.chating.utils.presence import presence, hydrate_online_users
+from instalive_live_app.chating.utils.connection_manager import manager
+from instalive_live_app.chating.utils.wire import decode_frame
+from instalive_live_app.notifications.push import deliver_pending, acknowledge, NOTIFICATION_ACK
+from instalive_live_app.core.rate_limit import FrameLimiter
+from instalive_live_app.core.uploads import save_upload, CHAT_IMAGE_TYPES
+from instalive_live_app.core import blob_store
+from instalive_live_app.core.image_variants import image_variants
 from beanie.operators import Or, And
-import redis.asyncio as redis
 
 logger = logging.getLogger(__name__)
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
-
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
-# WebSocket Connection Manager with Redis Pub/Sub
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.redis: Optional[redis.Redis] = None
-        self.pubsub_task: Optional[asyncio.Task] = None
-
-    async def ensure_redis(self):
-        if not self.redis:
-            try:
-                self.redis = redis.from_url(REDIS_URL, decode_responses=True)
-                # Test connection
-                await self.redis.ping()
-                self.pubsub_task = asyncio.create_task(self._listen_to_redis())
-                logger.info("Connected to Redis for Chat Pub/Sub")
-            except Exception as e:
-                logger.warning(f"Failed to connect to Redis: {e}. Falling back to local-only chat.")
-                self.redis = None
-
-    async def _listen_to_redis(self):
-        ps = self.redis.pubsub()
-        await ps.subscribe("chat_updates")
-        try:
-            async for message in ps.listen():
-                if message["type"] == "message":
-                    data = json.loads(message["data"])
-                    receiver_id = data.get("receiver_id")
-                    if receiver_id and receiver_id in self.active_connections:
-                        await self.active_connections[receiver_id].send_json(data)
-                    
-                    # Also send to sender so they get the real ID (fix for reaction sync)
-                    sender_id = data.get("sender_id")
-                    if sender_id and sender_id != receiver_id and sender_id in self.active_connections:
-                        await self.active_connections[sender_id].send_json(data)
-        except Exception as e:
-            logger.error(f"Redis PubSub Error: {e}")
-        finally:
-            await ps.unsubscribe("chat_updates")
-
-    async def connect(self, user_id: str, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-        await self.ensure_redis()
-
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-
-    async def broadcast_to_redis(self, message: dict):
-        if self.redis:
-            await self.redis.publish("chat_updates", json.dumps(message))
-        else:
-            # Fallback for local-only if Redis is missing
-            receiver_id = message.get("receiver_id")
-            # If we are in local mode, we need to send to the target receiver
-            if receiver_id in self.active_connections:
-                try:
-                    await self.active_connections[receiver_id].send_json(message)
-                except Exception as e:
-                    logger.error(f"Local Send Error (Receiver): {e}")
-            
-            # ALSO SEND TO SENDER (Echo for ID sync)
-            sender_id = message.get("sender_id")
-            if sender_id and sender_id != receiver_id and sender_id in self.active_connections:
-                try:
-                    await self.active_connections[sender_id].send_json(message)
-                except Exception as e:
-                    logger.error(f"Local Send Error (Sender): {e}")
-
-    async def send_personal_message(self, message: dict, receiver_id: str):
-        # Add receiver_id to message so broadcast_to_redis handles routing
-        message["receiver_id"] = receiver_id
-        await self.broadcast_to_redis(message)
-
-manager = ConnectionManager()
-
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket, current_user: UserModel = Depends(get_ws_current_user)):
     user_id = str(current_user.id)
-    await manager.connect(user_id, websocket)
-    
-    # Heartbeat task
-    async def heartbeat():
-        try:
-            while True:
-                await asyncio.sleep(30)
-                await websocket.send_json({"type": "ping"})
-        except Exception:
-            pass
+    connection = await manager.connect(user_id, websocket)
+    await presence.touch([user_id])
+    try:
+        await deliver_pending(current_user.id, connection)
+    except Exception as e:
+        logger.error(f"Pending notification delivery failed for user {user_id}: {e}")
 
-    heartbeat_task = asyncio.create_task(heartbeat())
-    
+    frames = FrameLimiter()
+    # Pings are sent by the shared HeartbeatScheduler; any inbound frame counts as a pong
     try:
         while True:
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            # Text frames carry JSON, binary frames carry msgpack
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            connection.mark_alive()
+            # Over-limit frames are dropped before any decoding or database work
+            if not frames.allow():
+                continue
+            message_data = decode_frame(frame)
+            if not message_data:
+                continue
             
             msg_type = message_data.get("type", "message")
             
             if msg_type == "pong":
                 continue
+
+            if msg_type == NOTIFICATION_ACK:
+                await acknowledge(current_user.id, message_data.get("ids") or [])
+                continue
                 
             receiver_id = message_data.get("receiver_id")
             if not receiver_id:
@@ -139,6 +75,13 @@ async def websocket_endpoint(websocket: WebSocket, current_user: UserModel = Dep
 
                 if current_user and receiver:
                     print(f"DEBUG: Processing message from {user_id} to {receiver_id}: {text}") # DEBUG LOG
+                    # Only an image this sender uploaded through /chat/upload-image, once per upload;
+                    # the message owns that reference
+                    if image_url and not await blob_store.claim(image_url, current_user.id):
+                        await connection.send_json({
+                            "type": "error", "temp_id": temp_id, "detail": "Upload the image before sending it",
+                        })
+                        continue
                     replied_to_uuid = None
                     if replied_to_id:
                         try:
@@ -151,6 +94,8 @@ async def websocket_endpoint(websocket: WebSocket, current_user: UserModel = Dep
                         receiver=receiver.to_ref(),
                         message=text,
                         image_url=image_url,
+                        # Rendered when the image was uploaded through /chat/upload-image
+                        image_variants=await image_variants.existing(image_url),
                         replied_to_id=replied_to_uuid
                     )
                     await chat_msg.insert()
@@ -164,6 +109,7 @@ async def websocket_endpoint(websocket: WebSocket, current_user: UserModel = Dep
                         "receiver_id": receiver_id,
                         "message": text,
                         "image_url": image_url,
+                        "image_variants": chat_msg.image_variants,
                         "replied_to_id": str(chat_msg.replied_to_id) if chat_msg.replied_to_id else None,
                         "created_at": chat_msg.created_at.isoformat(),
                         "temp_id": temp_id, # Echo back to client
@@ -188,55 +134,42 @@ async def websocket_endpoint(websocket: WebSocket, current_user: UserModel = Dep
                     print(f"DEBUG: Ignored reaction on invalid/temp UUID: {message_id}") # DEBUG LOG
                     continue
                 
-                # Fetch the message with links to get sender and receiver IDs
-                chat_msg = await ChatMessageModel.get(uuid_message_id, fetch_links=True)
-                if chat_msg:
-                    # Remove existing reaction from this user if any
-                    chat_msg.reactions = [r for r in chat_msg.reactions if r.user_id != user_id]
-                    # Add new reaction
-                    from instalive_live_app.chating.models.chat_model import Reaction
-                    chat_msg.reactions.append(Reaction(user_id=user_id, emoji=emoji))
-                    await chat_msg.save()
-
-                    # Determine who to send the reaction to
+                # Atomic set/replace of this user's reaction; returns the routing ids without fetching links
+                participants = await ChatMessageModel.set_reaction(uuid_message_id, user_id, emoji)
+                if participants:
                     # The reaction should go to both the sender and receiver of the original message
-                    msg_sender_id = str(chat_msg.sender.id)
-                    msg_receiver_id = str(chat_msg.receiver.id)
-                    
+                    msg_sender_id, msg_receiver_id = participants
+
                     payload = {
                         "type": "reaction",
                         "message_id": message_id,
                         "user_id": user_id,
                         "emoji": emoji,
                     }
-                    
+
                     # Send to the sender of the original message
                     await manager.broadcast_to_redis({**payload, "receiver_id": msg_sender_id})
                     # Send to the receiver of the original message
                     await manager.broadcast_to_redis({**payload, "receiver_id": msg_receiver_id})
 
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        pass
     except Exception as e:
         logger.error(f"WebSocket Loop Error for user {user_id}: {e}")
-        manager.disconnect(user_id)
     finally:
-        heartbeat_task.cancel()
+        # Only clear presence if this socket was still the user's registered connection
+        if manager.disconnect(user_id, connection):
+            await presence.remove(user_id)
 
 @router.get("/active-users", response_model=List[UserResponse])
-async def get_active_users(current_user: UserModel = Depends(get_current_user)):
-    """List of users currently active in chat"""
-    active_ids = list(manager.active_connections.keys())
-    
-    # Retrieve other users from the database except the current user
-    # Can be converted to UUID for Beanie 'in' query or using a loop
-    users = []
-    for uid in active_ids:
-        if uid != str(current_user.id):
-            user = await UserModel.get(uuid.UUID(uid))
-            if user:
-                users.append(user)
-    return users
+async def get_active_users(skip: int = 0, limit: int = 50, current_user: UserModel = Depends(get_current_user)):
+    """List of users currently active in chat (across all instances)"""
+    # Fetch one extra id in case the current user is on this page
+    online_ids = await presence.online_ids(skip=skip, limit=limit + 1)
+    online_ids = [uid for uid in online_ids if uid != str(current_user.id)][:limit]
+
+    # Single $in query for all profiles
+    return await hydrate_online_users(online_ids)
 
 @router.get("/history/{receiver_id}", response_model=List[ChatMessageResponse])
 async def get_chat_history(receiver_id: str, skip: int = 0, limit: int = 50, current_user: UserModel = Depends(get_current_user)):
@@ -319,7 +252,10 @@ async def get_conversations(current_user: UserModel = Depends(get_current_user))
     ]
     
     results = await ChatMessageModel.aggregate(pipeline).to_list()
-    
+
+    # Online status comes from the presence service, not the stored user document
+    online_ids = set(await presence.filter_online(str(res["user_info"]["_id"]) for res in results))
+
     conversations = []
     for res in results:
         user_info = res["user_info"]
@@ -330,16 +266,60 @@ async def get_conversations(current_user: UserModel = Depends(get_current_user))
                 "first_name": user_info.get("first_name"),
                 "last_name": user_info.get("last_name"),
                 "profile_image": user_info.get("profile_image"),
-                "is_online": user_info.get("is_online", False)
+                "profile_image_variants": user_info.get("profile_image_variants") or {},
+                "is_online": str(user_info["_id"]) in online_ids
             },
             "last_message": last_msg.get("message"),
             "last_image_url": last_msg.get("image_url"),
+            "last_image_variants": last_msg.get("image_variants") or {},
             "created_at": last_msg.get("created_at"),
             "unread_count": res["unread_count"]
         })
             
     return conversations
 
+MAX_SYNC_LIMIT = 500
+
+@router.get("/sync", response_model=SyncResponse)
+async def sync_messages(
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = 200,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Catch up after a reconnect: every message, reaction and read receipt changed since the cursor,
+    across all conversations, in one indexed query. Pass `since` on the first sync, then `next_cursor`.
+    """
+    limit = max(1, min(limit, MAX_SYNC_LIMIT))
+
+    if cursor:
+        try:
+            after_ts, after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = sync_query(current_user.id, after_ts, after_id)
+    elif since:
+        query = sync_query(current_user.id, since)
+    else:
+        raise HTTPException(status_code=400, detail="Either cursor or since is required")
+
+    messages = await ChatMessageModel.find(query).sort(SYNC_SORT).limit(limit + 1).to_list()
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+
+    items = []
+    for msg in messages:
+        items.append({
+            **msg.model_dump(exclude={"sender", "receiver"}),
+            "sender_id": str(msg.sender.ref.id),
+            "receiver_id": str(msg.receiver.ref.id),
+        })
+
+    next_cursor = encode_cursor(messages[-1].updated_at, messages[-1].id) if messages else cursor
+    return {"messages": items, "next_cursor": next_cursor, "has_more": has_more}
+
 @router.put("/mark-read/{sender_id}")
 async def mark_messages_as_read(sender_id: str, current_user: UserModel = Depends(get_current_user)):
     """Mark all messages from a specific user as 'read'"""
@@ -354,24 +334,21 @@ async def mark_messages_as_read(sender_id: str, current_user: UserModel = Depend
             ChatMessageModel.receiver.id == current_user.id,
             ChatMessageModel.is_read == False
         )
-    ).set({ChatMessageModel.is_read: True})
+    ).set({ChatMessageModel.is_read: True, ChatMessageModel.updated_at: datetime.now(timezone.utc)})
     
     return {"status": "success"}
 
 @router.post("/upload-image")
 async def upload_chat_image(request: Request, file: UploadFile = File(...), current_user: UserModel = Depends(get_current_user)):
     """Image upload endpoint for sending in chat"""
-    file_extension = file.filename.split(".")[-1]
-    file_name = f"chat_{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join("uploads", file_name)
-
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
-
-    # Return the full accessible URL
-
-    image_url = f"/uploads/{file_name}"
-    return {"image_url": image_url}
+    image_url = await save_upload(file, allowed=CHAT_IMAGE_TYPES)
+    # Rendered before answering so the message sent next can reference the variants
+    variants = await image_variants.generate(image_url)
+    # The message sent with it claims its own reference. Until then the blob is kept for the GC
+    # grace period, and an image that is never sent gets collected.
+    await blob_store.grant(image_url, current_user.id)
+    await blob_store.release(image_url)
+    return {"image_url": image_url, "image_variants": variants}
 
 
 # @router.delete("all_message",status_code=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from uuid import UUID
 from instalive_live_app.core.base.base import BaseResponse
@@ -16,6 +16,7 @@ class ChatMessageResponse(BaseResponse):
     receiver: UserResponse
     message: Optional[str] = None
     image_url: Optional[str] = None
+    image_variants: Dict[str, str] = {}
     is_read: bool
     replied_to_id: Optional[UUID] = None
     reactions: List[ReactionSchema] = []
@@ -30,6 +31,7 @@ class OtherUserInfo(BaseModel):
     first_name: Optional[str]
     last_name: Optional[str]
     profile_image: Optional[str]
+    profile_image_variants: Dict[str, str] = {}
     is_online: bool
 
 
@@ -37,8 +39,29 @@ class ConversationResponse(BaseModel):
     other_user: OtherUserInfo
     last_message: Optional[str]
     last_image_url: Optional[str]
+    last_image_variants: Dict[str, str] = {}
     created_at: datetime
     unread_count: int
 
     class Config:
         from_attributes = True
+
+
+class SyncMessage(BaseModel):
+    id: UUID
+    sender_id: str
+    receiver_id: str
+    message: Optional[str] = None
+    image_url: Optional[str] = None
+    image_variants: Dict[str, str] = {}
+    is_read: bool
+    replied_to_id: Optional[UUID] = None
+    reactions: List[ReactionSchema] = []
+    created_at: datetime
+    updated_at: datetime
+
+
+class SyncResponse(BaseModel):
+    messages: List[SyncMessage]
+    next_cursor: Optional[str] = None
+    has_more: bool
@@ -0,0 +1,145 @@
+import json
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from fastapi import WebSocket
+import redis.asyncio as redis
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.chating.utils.wire import ClientConnection, OutboundFrame, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+CHAT_CHANNEL = "chat_updates"
+# Envelope type for one event addressed to many users
+MULTICAST = "multicast"
+# Envelope type for a different event per user, published together
+PER_USER = "per_user"
+
+
+# WebSocket Connection Manager with Redis Pub/Sub
+class ConnectionManager:
+    def __init__(self):
+        self.active_connections: Dict[str, ClientConnection] = {}
+        self.redis: Optional[redis.Redis] = None
+        self.pubsub_task: Optional[asyncio.Task] = None
+
+    async def ensure_redis(self):
+        if not self.redis:
+            self.redis = await get_redis()
+            if self.redis:
+                self.pubsub_task = asyncio.create_task(self._listen_to_redis())
+                logger.info("Connected to Redis for Chat Pub/Sub")
+            else:
+                logger.warning("Redis unavailable. Falling back to local-only chat.")
+
+    async def _listen_to_redis(self):
+        ps = self.redis.pubsub()
+        await ps.subscribe(CHAT_CHANNEL)
+        try:
+            async for message in ps.listen():
+                if message["type"] == "message":
+                    # Keep the published JSON text as-is: JSON clients get it verbatim,
+                    # msgpack clients share a single encoding of it.
+                    await self._dispatch(OutboundFrame(text=message["data"]))
+        except Exception as e:
+            logger.error(f"Redis PubSub Error: {e}")
+        finally:
+            await ps.unsubscribe(CHAT_CHANNEL)
+
+    async def _dispatch(self, frame: OutboundFrame):
+        data = frame.payload
+        if data.get("type") == MULTICAST:
+            await self._deliver_many(OutboundFrame(data["event"]), data["receiver_ids"])
+        elif data.get("type") == PER_USER:
+            await self._deliver_each(data["events"])
+        else:
+            await self._deliver(frame)
+
+    async def _deliver_many(self, frame: OutboundFrame, user_ids: List[str]):
+        """Send one frame to every listed user connected to this worker."""
+        connections = [self.active_connections[uid] for uid in user_ids if uid in self.active_connections]
+        results = await asyncio.gather(*(c.send(frame) for c in connections), return_exceptions=True)
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.error(f"Send Error (Multicast to {connection.user_id}): {result}")
+
+    async def _deliver_each(self, events: Dict[str, dict]):
+        """Send each user their own event, for the users connected to this worker."""
+        targets = [(self.active_connections[uid], event) for uid, event in events.items() if uid in self.active_connections]
+        results = await asyncio.gather(*(c.send_json(event) for c, event in targets), return_exceptions=True)
+        for (connection, _), result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.error(f"Send Error (Per-user to {connection.user_id}): {result}")
+
+    async def _deliver(self, frame: OutboundFrame):
+        """Send a frame to its receiver and echo it to the sender, if they are connected to this worker."""
+        data = frame.payload
+        receiver_id = data.get("receiver_id")
+        if receiver_id and receiver_id in self.active_connections:
+            try:
+                await self.active_connections[receiver_id].send(frame)
+            except Exception as e:
+                logger.error(f"Send Error (Receiver): {e}")
+
+        # Also send to sender so they get the real ID (fix for reaction sync)
+        sender_id = data.get("sender_id")
+        if sender_id and sender_id != receiver_id and sender_id in self.active_connections:
+            try:
+                await self.active_connections[sender_id].send(frame)
+            except Exception as e:
+                logger.error(f"Send Error (Sender): {e}")
+
+    async def connect(self, user_id: str, websocket: WebSocket) -> ClientConnection:
+        encoding, subprotocol = negotiate_encoding(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        connection = ClientConnection(user_id, websocket, encoding)
+        self.active_connections[user_id] = connection
+        await self.ensure_redis()
+        return connection
+
+    def disconnect(self, user_id: str, connection: Optional[ClientConnection] = None) -> bool:
+        """
+        Remove a user's connection from the registry.
+        When `connection` is given, only remove it if it is still the registered one,
+        so a stale socket closing doesn't drop the user's newer connection.
+        """
+        current = self.active_connections.get(user_id)
+        if current is None or (connection is not None and current is not connection):
+            return False
+        del self.active_connections[user_id]
+        return True
+
+    async def broadcast_to_redis(self, message: dict):
+        frame = OutboundFrame(message)
+        if self.redis:
+            await self.redis.publish(CHAT_CHANNEL, frame.text)
+        else:
+            # Fallback for local-only if Redis is missing
+            await self._deliver(frame)
+
+    async def send_to_users(self, message: dict, user_ids: List[str]):
+        """Publish one event for many users; each worker delivers it to the ones it holds."""
+        if not user_ids:
+            return
+        if self.redis:
+            envelope = {"type": MULTICAST, "receiver_ids": list(user_ids), "event": message}
+            await self.redis.publish(CHAT_CHANNEL, json.dumps(envelope))
+        else:
+            await self._deliver_many(OutboundFrame(message), list(user_ids))
+
+    async def send_each(self, events: Dict[str, dict]):
+        """Publish a batch of per-user events in one message."""
+        if not events:
+            return
+        if self.redis:
+            await self.redis.publish(CHAT_CHANNEL, json.dumps({"type": PER_USER, "events": events}))
+        else:
+            await self._deliver_each(events)
+
+    async def send_personal_message(self, message: dict, receiver_id: str):
+        # Add receiver_id to message so broadcast_to_redis handles routing
+        message["receiver_id"] = receiver_id
+        await self.broadcast_to_redis(message)
+
+
+manager = ConnectionManager()
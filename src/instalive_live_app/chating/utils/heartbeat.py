@@ -0,0 +1,105 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Optional
+from instalive_live_app.chating.utils.connection_manager import ConnectionManager, manager
+from instalive_live_app.chating.utils.presence import presence
+from instalive_live_app.chating.utils.wire import ClientConnection, OutboundFrame
+
+logger = logging.getLogger(__name__)
+
+# Every connection is pinged once per interval
+HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", "30"))
+# The interval is split into ticks; each tick pings an equal slice of the registry
+HEARTBEAT_TICK_SECONDS = 1.0
+# Sockets that haven't sent anything (pong or message) for this long are evicted
+DEAD_AFTER_SECONDS = float(os.getenv("WS_DEAD_AFTER_SECONDS", "75"))
+SEND_TIMEOUT_SECONDS = 5.0
+
+PING_FRAME = OutboundFrame({"type": "ping"})
+
+
+class HeartbeatScheduler:
+    """
+    One heartbeat loop per worker instead of one sleeping task per WebSocket.
+    Each round walks a snapshot of the connection registry in time-sliced batches,
+    so pings are spread evenly over the interval rather than fired in bursts.
+    Dead sockets are closed and removed from the registry, and the presence of the
+    live ones is refreshed with one batched write per tick.
+    """
+
+    def __init__(self, connection_manager: ConnectionManager):
+        self.manager = connection_manager
+        self._pending: Deque[str] = deque()
+        self._task: Optional[asyncio.Task] = None
+
+    def _batch_size(self) -> int:
+        ticks_per_round = max(1, int(HEARTBEAT_INTERVAL_SECONDS / HEARTBEAT_TICK_SECONDS))
+        return max(1, math.ceil(len(self.manager.active_connections) / ticks_per_round))
+
+    async def tick(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        if not self._pending:
+            # Start a new round; connections opened during the round join the next one
+            self._pending.extend(self.manager.active_connections.keys())
+
+        batch = []
+        for _ in range(min(self._batch_size(), len(self._pending))):
+            user_id = self._pending.popleft()
+            connection = self.manager.active_connections.get(user_id)
+            if connection:
+                batch.append(connection)
+        if not batch:
+            return
+
+        dead = [c for c in batch if now - c.last_seen > DEAD_AFTER_SECONDS]
+        alive = [c for c in batch if now - c.last_seen <= DEAD_AFTER_SECONDS]
+
+        results = await asyncio.gather(*(self._ping(c) for c in alive))
+        dead.extend(c for c, ok in zip(alive, results) if not ok)
+
+        for connection in dead:
+            await self._evict(connection)
+
+        healthy = [c.user_id for c, ok in zip(alive, results) if ok]
+        if healthy:
+            await presence.touch(healthy)
+
+    async def _ping(self, connection: ClientConnection) -> bool:
+        try:
+            await asyncio.wait_for(connection.send(PING_FRAME), SEND_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+    async def _evict(self, connection: ClientConnection):
+        logger.info(f"Evicting dead WebSocket for user {connection.user_id}")
+        if self.manager.disconnect(connection.user_id, connection):
+            await presence.remove(connection.user_id)
+        try:
+            await connection.websocket.close(code=1001)
+        except Exception:
+            pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_TICK_SECONDS)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Heartbeat tick failed: {e}")
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+heartbeat_scheduler = HeartbeatScheduler(manager)
@@ -0,0 +1,143 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Iterable
+from uuid import UUID
+from beanie.operators import In
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.users.models.user_models import UserModel
+
+logger = logging.getLogger(__name__)
+
+# A user is online while their last heartbeat is younger than this.
+PRESENCE_TTL_SECONDS = int(os.getenv("PRESENCE_TTL_SECONDS", "90"))
+SWEEP_INTERVAL_SECONDS = 30
+
+# Sorted set of user ids scored by the time their presence expires.
+ONLINE_KEY = "presence:online"
+
+
+class PresenceService:
+    """
+    Cross-instance online presence.
+    Online users live in a Redis sorted set refreshed by WebSocket heartbeats;
+    entries whose expiry has passed are ignored on read and removed by a periodic sweep.
+    Falls back to a process-local map when Redis is unavailable.
+    """
+
+    def __init__(self):
+        self._local: Dict[str, float] = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    async def touch(self, user_ids: Iterable[str]):
+        """Mark users online (or extend their presence) for another TTL period."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        expires_at = time.time() + PRESENCE_TTL_SECONDS
+        r = await get_redis()
+        if r:
+            try:
+                await r.zadd(ONLINE_KEY, {uid: expires_at for uid in user_ids})
+                return
+            except Exception as e:
+                logger.error(f"Presence touch failed: {e}")
+        for uid in user_ids:
+            self._local[uid] = expires_at
+
+    async def remove(self, user_id: str):
+        self._local.pop(user_id, None)
+        r = await get_redis()
+        if r:
+            try:
+                await r.zrem(ONLINE_KEY, user_id)
+            except Exception as e:
+                logger.error(f"Presence remove failed: {e}")
+
+    async def online_ids(self, skip: int = 0, limit: int = 50) -> List[str]:
+        """Page through currently online user ids."""
+        now = time.time()
+        r = await get_redis()
+        if r:
+            try:
+                return await r.zrangebyscore(ONLINE_KEY, now, "+inf", start=skip, num=limit)
+            except Exception as e:
+                logger.error(f"Presence read failed: {e}")
+        ids = [uid for uid, expires_at in self._local.items() if expires_at > now]
+        return ids[skip:skip + limit]
+
+    async def filter_online(self, user_ids: Iterable[str]) -> List[str]:
+        """
+        Intersect the given ids with the online set in one round trip.
+        Order of the input is preserved.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        now = time.time()
+        r = await get_redis()
+        if r:
+            try:
+                scores = await r.zmscore(ONLINE_KEY, user_ids)
+                return [uid for uid, score in zip(user_ids, scores) if score is not None and score > now]
+            except Exception as e:
+                logger.error(f"Presence read failed: {e}")
+        return [uid for uid in user_ids if self._local.get(uid, 0) > now]
+
+    async def is_online(self, user_id: str) -> bool:
+        return bool(await self.filter_online([user_id]))
+
+    async def sweep(self):
+        """Drop expired entries so the online set doesn't grow with crashed connections."""
+        now = time.time()
+        self._local = {uid: expires_at for uid, expires_at in self._local.items() if expires_at > now}
+        r = await get_redis()
+        if r:
+            await r.zremrangebyscore(ONLINE_KEY, "-inf", now)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Presence sweep failed: {e}")
+
+    def start(self):
+        if not self._sweep_task:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+
+
+presence = PresenceService()
+
+
+async def hydrate_online_users(user_ids: List[str]) -> List[UserModel]:
+    """
+    Load the profiles for a list of online user ids with a single $in query,
+    keeping the order of the ids. is_online is set on the returned objects only (never persisted).
+    """
+    uuids = []
+    for uid in user_ids:
+        try:
+            uuids.append(UUID(uid))
+        except (ValueError, TypeError):
+            continue
+    if not uuids:
+        return []
+
+    users = await UserModel.find(In(UserModel.id, uuids)).to_list()
+    by_id = {str(u.id): u for u in users}
+
+    ordered = []
+    for uid in user_ids:
+        user = by_id.get(uid)
+        if user:
+            user.is_online = True
+            ordered.append(user)
+    return ordered
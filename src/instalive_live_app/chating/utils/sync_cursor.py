@@ -0,0 +1,41 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+# Sync order; ties on updated_at are broken by _id so a page boundary never splits them ambiguously
+SYNC_SORT = [("updated_at", 1), ("_id", 1)]
+
+
+def encode_cursor(updated_at: datetime, message_id: UUID) -> str:
+    """Opaque continuation token pointing just after (updated_at, id)."""
+    raw = f"{updated_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Inverse of encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        ts, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), UUID(message_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def sync_query(user_id: UUID, updated_at: datetime, message_id: Optional[UUID] = None) -> dict:
+    """
+    The user's messages after (updated_at, message_id) in SYNC_SORT order, or after updated_at
+    when there is no id. Expanded to one branch per (participant, condition) pair so each
+    branch is served by the (receiver|sender, updated_at, _id) indexes.
+    """
+    after = [{"updated_at": {"$gt": updated_at}}]
+    if message_id is not None:
+        after.append({"updated_at": updated_at, "_id": {"$gt": message_id}})
+    return {
+        "$or": [
+            {field: user_id, **condition}
+            for field in ("receiver.$id", "sender.$id")
+            for condition in after
+        ]
+    }
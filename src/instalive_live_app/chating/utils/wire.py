@@ -0,0 +1,98 @@
+import json
+import time
+import logging
+from typing import Optional, Tuple
+import msgpack
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Wire formats a /chat/ws client can negotiate
+JSON = "json"
+MSGPACK = "msgpack"
+
+# Subprotocol names accepted in the Sec-WebSocket-Protocol header
+SUBPROTOCOLS = {
+    "instalive.json": JSON,
+    "instalive.msgpack": MSGPACK,
+}
+
+
+def negotiate_encoding(websocket: WebSocket) -> Tuple[str, Optional[str]]:
+    """
+    Pick the frame encoding for a connection.
+    Clients opt in with `?encoding=msgpack` or the `instalive.msgpack` subprotocol.
+    Returns (encoding, subprotocol to echo back on accept).
+    """
+    requested = websocket.scope.get("subprotocols") or []
+    for name in requested:
+        encoding = SUBPROTOCOLS.get(name)
+        if encoding:
+            return encoding, name
+
+    if websocket.query_params.get("encoding") == MSGPACK:
+        return MSGPACK, None
+    return JSON, None
+
+
+def decode_frame(message: dict) -> Optional[dict]:
+    """Decode an incoming `websocket.receive` message (text or binary) to a dict."""
+    if message.get("text") is not None:
+        return json.loads(message["text"])
+    if message.get("bytes") is not None:
+        return msgpack.unpackb(message["bytes"], raw=False)
+    return None
+
+
+class OutboundFrame:
+    """
+    A payload that is encoded at most once per wire format,
+    so the same bytes are forwarded to every recipient without re-serializing.
+    """
+    __slots__ = ("_payload", "_text", "_binary")
+
+    def __init__(self, payload: Optional[dict] = None, text: Optional[str] = None):
+        self._payload = payload
+        self._text = text
+        self._binary = None
+
+    @property
+    def payload(self) -> dict:
+        if self._payload is None:
+            self._payload = json.loads(self._text)
+        return self._payload
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self._payload)
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = msgpack.packb(self.payload, use_bin_type=True)
+        return self._binary
+
+
+class ClientConnection:
+    """A connected /chat/ws socket together with the wire format it negotiated."""
+
+    def __init__(self, user_id: str, websocket: WebSocket, encoding: str = JSON):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.encoding = encoding
+        # Monotonic time of the last frame received from the client (pong or otherwise)
+        self.last_seen = time.monotonic()
+
+    def mark_alive(self):
+        self.last_seen = time.monotonic()
+
+    async def send(self, frame: OutboundFrame):
+        if self.encoding == MSGPACK:
+            await self.websocket.send_bytes(frame.binary)
+        else:
+            await self.websocket.send_text(frame.text)
+
+    async def send_json(self, payload: dict):
+        await self.send(OutboundFrame(payload))
@@ -0,0 +1,380 @@
+"""
+Content-addressed storage for uploaded files.
+
+Every file is stored once, named by the SHA-256 of its bytes, in a directory sharded by
+the first two byte pairs of the hash: blobs/ab/cd/abcd...ef.png, served at
+/blobs/abcd...ef.png. Identical uploads share the file; a `blobs` document counts the
+fields that reference it. Blobs whose count dropped to zero are deleted (with their
+image variants and precompressed copies) once they have been orphaned for the grace period.
+
+Private blobs (KYC scans) live under blobs/private/, are named by a hash that differs from
+the public one for the same bytes, and are only served by the authorized, uncached
+/blobs/private route.
+
+Collect orphaned blobs now instead of waiting for the background loop:
+
+    python -m instalive_live_app.core.blob_store --gc
+"""
+import os
+import re
+import gzip
+import uuid
+import hashlib
+import asyncio
+import argparse
+import logging
+import mimetypes
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+from instalive_live_app.core.models import BlobModel
+from instalive_live_app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip copies are always written
+    brotli = None
+
+BLOB_ROOT = os.getenv("BLOB_ROOT", "blobs")
+BLOB_URL_PREFIX = "/blobs/"
+PRIVATE_URL_PREFIX = "/blobs/private/"
+PRIVATE_DIR = "private"
+# Files uploaded before the blob store; still served as they are by the /uploads mount
+UPLOAD_ROOT = "uploads"
+# Unsent uploads remembered per blob for grant/claim
+PENDING_CLAIMS_KEPT = 100
+# Orphaned blobs are kept this long, so a reference added right after the last release still works
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", str(24 * 3600)))
+BLOB_GC_INTERVAL_SECONDS = int(os.getenv("BLOB_GC_INTERVAL_SECONDS", "3600"))
+BLOB_GC_BATCH_SIZE = 500
+# Content served to clients that accept it, when smaller than the original
+PRECOMPRESSED_ENCODINGS = {"br": ".br", "gzip": ".gz"}
+# Already compressed formats gain nothing from another pass
+INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/")
+INCOMPRESSIBLE_TYPES = {"application/zip", "application/gzip", "application/pdf"}
+
+# <sha256><ext>, or <sha256>_<size>.webp for an image variant
+BLOB_NAME = re.compile(r"^(?P<sha>[0-9a-f]{64})(_\d+)?\.[a-z0-9]+$")
+LOCK_KEY = "blob_gc:lock"
+
+
+def compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    return not content_type.startswith(INCOMPRESSIBLE_PREFIXES) and content_type not in INCOMPRESSIBLE_TYPES
+
+
+def content_type_of(name: str) -> str:
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def blob_path(name: str, private: bool = False) -> str:
+    """Sharded location of a blob (or one of its variants) on disk."""
+    root = os.path.join(BLOB_ROOT, PRIVATE_DIR) if private else BLOB_ROOT
+    return os.path.join(root, name[:2], name[2:4], name)
+
+
+def _name_after(prefix: str, url: Optional[str]) -> Optional[str]:
+    if not url or not url.startswith(prefix):
+        return None
+    name = url[len(prefix):]
+    return name if BLOB_NAME.match(name) else None
+
+
+def blob_name(url: Optional[str]) -> Optional[str]:
+    """Name of a public blob URL."""
+    return _name_after(BLOB_URL_PREFIX, url)
+
+
+def private_blob_name(url: Optional[str]) -> Optional[str]:
+    return _name_after(PRIVATE_URL_PREFIX, url)
+
+
+def blob_sha(url: Optional[str]) -> Optional[str]:
+    """Key of the blob behind a public or private URL."""
+    name = blob_name(url) or private_blob_name(url)
+    return BLOB_NAME.match(name).group("sha") if name else None
+
+
+def private_sha(sha: str) -> str:
+    # Knowing a private blob's URL doesn't give away the public name of the same bytes
+    return hashlib.sha256(f"{PRIVATE_DIR}:{sha}".encode()).hexdigest()
+
+
+def local_path(url: Optional[str]) -> Optional[str]:
+    """File behind a /blobs or legacy /uploads URL; None for anything else (external images etc.)."""
+    name = blob_name(url)
+    if name:
+        return blob_path(name)
+    if url and url.startswith(f"/{UPLOAD_ROOT}/") and ".." not in url:
+        return url.lstrip("/")
+    return None
+
+
+def public_url(path: str) -> str:
+    """Inverse of local_path."""
+    if not os.path.relpath(path, BLOB_ROOT).startswith(".."):
+        return BLOB_URL_PREFIX + os.path.basename(path)
+    return "/" + path.replace(os.sep, "/")
+
+
+def temp_dir() -> str:
+    """Where uploads are spooled; on the same filesystem as the shards so they can be renamed in."""
+    directory = os.path.join(BLOB_ROOT, "tmp")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.part"
+    with open(tmp, "wb") as out:
+        out.write(data)
+    os.replace(tmp, path)
+
+
+def _precompress(path: str):
+    with open(path, "rb") as f:
+        data = f.read()
+    compressed = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed[".br"] = brotli.compress(data, quality=11)
+    for suffix, body in compressed.items():
+        if len(body) < len(data) and not os.path.exists(path + suffix):
+            _write_atomic(path + suffix, body)
+
+
+def _place(tmp_path: str, name: str, content_type: str, private: bool):
+    target = blob_path(name, private)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Always renamed in, even when the blob already exists: a collection racing this store
+    # may just have moved the old file aside, and the bytes are identical either way
+    os.replace(tmp_path, target)
+    if compressible(content_type) and not private:
+        _precompress(target)
+
+
+async def store(tmp_path: str, sha: str, ext: str, content_type: str, size: int, private: bool = False) -> str:
+    """
+    Moves a fully written temp file into the store as one new reference to its content
+    and returns its URL. The reference is counted before the file is placed, so
+    the collector never deletes a blob that is being stored.
+    """
+    if private:
+        sha = private_sha(sha)
+    update = {
+        "$inc": {"refcount": 1},
+        "$unset": {"orphaned_at": ""},
+        "$setOnInsert": {
+            "_id": uuid.uuid4(), "ext": ext, "content_type": content_type,
+            "size": size, "private": private, "created_at": datetime.now(timezone.utc),
+        },
+    }
+    collection = BlobModel.get_motor_collection()
+    try:
+        try:
+            await collection.update_one({"sha256": sha}, update, upsert=True)
+        except DuplicateKeyError:
+            # Another upload of the same content inserted it first; now it matches
+            await collection.update_one({"sha256": sha}, update, upsert=True)
+        name = f"{sha}{ext}"
+        await run_in_threadpool(_place, tmp_path, name, content_type, private)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return (PRIVATE_URL_PREFIX if private else BLOB_URL_PREFIX) + name
+
+
+async def retain(url: Optional[str]):
+    """
+    Counts one more reference to a public blob URL. Other URLs are ignored; private
+    blobs are only referenced by the upload that stored them.
+    """
+    name = blob_name(url)
+    if name:
+        await BlobModel.get_motor_collection().update_one(
+            {"sha256": BLOB_NAME.match(name).group("sha"), "private": {"$ne": True}},
+            {"$inc": {"refcount": 1}, "$unset": {"orphaned_at": ""}},
+        )
+
+
+async def grant(url: Optional[str], user_id: uuid.UUID):
+    """Lets `user_id`, who just uploaded this public blob, attach it once with claim()."""
+    name = blob_name(url)
+    if name:
+        await BlobModel.get_motor_collection().update_one(
+            {"sha256": BLOB_NAME.match(name).group("sha")},
+            {"$push": {"pending_claims": {"$each": [user_id], "$slice": -PENDING_CLAIMS_KEPT}}},
+        )
+
+
+async def claim(url: Optional[str], user_id: uuid.UUID) -> bool:
+    """
+    Takes one reference to a blob `user_id` was granted, using up the grant.
+    False for private blobs, other users' uploads and anything not in the store, so a
+    client can't pin arbitrary blobs by naming them.
+    """
+    name = blob_name(url)
+    if not name:
+        return False
+    sha = BLOB_NAME.match(name).group("sha")
+    collection = BlobModel.get_motor_collection()
+    result = await collection.update_one(
+        {"sha256": sha, "private": {"$ne": True}, "pending_claims": user_id},
+        {"$inc": {"refcount": 1}, "$unset": {"orphaned_at": ""}, "$set": {"pending_claims.$": None}},
+    )
+    if not result.modified_count:
+        return False
+    await collection.update_one({"sha256": sha}, {"$pull": {"pending_claims": None}})
+    return True
+
+
+async def release(url: Optional[str]):
+    """Drops one reference to a blob URL; at zero the blob becomes eligible for collection."""
+    sha = blob_sha(url)
+    if not sha:
+        return
+    try:
+        remaining = {"$subtract": ["$refcount", 1]}
+        await BlobModel.get_motor_collection().update_one({"sha256": sha}, [{"$set": {
+            "refcount": remaining,
+            "orphaned_at": {"$cond": [{"$lte": [remaining, 0]}, {"$ifNull": ["$orphaned_at", "$$NOW"]}, "$$REMOVE"]},
+        }}])
+    except Exception as e:
+        # A missed release only leaves an orphan on disk; it must never fail the request
+        logger.error(f"Releasing blob {sha} failed: {e}")
+
+
+def _discard(name: str, private: bool):
+    """Removes a collected blob, its precompressed copies and its image variants."""
+    path = blob_path(name, private)
+    directory, stem = os.path.dirname(path), os.path.splitext(name)[0]
+    for candidate in [path + ".trash", path + ".gz", path + ".br"]:
+        try:
+            os.unlink(candidate)
+        except FileNotFoundError:
+            pass
+    try:
+        siblings = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for sibling in siblings:
+        if sibling.startswith(f"{stem}_") and sibling.endswith(".webp"):
+            try:
+                os.unlink(os.path.join(directory, sibling))
+            except FileNotFoundError:
+                pass
+
+
+def _set_aside(name: str, private: bool) -> bool:
+    path = blob_path(name, private)
+    try:
+        os.replace(path, path + ".trash")
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _restore(name: str, private: bool):
+    path = blob_path(name, private)
+    try:
+        os.replace(path + ".trash", path)
+    except FileNotFoundError:
+        pass
+
+
+class BlobCollector:
+    """
+    Deletes blobs nobody references any more.
+    Each candidate's file is moved aside first, then its document is deleted only if it
+    is still unreferenced. If a new upload of the same content got in between, the
+    file is moved back (it has the same bytes as whatever the upload wrote).
+    """
+
+    def __init__(self, grace_seconds: int = BLOB_GC_GRACE_SECONDS):
+        self.grace_seconds = grace_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def collect(self) -> Dict[str, int]:
+        collection = BlobModel.get_motor_collection()
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace_seconds)
+        orphaned = {"refcount": {"$lte": 0}, "orphaned_at": {"$lt": cutoff}}
+        deleted, freed = 0, 0
+        while True:
+            batch = await collection.find(orphaned, {"sha256": 1, "ext": 1, "size": 1, "private": 1}) \
+                .limit(BLOB_GC_BATCH_SIZE).to_list(length=BLOB_GC_BATCH_SIZE)
+            if not batch:
+                break
+            for doc in batch:
+                name, private = f"{doc['sha256']}{doc['ext']}", doc.get("private", False)
+                moved = await run_in_threadpool(_set_aside, name, private)
+                result = await collection.delete_one({"_id": doc["_id"], **orphaned})
+                if result.deleted_count:
+                    await run_in_threadpool(_discard, name, private)
+                    deleted += 1
+                    freed += doc.get("size", 0)
+                elif moved:
+                    await run_in_threadpool(_restore, name, private)
+            if len(batch) < BLOB_GC_BATCH_SIZE:
+                break
+        if deleted:
+            logger.info(f"Blob GC: {deleted} blobs deleted, {freed} bytes freed")
+        return {"deleted": deleted, "freed_bytes": freed}
+
+    async def _acquire_lock(self) -> bool:
+        r = await get_redis()
+        if not r:
+            return True
+        try:
+            return bool(await r.set(LOCK_KEY, os.getpid(), nx=True, ex=max(60, BLOB_GC_INTERVAL_SECONDS // 2)))
+        except Exception as e:
+            logger.error(f"Blob GC lock failed: {e}")
+            return True
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(BLOB_GC_INTERVAL_SECONDS)
+            if not await self._acquire_lock():
+                continue
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.error(f"Blob GC failed: {e}")
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+blob_collector = BlobCollector()
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from beanie import init_beanie
+    from instalive_live_app.db import MODELS, MONGODB_URL, DATABASE_NAME
+
+    client = AsyncIOMotorClient(MONGODB_URL, uuidRepresentation="standard")
+    await init_beanie(database=client[DATABASE_NAME], document_models=MODELS)
+    try:
+        print(await blob_collector.collect())
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gc", action="store_true", required=True)
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,184 @@
+"""
+Downscaled WebP variants of uploaded images, rendered in a process pool.
+
+An upload at /blobs/<sha>.png gets /blobs/<sha>_64.webp, _256.webp and _1024.webp, stored
+next to it. The first size at or above the original's longest side is rendered at the
+original size and any larger ones are skipped. Documents store them in a
+`*_variants` field keyed by size, e.g. {"64": "/blobs/<sha>_64.webp", ...}.
+
+Render variants for files uploaded before this existed (safe to re-run):
+
+    python -m instalive_live_app.core.image_variants --rebuild
+"""
+import os
+import asyncio
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence, Set, Type
+from beanie import Document
+from PIL import Image, ImageOps
+from starlette.concurrency import run_in_threadpool
+from instalive_live_app.core.blob_store import UPLOAD_ROOT, BLOB_URL_PREFIX, local_path, public_url
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANT_SIZES = (64, 256, 1024)
+# Worker processes rendering variants; each holds at most one decoded image at a time
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+WEBP_QUALITY = 80
+
+
+def variant_path(path: str, size: int) -> str:
+    return f"{os.path.splitext(path)[0]}_{size}.webp"
+
+
+def render_variants(path: str, sizes: Sequence[int] = IMAGE_VARIANT_SIZES) -> Dict[str, str]:
+    """Runs in a worker process: writes the WebP variants of `path`, returns {size: file path}."""
+    variants = {}
+    with Image.open(path) as image:
+        image.seek(0)  # first frame of an animated GIF/WebP
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        longest = max(image.size)
+        for size in sorted(sizes):
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            target = variant_path(path, size)
+            tmp = f"{target}.{os.getpid()}.part"
+            resized.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(tmp, target)
+            variants[str(size)] = target
+            # Larger sizes would be identical copies of this one
+            if size >= longest:
+                break
+    return variants
+
+
+class ImageVariantService:
+    """
+    Bounded pool for variant rendering. At most `workers` images are decoded at once;
+    further jobs wait their turn without holding any image data.
+    """
+
+    def __init__(self, workers: int = IMAGE_WORKERS, sizes: Sequence[int] = IMAGE_VARIANT_SIZES):
+        self.workers = workers
+        self.sizes = tuple(sizes)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(workers)
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def generate(self, url: Optional[str]) -> Dict[str, str]:
+        """Renders the variants of an uploaded image and returns their URLs; {} if not possible."""
+        path = local_path(url)
+        if path is None:
+            return {}
+        async with self._slots:
+            try:
+                loop = asyncio.get_running_loop()
+                paths = await loop.run_in_executor(self.executor, render_variants, path, self.sizes)
+            except Exception as e:
+                logger.error(f"Image variants for {url} failed: {e}")
+                return {}
+        return {size: public_url(p) for size, p in paths.items()}
+
+    async def existing(self, url: Optional[str]) -> Dict[str, str]:
+        """Variants already on disk for `url`, e.g. rendered when a chat image was uploaded."""
+        path = local_path(url)
+        if path is None:
+            return {}
+
+        def check():
+            return {str(s): public_url(variant_path(path, s)) for s in self.sizes if os.path.exists(variant_path(path, s))}
+
+        return await run_in_threadpool(check)
+
+    async def attach(self, model: Type[Document], doc_id, url_field: str, variants_field: str, url: str) -> Dict[str, str]:
+        variants = await self.generate(url)
+        if variants:
+            # Only if the document still points at this image; a newer upload may have replaced it
+            await model.get_motor_collection().update_one(
+                {"_id": doc_id, url_field: url}, {"$set": {variants_field: variants}}
+            )
+        return variants
+
+    def schedule(self, model: Type[Document], doc_id, url_field: str, variants_field: str, url: Optional[str]):
+        """Renders variants in the background and stores them on the document when done."""
+        if local_path(url) is None:
+            return
+        task = asyncio.create_task(self.attach(model, doc_id, url_field, variants_field, url))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_variants = ImageVariantService()
+
+
+async def rebuild():
+    from instalive_live_app.users.models.user_models import UserModel
+    from instalive_live_app.streaming.models.streaming import LiveStreamModel
+    from instalive_live_app.chating.models.chat_model import ChatMessageModel
+
+    targets = [
+        (UserModel, "profile_image", "profile_image_variants"),
+        (UserModel, "cover_image", "cover_image_variants"),
+        (LiveStreamModel, "thumbnail", "thumbnail_variants"),
+        (ChatMessageModel, "image_url", "image_variants"),
+    ]
+    counts = {}
+    for model, url_field, variants_field in targets:
+        done = 0
+        cursor = model.get_motor_collection().find(
+            {url_field: {"$regex": f"^(/{UPLOAD_ROOT}/|{BLOB_URL_PREFIX})"}}, {url_field: 1}
+        )
+        pending = set()
+        async for doc in cursor:
+            pending.add(asyncio.create_task(
+                image_variants.attach(model, doc["_id"], url_field, variants_field, doc[url_field])
+            ))
+            # Keep the number of queued documents bounded as well
+            if len(pending) >= image_variants.workers * 4:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                done += sum(1 for t in finished if t.result())
+        if pending:
+            finished, _ = await asyncio.wait(pending)
+            done += sum(1 for t in finished if t.result())
+        counts[f"{model.Settings.name}.{url_field}"] = done
+    return counts
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from beanie import init_beanie
+    from instalive_live_app.db import MODELS, MONGODB_URL, DATABASE_NAME
+
+    client = AsyncIOMotorClient(MONGODB_URL, uuidRepresentation="standard")
+    await init_beanie(database=client[DATABASE_NAME], document_models=MODELS)
+    try:
+        print(await rebuild())
+    finally:
+        await image_variants.stop()
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", required=True)
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
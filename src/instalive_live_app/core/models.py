@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from uuid import UUID
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from instalive_live_app.core.base.base import BaseCollection
+
+
+class BlobModel(BaseCollection):
+    """
+    One stored file in the content-addressed blob store (core/blob_store.py).
+    `refcount` counts the document fields pointing at it; at zero the blob becomes
+    garbage once it has been orphaned for the grace period.
+    """
+    sha256: str
+    ext: str
+    content_type: str
+    size: int
+    refcount: int = 0
+    # Stored under blobs/private/ and only served to authorized users
+    private: bool = False
+    # Users who uploaded it and may still attach it to one message each (see blob_store.grant)
+    pending_claims: List[UUID] = []
+    orphaned_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "blobs"
+        indexes = [
+            IndexModel([("sha256", ASCENDING)], unique=True),
+            IndexModel([("refcount", ASCENDING), ("orphaned_at", ASCENDING)]),
+        ]
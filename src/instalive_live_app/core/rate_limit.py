@@ -0,0 +1,269 @@
+import os
+import json
+import asyncio
+import math
+import time
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Literal, Optional, Tuple
+from jose import JWTError, jwt
+from pydantic import BaseModel
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.users.utils.get_current_user import SECRET_KEY, ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+# Per-rule overrides as JSON, e.g. {"login": {"capacity": 20}, "like": {"enabled": false}}
+RATE_LIMIT_RULES = os.getenv("RATE_LIMIT_RULES")
+# Only trust X-Forwarded-For when the app sits behind a proxy that sets it
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+# Bound on buckets kept in memory when Redis is down
+LOCAL_BUCKETS_MAX = 100_000
+
+# Token bucket in one round trip. The bucket is a hash {t: tokens, ts: last refill in ms};
+# Redis' own clock is used so workers with skewed clocks share one view of time.
+TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RateLimitRule(BaseModel):
+    name: str
+    method: str
+    path: str
+    # Burst size; the bucket refills `capacity` tokens every `period_seconds`
+    capacity: int
+    period_seconds: float
+    # identity: the authenticated user (falls back to the IP for anonymous requests)
+    key: Literal["ip", "identity"] = "ip"
+    enabled: bool = True
+
+    @property
+    def rate_per_ms(self) -> float:
+        return self.capacity / (self.period_seconds * 1000)
+
+
+API = "/api/v1"
+
+DEFAULT_RULES = [
+    # argon2 verification is the most expensive thing a request can trigger
+    RateLimitRule(name="login", method="POST", path=f"{API}/auth/login", capacity=10, period_seconds=60),
+    RateLimitRule(name="reset_password", method="POST", path=f"{API}/auth/reset-password", capacity=5, period_seconds=300),
+    RateLimitRule(name="otp_verify", method="POST", path=f"{API}/auth/otp-verify", capacity=10, period_seconds=300),
+    RateLimitRule(name="google_login", method="POST", path=f"{API}/auth/google-login", capacity=20, period_seconds=60),
+    # These send email
+    RateLimitRule(name="signup", method="POST", path=f"{API}/auth/signup", capacity=5, period_seconds=600),
+    RateLimitRule(name="resend_otp", method="POST", path=f"{API}/auth/resend-otp", capacity=3, period_seconds=300),
+    RateLimitRule(name="like", method="POST", path=f"{API}/streaming/interactions/like", capacity=20, period_seconds=10, key="identity"),
+    RateLimitRule(name="search_users", method="GET", path=f"{API}/users/search", capacity=30, period_seconds=60, key="identity"),
+    # One request per keystroke; the burst covers fast typing
+    RateLimitRule(name="typeahead", method="GET", path=f"{API}/users/typeahead", capacity=30, period_seconds=10, key="identity"),
+    RateLimitRule(name="search_streams", method="GET", path=f"{API}/streaming/search", capacity=30, period_seconds=60, key="identity"),
+]
+
+
+def load_rules() -> List[RateLimitRule]:
+    rules = {r.name: r for r in DEFAULT_RULES}
+    if RATE_LIMIT_RULES:
+        try:
+            overrides = json.loads(RATE_LIMIT_RULES)
+        except ValueError as e:
+            logger.error(f"Invalid RATE_LIMIT_RULES, using defaults: {e}")
+            overrides = {}
+        for name, values in overrides.items():
+            base = rules[name].model_dump() if name in rules else {"name": name}
+            rules[name] = RateLimitRule(**{**base, **values})
+    return list(rules.values())
+
+
+class LocalBuckets:
+    """
+    In-process token buckets used while Redis is unreachable.
+    Each worker limits on its own, so the effective limit is per worker rather than global.
+    """
+
+    def __init__(self, max_keys: int = LOCAL_BUCKETS_MAX):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, key: str, capacity: int, rate_per_ms: float) -> Tuple[bool, float]:
+        now = time.monotonic() * 1000
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(capacity), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate_per_ms)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, bucket[0]
+        return False, bucket[0]
+
+
+class RateLimiter:
+    def __init__(self, local: Optional[LocalBuckets] = None):
+        self.local = local or LocalBuckets()
+
+    async def take(self, key: str, capacity: int, rate_per_ms: float) -> Tuple[bool, float]:
+        """Takes one token; returns (allowed, tokens left)."""
+        r = await get_redis()
+        if r:
+            try:
+                allowed, tokens = await r.eval(TOKEN_BUCKET, 1, key, capacity, rate_per_ms)
+                return bool(allowed), float(tokens)
+            except Exception as e:
+                logger.warning(f"Rate limit check in Redis failed, using local bucket: {e}")
+        return self.local.take(key, capacity, rate_per_ms)
+
+
+rate_limiter = RateLimiter()
+
+
+@lru_cache(maxsize=4096)
+def _token_subject(token: str) -> Optional[str]:
+    # Only the signature matters for keying; expiry is left to the endpoint's own auth
+    if not SECRET_KEY:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False}).get("sub")
+    except JWTError:
+        return None
+
+
+def _client_ip(scope, headers: Dict[bytes, bytes]) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded:
+            return forwarded.split(b",")[0].strip().decode()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def request_key(rule: RateLimitRule, scope) -> str:
+    headers = dict(scope["headers"])
+    if rule.key == "identity":
+        auth = headers.get(b"authorization", b"")
+        if auth[:7].lower() == b"bearer ":
+            subject = _token_subject(auth[7:].decode())
+            if subject:
+                return f"ratelimit:{rule.name}:user:{subject}"
+    return f"ratelimit:{rule.name}:ip:{_client_ip(scope, headers)}"
+
+
+def limit_headers(rule: RateLimitRule, allowed: bool, tokens: float) -> List[Tuple[bytes, bytes]]:
+    reset = math.ceil((rule.capacity - tokens) / rule.rate_per_ms / 1000)
+    headers = [
+        (b"x-ratelimit-limit", str(rule.capacity).encode()),
+        (b"x-ratelimit-remaining", str(int(tokens)).encode()),
+        (b"x-ratelimit-reset", str(reset).encode()),
+    ]
+    if not allowed:
+        retry_after = max(1, math.ceil((1 - tokens) / rule.rate_per_ms / 1000))
+        headers.append((b"retry-after", str(retry_after).encode()))
+    return headers
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware: requests to routes without a rule cost one dict lookup,
+    limited routes one Redis round trip. Rejected requests get a 429 in the
+    format of the HTTP exception handler, with Retry-After.
+    """
+
+    def __init__(self, app, rules: Optional[List[RateLimitRule]] = None, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.rules: Dict[Tuple[str, str], RateLimitRule] = {
+            (rule.method, rule.path): rule
+            for rule in (rules if rules is not None else load_rules())
+            if rule.enabled
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        rule = self.rules.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        allowed, tokens = await self.limiter.take(request_key(rule, scope), rule.capacity, rule.rate_per_ms)
+        headers = limit_headers(rule, allowed, tokens)
+
+        if not allowed:
+            body = json.dumps({"status": "error", "message": "Too many requests", "code": 429}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+class TokenBucket:
+    """
+    In-process token bucket, for limits that belong to this worker alone: no Redis round
+    trip and no shared state.
+    """
+
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def allow(self, amount: float = 1) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    async def acquire(self, amount: float = 1):
+        """Waits for `amount` tokens, in arrival order. Amounts above the capacity go through once it is full."""
+        needed = min(amount, self.capacity)
+        async with self._lock:
+            while not self.allow(needed):
+                await asyncio.sleep((needed - self.tokens) / self.per_second)
+
+
+class FrameLimiter(TokenBucket):
+    """Frames of one WebSocket connection, which lives on this worker."""
+
+    def __init__(self, capacity: int = 20, per_second: float = 10.0):
+        super().__init__(capacity, per_second)
@@ -0,0 +1,48 @@
+import os
+import time
+import logging
+from typing import Optional
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+# Don't hammer an unreachable Redis on every call; retry the connection at most this often.
+RECONNECT_INTERVAL_SECONDS = 30
+
+_client: Optional[redis.Redis] = None
+_last_attempt: float = 0.0
+
+
+async def get_redis() -> Optional[redis.Redis]:
+    """
+    Shared Redis client for the whole worker.
+    Returns None when Redis is unavailable so callers can fall back to local state.
+    """
+    global _client, _last_attempt
+    if _client is not None:
+        return _client
+
+    now = time.monotonic()
+    if _last_attempt and now - _last_attempt < RECONNECT_INTERVAL_SECONDS:
+        return None
+    _last_attempt = now
+
+    try:
+        client = redis.from_url(REDIS_URL, decode_responses=True)
+        # Test connection
+        await client.ping()
+        _client = client
+        logger.info("Connected to Redis")
+    except Exception as e:
+        logger.warning(f"Failed to connect to Redis: {e}. Falling back to local-only state.")
+        _client = None
+    return _client
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,287 @@
+import os
+import gzip
+import json
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Literal, Optional
+from bson import json_util
+from bson.binary import UuidRepresentation
+from pydantic import BaseModel
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.users.models.user_models import UserModel
+
+logger = logging.getLogger(__name__)
+
+# Per-collection overrides as JSON, e.g. {"live_likes": {"max_age_days": 14, "archive_to": "file"}}
+RETENTION_POLICIES = os.getenv("RETENTION_POLICIES")
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", str(24 * 3600)))
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+# Archive jobs move this many documents per batch and pause between batches
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_BATCH_PAUSE_SECONDS = float(os.getenv("RETENTION_BATCH_PAUSE_SECONDS", "0.5"))
+# Upper bound per collection per run; whatever is left is picked up by the next run
+RETENTION_MAX_DOCS_PER_RUN = int(os.getenv("RETENTION_MAX_DOCS_PER_RUN", "200000"))
+
+# Only one worker runs the job at a time
+LOCK_KEY = "retention:lock"
+DUPLICATE_KEY_ERROR = 11000
+JSON_OPTIONS = json_util.JSONOptions(
+    json_mode=json_util.JSONMode.RELAXED, uuid_representation=UuidRepresentation.STANDARD
+)
+
+
+class RetentionPolicy(BaseModel):
+    collection: str
+    time_field: str
+    max_age_days: int
+    # ttl: let MongoDB expire the documents; archive: copy them somewhere cold, then delete
+    mode: Literal["ttl", "archive"] = "ttl"
+    archive_to: Literal["collection", "file"] = "collection"
+    # Only documents matching this are expired or archived (a partialFilterExpression for TTL indexes)
+    only: Optional[Dict[str, Any]] = None
+    enabled: bool = True
+
+    def expired(self, cutoff: datetime) -> Dict[str, Any]:
+        return {**(self.only or {}), self.time_field: {"$lt": cutoff}}
+
+
+DEFAULT_POLICIES = [
+    RetentionPolicy(collection="notifications", time_field="created_at", max_age_days=90),
+    RetentionPolicy(collection="broadcast_notifications", time_field="created_at", max_age_days=30),
+    # Stripe retries a webhook for up to three days; keep the dedupe records well past that. Pending and
+    # failed events are the worker's queue and stay; a replay of an expired event finds its transaction.
+    RetentionPolicy(collection="processed_stripe_events", time_field="processed_at", max_age_days=30,
+                    only={"status": {"$in": ["done", "ignored"]}}),
+    # Hourly per-stream analytics buckets
+    RetentionPolicy(collection="stream_analytics", time_field="hour", max_age_days=365),
+    RetentionPolicy(collection="live_likes", time_field="created_at", max_age_days=30, mode="archive", archive_to="file"),
+    RetentionPolicy(collection="live_viewers", time_field="joined_at", max_age_days=90, mode="archive", archive_to="file"),
+    RetentionPolicy(collection="live_comments", time_field="created_at", max_age_days=90, mode="archive"),
+    RetentionPolicy(collection="security_audit_logs", time_field="timestamp", max_age_days=365, mode="archive"),
+]
+
+
+class CollectionReport(BaseModel):
+    collection: str
+    mode: str
+    archived: int = 0
+    deleted: int = 0
+    # Documents past the cutoff that are still present (TTL monitor lag, or the per-run cap)
+    pending: int = 0
+    data_bytes_before: int = 0
+    data_bytes_after: int = 0
+    index_bytes_before: int = 0
+    index_bytes_after: int = 0
+    reclaimed_bytes: int = 0
+    error: Optional[str] = None
+
+
+class RetentionReport(BaseModel):
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    collections: List[CollectionReport] = []
+    reclaimed_bytes: int = 0
+
+
+def load_policies() -> List[RetentionPolicy]:
+    policies = {p.collection: p for p in DEFAULT_POLICIES}
+    if RETENTION_POLICIES:
+        try:
+            overrides = json.loads(RETENTION_POLICIES)
+        except ValueError as e:
+            logger.error(f"Invalid RETENTION_POLICIES, using defaults: {e}")
+            overrides = {}
+        for name, values in overrides.items():
+            base = policies[name].model_dump() if name in policies else {"collection": name}
+            policies[name] = RetentionPolicy(**{**base, **values})
+    return list(policies.values())
+
+
+class RetentionManager:
+    """
+    Keeps high-churn collections bounded.
+    TTL policies are enforced by a TTL index on the time field. Archive policies copy
+    expired documents to `<collection>_archive` or to gzipped JSONL files, then delete
+    them, in small batches with pauses so live traffic keeps priority.
+    Every run reports the data and index bytes freed per collection.
+    """
+
+    def __init__(self, policies: Optional[List[RetentionPolicy]] = None):
+        self.policies = policies if policies is not None else load_policies()
+        self.last_report: Optional[RetentionReport] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._running.locked()
+
+    @property
+    def db(self):
+        return UserModel.get_motor_collection().database
+
+    async def ensure_indexes(self):
+        for policy in self.policies:
+            if not policy.enabled:
+                continue
+            try:
+                await self._ensure_index(policy)
+            except Exception as e:
+                logger.error(f"Retention index for {policy.collection} failed: {e}")
+
+    async def _ensure_index(self, policy: RetentionPolicy):
+        collection = self.db[policy.collection]
+        key = [(policy.time_field, ASCENDING)]
+        expire = policy.max_age_days * 86400 if policy.mode == "ttl" else None
+        options = {}
+        if expire is not None:
+            options["expireAfterSeconds"] = expire
+            if policy.only:
+                options["partialFilterExpression"] = policy.only
+
+        existing = None
+        for name, info in (await collection.index_information()).items():
+            # Key values may be directions, "text" or "hashed"; compare them as they are
+            if list(info["key"]) == key:
+                existing = (name, info)
+        if existing is not None and existing[1].get("partialFilterExpression") != options.get("partialFilterExpression"):
+            # collMod can't change the filter, so the index is rebuilt
+            await collection.drop_index(existing[0])
+            logger.info(f"Retention: {policy.collection}.{existing[0]} dropped to change its filter")
+            existing = None
+        if existing is None:
+            await collection.create_index(key, name=f"retention_{policy.time_field}", **options)
+            return
+
+        name, info = existing
+        if expire is not None and info.get("expireAfterSeconds") != expire:
+            # Change the expiry in place instead of dropping and rebuilding the index
+            await self.db.command({
+                "collMod": policy.collection,
+                "index": {"keyPattern": {policy.time_field: 1}, "expireAfterSeconds": expire},
+            })
+            logger.info(f"Retention: {policy.collection}.{name} now expires after {policy.max_age_days}d")
+        elif expire is None and "expireAfterSeconds" in info:
+            logger.warning(
+                f"Retention: {policy.collection}.{name} is a TTL index but the policy archives; "
+                f"drop it to archive instead of expiring"
+            )
+
+    async def _storage(self, name: str) -> Dict[str, int]:
+        try:
+            stats = await self.db[name].aggregate([{"$collStats": {"storageStats": {}}}]).to_list(1)
+            storage = stats[0]["storageStats"] if stats else {}
+        except OperationFailure:
+            storage = {}
+        return {"size": int(storage.get("size", 0)), "indexes": int(storage.get("totalIndexSize", 0))}
+
+    async def _write_archive(self, policy: RetentionPolicy, docs: List[dict]):
+        if policy.archive_to == "collection":
+            try:
+                await self.db[f"{policy.collection}_archive"].insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Already archived by an earlier run that died before deleting
+                if any(err.get("code") != DUPLICATE_KEY_ERROR for err in e.details.get("writeErrors", [])):
+                    raise
+        else:
+            await asyncio.to_thread(self._append_file, policy, docs)
+
+    def _append_file(self, policy: RetentionPolicy, docs: List[dict]):
+        directory = os.path.join(RETENTION_ARCHIVE_DIR, policy.collection)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{datetime.now(timezone.utc):%Y-%m-%d}.jsonl.gz")
+        lines = "".join(json_util.dumps(doc, json_options=JSON_OPTIONS) + "\n" for doc in docs)
+        # Appending starts a new gzip member; readers decompress concatenated members as one stream
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _archive(self, policy: RetentionPolicy, cutoff: datetime, report: CollectionReport):
+        collection = self.db[policy.collection]
+        query = policy.expired(cutoff)
+        while report.deleted < RETENTION_MAX_DOCS_PER_RUN:
+            limit = min(RETENTION_BATCH_SIZE, RETENTION_MAX_DOCS_PER_RUN - report.deleted)
+            docs = await collection.find(query).sort(policy.time_field, ASCENDING).limit(limit).to_list(limit)
+            if not docs:
+                break
+            # Written (and fsynced, for files) before anything is deleted
+            await self._write_archive(policy, docs)
+            report.archived += len(docs)
+            result = await collection.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+            report.deleted += result.deleted_count
+            await asyncio.sleep(RETENTION_BATCH_PAUSE_SECONDS)
+
+    async def apply(self, policy: RetentionPolicy) -> CollectionReport:
+        report = CollectionReport(collection=policy.collection, mode=policy.mode)
+        cutoff = datetime.now(timezone.utc) - timedelta(days=policy.max_age_days)
+        before = await self._storage(policy.collection)
+        try:
+            if policy.mode == "archive":
+                await self._archive(policy, cutoff, report)
+            report.pending = await self.db[policy.collection].count_documents(policy.expired(cutoff))
+        except Exception as e:
+            logger.error(f"Retention for {policy.collection} failed: {e}")
+            report.error = str(e)
+        after = await self._storage(policy.collection)
+        report.data_bytes_before, report.data_bytes_after = before["size"], after["size"]
+        report.index_bytes_before, report.index_bytes_after = before["indexes"], after["indexes"]
+        # TTL deletes happen in the background, so TTL collections show up as sizes across reports
+        # rather than here. Freed pages are reused by WiredTiger; they return to the OS only after compact.
+        report.reclaimed_bytes = max(0, before["size"] - after["size"]) + max(0, before["indexes"] - after["indexes"])
+        return report
+
+    async def run(self) -> RetentionReport:
+        async with self._running:
+            report = RetentionReport(started_at=datetime.now(timezone.utc))
+            await self.ensure_indexes()
+            for policy in self.policies:
+                if policy.enabled:
+                    report.collections.append(await self.apply(policy))
+            report.reclaimed_bytes = sum(c.reclaimed_bytes for c in report.collections)
+            report.finished_at = datetime.now(timezone.utc)
+            self.last_report = report
+            logger.info(
+                f"Retention run: {sum(c.deleted for c in report.collections)} documents removed, "
+                f"{report.reclaimed_bytes} bytes reclaimed"
+            )
+            return report
+
+    async def _acquire_lock(self) -> bool:
+        r = await get_redis()
+        if not r:
+            return True
+        try:
+            return bool(await r.set(LOCK_KEY, os.getpid(), nx=True, ex=max(60, RETENTION_INTERVAL_SECONDS // 2)))
+        except Exception as e:
+            logger.error(f"Retention lock failed: {e}")
+            return True
+
+    async def _loop(self):
+        try:
+            await self.ensure_indexes()
+        except Exception as e:
+            logger.error(f"Retention index setup failed: {e}")
+        while True:
+            await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+            if not await self._acquire_lock():
+                continue
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}")
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+retention = RetentionManager()
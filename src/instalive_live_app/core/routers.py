@@ -0,0 +1,114 @@
+import os
+from typing import Optional, Set, Tuple, Union
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+from instalive_live_app.core.blob_store import (
+    BLOB_NAME, PRECOMPRESSED_ENCODINGS, PRIVATE_URL_PREFIX, blob_path, compressible, content_type_of,
+)
+from instalive_live_app.users.models.user_models import UserModel
+from instalive_live_app.users.models.moderator_models import ModeratorModel
+from instalive_live_app.users.models.kyc_models import KYCModel
+from instalive_live_app.users.utils.get_current_user import get_current_user
+from instalive_live_app.users.utils.user_role import UserRole
+
+router = APIRouter(prefix="/blobs", tags=["Blobs"])
+
+# A blob's URL changes whenever its bytes do, so caches may keep it forever
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Private blobs are identity documents; nothing between us and the client may keep them
+NO_STORE = "private, no-store"
+
+
+def accepted_encodings(header: Optional[str]) -> Set[str]:
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in tags
+
+
+def _pick(path: str, accepted: Set[str], content_type: str) -> Tuple[str, Optional[str], os.stat_result]:
+    """The file to send (a precompressed copy if the client takes one), its encoding and stat."""
+    if compressible(content_type):
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS.items():
+            if encoding in accepted:
+                try:
+                    return path + suffix, encoding, os.stat(path + suffix)
+                except FileNotFoundError:
+                    pass
+    return path, None, os.stat(path)
+
+
+async def can_read_private(user: Union[UserModel, ModeratorModel], url: str) -> bool:
+    """Admins and moderators review KYC scans; otherwise only their owner sees them."""
+    if isinstance(user, ModeratorModel) or user.role == UserRole.ADMIN:
+        return True
+    return await KYCModel.find_one(
+        {"user.$id": user.id, "$or": [{"id_front": url}, {"id_back": url}]}
+    ) is not None
+
+
+@router.api_route("/private/{name}", methods=["GET", "HEAD"])
+async def get_private_blob(name: str, current_user: Union[UserModel, ModeratorModel] = Depends(get_current_user)):
+    """Serves a private blob (a KYC scan) to the users allowed to see it, never cached."""
+    if not BLOB_NAME.match(name) or not await can_read_private(current_user, PRIVATE_URL_PREFIX + name):
+        # Same answer whether it exists or not
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    path = blob_path(name, private=True)
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return FileResponse(path, media_type=content_type_of(name), headers={"cache-control": NO_STORE},
+                        stat_result=stat_result)
+
+
+@router.api_route("/{name}", methods=["GET", "HEAD"])
+async def get_blob(name: str, request: Request):
+    """
+    Serves a stored blob with a strong ETag and an immutable Cache-Control.
+    FileResponse handles Range/If-Range and hands the file to the server for zero-copy
+    sending when it supports the ASGI pathsend extension.
+    """
+    if not BLOB_NAME.match(name):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    content_type = content_type_of(name)
+    try:
+        path, encoding, stat_result = await run_in_threadpool(
+            _pick, blob_path(name), accepted_encodings(request.headers.get("accept-encoding")), content_type
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    # The name is the content hash, so it is the ETag; each encoding is its own representation
+    stem = os.path.splitext(name)[0]
+    headers = {
+        "etag": f'"{stem}-{encoding}"' if encoding else f'"{stem}"',
+        "cache-control": IMMUTABLE,
+    }
+    if compressible(content_type):
+        headers["vary"] = "Accept-Encoding"
+    if etag_matches(request.headers.get("if-none-match"), headers["etag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if encoding:
+        headers["content-encoding"] = encoding
+    return FileResponse(path, media_type=content_type, headers=headers, stat_result=stat_result)
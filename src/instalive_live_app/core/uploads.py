@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import tempfile
+from typing import BinaryIO, Dict, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+from instalive_live_app.core import blob_store
+
+CHUNK_SIZE = 64 * 1024
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+# Multipart boundaries and part headers on top of the file bytes
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Content type -> stored extension; the extension always comes from the sniffed type, never the client
+IMAGE_TYPES = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+CHAT_IMAGE_TYPES = {**IMAGE_TYPES, "image/gif": ".gif"}
+
+# Upload routes and the most bytes their body may carry, checked before the body is read
+UPLOAD_ROUTES: Dict[str, int] = {
+    "/api/v1/users/my_profile/upload-profile-image": MAX_IMAGE_BYTES,
+    "/api/v1/users/my_profile/upload/cover-image": MAX_IMAGE_BYTES,
+    "/api/v1/users/kyc/submit": 2 * MAX_IMAGE_BYTES,
+    "/api/v1/chat/upload-image": MAX_IMAGE_BYTES,
+}
+
+
+def sniff_image(head: bytes) -> Optional[str]:
+    """Content type from the file's magic bytes, or None if it isn't a known image format."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return None
+
+
+def _too_large(max_bytes: int, label: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"{label} size must be under {max_bytes // (1024 * 1024)}MB",
+    )
+
+
+def _copy(source: BinaryIO, directory: str, max_bytes: int, allowed: Dict[str, str], label: str) -> Tuple[str, str, str, int]:
+    """
+    Runs in a worker thread: copies `source` chunk by chunk into a temp file in `directory`,
+    hashing as it goes and stopping at the first chunk past max_bytes.
+    Returns (temp path, sha256, content type, size).
+    """
+    source.seek(0)
+    head = source.read(CHUNK_SIZE)
+    content_type = sniff_image(head)
+    if content_type not in allowed:
+        allowed_names = ", ".join(ext.lstrip(".").upper() for ext in allowed.values())
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{label}: Only {allowed_names} images are allowed")
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        size = 0
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as out:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes, label)
+                digest.update(chunk)
+                out.write(chunk)
+                chunk = source.read(CHUNK_SIZE)
+        return tmp_path, digest.hexdigest(), content_type, size
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+async def save_upload(
+    upload: UploadFile,
+    max_bytes: int = MAX_IMAGE_BYTES,
+    allowed: Dict[str, str] = IMAGE_TYPES,
+    label: str = "Image",
+    private: bool = False,
+) -> str:
+    """
+    Stores an uploaded image in the blob store and returns its /blobs URL (/blobs/private
+    with `private`), which counts as one reference; pass it to blob_store.release when
+    the field stops pointing at it.
+    The copy runs in the thread pool with O(CHUNK_SIZE) memory, so the event loop
+    is never blocked on disk I/O however large or numerous the uploads are.
+    """
+    tmp_path, sha, content_type, size = await run_in_threadpool(
+        _copy, upload.file, blob_store.temp_dir(), max_bytes, allowed, label
+    )
+    return await blob_store.store(tmp_path, sha, allowed[content_type], content_type, size, private)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects upload requests whose Content-Length is already over the route's limit with
+    a 413, before the multipart body is received and spooled to disk. Bodies without a
+    Content-Length are still capped per file by save_upload.
+    """
+
+    def __init__(self, app, routes: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.routes = routes if routes is not None else UPLOAD_ROUTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        max_bytes = self.routes.get(scope["path"])
+        if max_bytes is None:
+            return await self.app(scope, receive, send)
+
+        for key, value in scope["headers"]:
+            if key == b"content-length":
+                if value.isdigit() and int(value) > max_bytes + MULTIPART_OVERHEAD:
+                    body = json.dumps({
+                        "status": "error",
+                        "message": f"Upload must be under {max_bytes // (1024 * 1024)}MB",
+                        "code": 413,
+                    }).encode()
+                    await send({
+                        "type": "http.response.start",
+                        "status": 413,
+                        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                                    (b"connection", b"close")],
+                    })
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                break
+        await self.app(scope, receive, send)
@@ -17,8 +17,29 @@ from instalive_live_app.users.models.moderator_models import ModeratorModel
 from instalive_live_app.admin.models import SystemConfigModel, SecurityAuditLogModel
 from instalive_live_app.finance.models.payout import PayoutConfigModel, BeneficiaryModel, PayoutRequestModel
 from instalive_live_app.users.models.apology_models import ApologyModel
-from instalive_live_app.notifications.models import NotificationModel
+from instalive_live_app.notifications.models import NotificationModel, BroadcastNotificationModel
 from instalive_live_app.finance.models.stripe_models import ProcessedStripeEvent
+from instalive_live_app.chating.utils.presence import presence
+from instalive_live_app.chating.utils.heartbeat import heartbeat_scheduler
+from instalive_live_app.core.redis_client import close_redis
+from instalive_live_app.notifications.outbox import outbox
+from instalive_live_app.core.retention import retention
+from instalive_live_app.users.utils.email_queue import email_queue
+from instalive_live_app.users.models.email_models import OutboundEmailModel
+from instalive_live_app.users.utils.google_auth import google_verifier
+from instalive_live_app.finance.utils.stripe_events import stripe_event_worker
+from instalive_live_app.finance.utils.stripe_client import close_stripe_client
+from instalive_live_app.streaming.utils.stream_search import backfill_host_names
+from instalive_live_app.core.image_variants import image_variants
+from instalive_live_app.core.models import BlobModel
+from instalive_live_app.core.blob_store import blob_collector
+from instalive_live_app.streaming.utils.viewer_tracker import viewer_tracker
+from instalive_live_app.streaming.utils.stream_analytics import analytics_recorder
+from instalive_live_app.streaming.utils.trending import trending
+from instalive_live_app.streaming.utils.leaderboards import leaderboards
+from instalive_live_app.streaming.utils.reconciler import stream_reconciler
+from instalive_live_app.streaming.models.analytics import StreamAnalyticsBucketModel
+from instalive_live_app.streaming.utils.livekit_client import close_livekit_api
 
 MONGODB_URL = os.getenv("MONGODB_URL")
 DATABASE_NAME = os.getenv("DATABASE_NAME")
@@ -44,8 +65,12 @@ MODELS = [
     BeneficiaryModel,
     PayoutRequestModel,
     NotificationModel,
+    BroadcastNotificationModel,
     ApologyModel,
-    ProcessedStripeEvent
+    ProcessedStripeEvent,
+    OutboundEmailModel,
+    BlobModel,
+    StreamAnalyticsBucketModel
 ]
 
 
@@ -66,7 +91,44 @@ async def lifespan(app: FastAPI):
     #     print(f"⚠️ Error dropping collection: {e}")
     # ----------------------------------------
 
+    try:
+        await backfill_host_names()
+    except Exception as e:
+        logger.error(f"host_name backfill failed: {e}")
+
+    await outbox.start()
+    presence.start()
+    heartbeat_scheduler.start()
+    retention.start()
+    email_queue.start()
+    stripe_event_worker.start()
+    blob_collector.start()
+    viewer_tracker.start()
+    analytics_recorder.start()
+    trending.start()
+    stream_reconciler.start()
+
     yield
 
+    # Writes the last viewer counts, so before Redis and Mongo go away
+    await stream_reconciler.stop()
+    await trending.stop()
+    await viewer_tracker.stop()
+    await analytics_recorder.stop()
+    # Pushes in flight use the LiveKit client
+    await leaderboards.stop()
+    await close_livekit_api()
+    await blob_collector.stop()
+    await image_variants.stop()
+    await stripe_event_worker.stop()
+    await close_stripe_client()
+    await email_queue.stop()
+    await google_verifier.aclose()
+    await retention.stop()
+    await heartbeat_scheduler.stop()
+    await presence.stop()
+    # Flush queued notifications before the Mongo client goes away
+    await outbox.stop()
+    await close_redis()
     client.close()
     logger.info("MongoDB connection closed.")
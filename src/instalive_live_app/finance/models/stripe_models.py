@@ -1,12 +1,38 @@
 from beanie import Document
 from pydantic import Field
 from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Dict, Optional
+from pymongo import IndexModel, ASCENDING
 from instalive_live_app.core.base.base import BaseCollection
 
+
+class StripeEventStatus(str, Enum):
+    PENDING = "pending"        # received, waiting for the worker
+    PROCESSING = "processing"  # claimed by a worker until locked_until
+    DONE = "done"
+    IGNORED = "ignored"        # event type we don't act on
+    FAILED = "failed"          # gave up after repeated errors; replay to retry
+
+
 class ProcessedStripeEvent(BaseCollection):
-    event_id: str = Field(unique=True)
+    """
+    Every Stripe webhook event we accepted, inserted before any work is done.
+    The unique index on event_id makes the insert the idempotency check.
+    """
+    event_id: str
     type: str
+    status: StripeEventStatus = StripeEventStatus.PENDING
+    # The event's data.object, so the worker doesn't need to call Stripe again; None for ignored events
+    payload: Optional[Dict[str, Any]] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+    locked_until: Optional[datetime] = None
     processed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     class Settings:
         name = "processed_stripe_events"
+        indexes = [
+            IndexModel([("event_id", ASCENDING)], unique=True),
+            IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)]),
+        ]
@@ -19,6 +19,10 @@ class TransactionReason(str, Enum):
     WITHDRAW = "withdraw"
     HOST_STREAM_FEE_PAID = "host_stream_fee_paid"
 
+# The transactions that count: top-ups whose coins are not credited yet are left out.
+# Documents from before `applied` existed have no such field and count.
+APPLIED_TRANSACTIONS = {"applied": {"$ne": False}}
+
 class TransactionModel(BaseCollection):
     user: Link[UserModel]
     amount: int
@@ -26,6 +30,8 @@ class TransactionModel(BaseCollection):
     reason: TransactionReason
     related_entity_id: Optional[str] = None # e.g. LiveStream ID, GiftLog ID
     description: Optional[str] = None
+    # False while a Stripe top-up is recorded but its coins are not yet credited (see finance/utils/stripe_events.py)
+    applied: bool = True
     
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends
 from typing import List
 from instalive_live_app.users.utils.get_current_user import get_current_user
 from instalive_live_app.users.models.user_models import UserModel
-from instalive_live_app.finance.models.transaction import TransactionModel
+from instalive_live_app.finance.models.transaction import TransactionModel, APPLIED_TRANSACTIONS
 from instalive_live_app.finance.schemas.finance import TransactionResponse
 from instalive_live_app.users.utils.populate_kyc import populate_user_kyc
 
@@ -20,6 +20,7 @@ async def get_transaction_history(
     """
     transactions = await TransactionModel.find(
         TransactionModel.user.id == current_user.id,
+        APPLIED_TRANSACTIONS,
         fetch_links=True
     ).sort(-TransactionModel.created_at).skip(skip).limit(limit).to_list()
     
@@ -1,34 +1,45 @@
+import json
 import stripe
-import os
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
 from instalive_live_app.users.utils.get_current_user import get_current_user
 from instalive_live_app.users.models.user_models import UserModel
 from instalive_live_app.finance.schemas.finance import StripePaymentRequest, StripePaymentResponse
-from instalive_live_app.finance.models.transaction import TransactionModel, TransactionType, TransactionReason
-from instalive_live_app.notifications.utils import send_notification
-from instalive_live_app.notifications.models import NotificationModel
-from instalive_live_app.finance.models.stripe_models import ProcessedStripeEvent
+from instalive_live_app.finance.utils.stripe_client import get_stripe_client, STRIPE_WEBHOOK_SECRET
+from instalive_live_app.finance.utils.stripe_events import HANDLED_EVENT_TYPES, record_event, stripe_event_worker
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/finance/stripe", tags=["Stripe Payment"])
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
-webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
 
 @router.post("/create-payment-intent", response_model=StripePaymentResponse)
 async def create_payment_intent(
     data: StripePaymentRequest,
-    current_user: UserModel = Depends(get_current_user)
+    current_user: UserModel = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
+    """
+    Send an Idempotency-Key header to make client retries safe: Stripe returns the
+    same PaymentIntent for a repeated key instead of creating a second one.
+    """
+    options = {}
+    if idempotency_key:
+        # Scoped to the user so two accounts can't collide on a client-chosen key
+        options["idempotency_key"] = f"pi:{current_user.id}:{idempotency_key}"
     try:
-        # Create a PaymentIntent with the order amount and currency
         # Stripe expects amount in cents
-        intent = stripe.PaymentIntent.create(
-            amount=int(data.amount * 100),
-            currency='usd',
-            metadata={
-                'user_id': str(current_user.id),
-                'tokens': str(data.tokens)
-            }
+        intent = await get_stripe_client().payment_intents.create_async(
+            {
+                "amount": int(data.amount * 100),
+                "currency": "usd",
+                "metadata": {
+                    "user_id": str(current_user.id),
+                    "tokens": str(data.tokens),
+                },
+            },
+            options=options,
         )
         return {
             "client_secret": intent.client_secret,
@@ -37,77 +48,30 @@ async def create_payment_intent(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
 @router.post("/webhook")
 async def stripe_webhook(request: Request):
+    """
+    Verifies and records the event, then hands it to the background worker.
+    Stripe gets its 2xx without waiting on the balance update.
+    """
     payload = await request.body()
     sig_header = request.headers.get('stripe-signature')
 
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, webhook_secret
-        )
-    except ValueError as e:
-        # Invalid payload
+        event = stripe.Webhook.construct_event(payload, sig_header, STRIPE_WEBHOOK_SECRET)
+    except ValueError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payload")
-    except stripe.error.SignatureVerificationError as e:
-        # Invalid signature
+    except stripe.SignatureVerificationError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid signature")
 
-    # Handle the event
-    print(f"Stripe Webhook received event: {event['type']}")
-    
-    # Check for Idempotency: Store processed Stripe event.id
-    existing_event = await ProcessedStripeEvent.find_one(ProcessedStripeEvent.event_id == event['id'])
-    if existing_event:
-        print(f"Duplicate Stripe event detected: {event['id']}")
-        return {"status": "already_processed"}
-
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        
-        # Verify status
-        if payment_intent['status'] != 'succeeded':
-             print(f"PaymentIntent status is {payment_intent['status']}, not succeeded. Skipping.")
-             return {"status": "ignored"}
-
-        # Record event as processed
-        await ProcessedStripeEvent(event_id=event['id'], type=event['type']).insert()
+    logger.info(f"Stripe Webhook received event: {event.type} ({event.id})")
 
-        user_id = payment_intent['metadata'].get('user_id')
-        tokens = payment_intent['metadata'].get('tokens')
-
-        print(f"PaymentIntent succeeded. UserID: {user_id}, Tokens: {tokens}")
-
-        if user_id and tokens:
-            user = await UserModel.get(user_id)
-            if user:
-                # Atomic increment
-                await user.update({"$inc": {UserModel.coins: int(tokens)}})
-                await user.fetch()
-
-                # Record transaction
-                await TransactionModel(
-                    user=user,
-                    amount=int(tokens),
-                    transaction_type=TransactionType.CREDIT,
-                    reason=TransactionReason.TOPUP,
-                    description=f"Stripe Topup: ${payment_intent['amount'] / 100}"
-                ).insert()
-
-
-                print(f"User {user.email} topped up with {tokens} tokens via Stripe successfully.")
-                
-                # Send Notification
-                await send_notification(
-                    user=user,
-                    title="Token Top-up Successful",
-                    body=f"You have successfully purchased {tokens} tokens via Stripe.",
-                    type=NotificationType.FINANCE,
-                    related_entity_id=payment_intent['id']
-                )
-            else:
-                print(f" User not found for ID: {user_id}")
-        else:
-            print(f"Missing metadata in PaymentIntent: user_id={user_id}, tokens={tokens}")
+    # Store data.object as plain JSON from the verified body; ignored events only need their id
+    data_object = json.loads(payload)["data"]["object"] if event.type in HANDLED_EVENT_TYPES else None
+    if not await record_event(event.id, event.type, data_object):
+        logger.info(f"Duplicate Stripe event detected: {event.id}")
+        return {"status": "already_processed"}
 
-    return {"status": "success"}
+    stripe_event_worker.notify()
+    return {"status": "accepted"}
@@ -0,0 +1,38 @@
+import os
+from typing import Optional
+import stripe
+
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+# The SDK retries network errors and 409/5xx itself, reusing the same idempotency key
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))
+STRIPE_TIMEOUT_SECONDS = 20
+
+_client: Optional[stripe.StripeClient] = None
+_http_client: Optional[stripe.HTTPXClient] = None
+
+
+def get_stripe_client() -> stripe.StripeClient:
+    """
+    Shared StripeClient on the SDK's httpx transport: `*_async` methods don't block
+    the event loop and reuse one connection pool.
+    """
+    global _client, _http_client
+    if _client is None:
+        if not STRIPE_SECRET_KEY:
+            raise RuntimeError("STRIPE_SECRET_KEY is not configured")
+        _http_client = stripe.HTTPXClient(timeout=STRIPE_TIMEOUT_SECONDS)
+        _client = stripe.StripeClient(
+            STRIPE_SECRET_KEY,
+            http_client=_http_client,
+            max_network_retries=STRIPE_MAX_NETWORK_RETRIES,
+        )
+    return _client
+
+
+async def close_stripe_client():
+    global _client, _http_client
+    if _http_client is not None:
+        await _http_client.close_async()
+    _client = None
+    _http_client = None
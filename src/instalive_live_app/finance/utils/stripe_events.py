@@ -0,0 +1,178 @@
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from beanie import UpdateResponse
+from pymongo.errors import DuplicateKeyError
+from instalive_live_app.users.models.user_models import UserModel
+from instalive_live_app.finance.models.stripe_models import ProcessedStripeEvent, StripeEventStatus
+from instalive_live_app.finance.models.transaction import TransactionModel, TransactionType, TransactionReason
+from instalive_live_app.notifications.utils import send_notification
+from instalive_live_app.notifications.models import NotificationType
+
+logger = logging.getLogger(__name__)
+
+# Event types the worker acts on; everything else is recorded as ignored
+HANDLED_EVENT_TYPES = {"payment_intent.succeeded"}
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "5"))
+# A claimed event is retried by another worker if not finished within this time
+STRIPE_EVENT_LEASE = timedelta(minutes=2)
+# The worker also polls, to pick up events from other processes and expired leases
+STRIPE_EVENT_POLL_SECONDS = 5.0
+# How many credited event ids a user document remembers (only guards retries of an interrupted credit)
+APPLIED_EVENTS_KEPT = 50
+
+_NAMESPACE = uuid.UUID("7f0c4a8e-2b1d-4c6e-9a55-1d3b7e9f2c40")
+
+
+async def record_event(event_id: str, event_type: str, payload: Optional[dict]) -> bool:
+    """
+    Insert-first idempotency: returns False if Stripe already delivered this event.
+    """
+    status = StripeEventStatus.PENDING if event_type in HANDLED_EVENT_TYPES else StripeEventStatus.IGNORED
+    try:
+        await ProcessedStripeEvent(event_id=event_id, type=event_type, status=status, payload=payload).insert()
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def credit_payment_intent(event_id: str, payment_intent: dict):
+    if payment_intent.get("status") != "succeeded":
+        logger.info(f"PaymentIntent {payment_intent.get('id')} status is {payment_intent.get('status')}, skipping")
+        return
+
+    metadata = payment_intent.get("metadata") or {}
+    user_id, tokens = metadata.get("user_id"), metadata.get("tokens")
+    if not user_id or not tokens:
+        logger.warning(f"Missing metadata in PaymentIntent {payment_intent.get('id')}: user_id={user_id}, tokens={tokens}")
+        return
+
+    user = await UserModel.get(user_id)
+    if not user:
+        logger.warning(f"User not found for Stripe event {event_id}: {user_id}")
+        return
+
+    # The ledger entry is the guard: its id is derived from the event, so only the first
+    # delivery inserts it, however long ago the event was processed
+    transaction_id = uuid.uuid5(_NAMESPACE, event_id)
+    try:
+        await TransactionModel(
+            id=transaction_id,
+            user=user,
+            amount=int(tokens),
+            transaction_type=TransactionType.CREDIT,
+            reason=TransactionReason.TOPUP,
+            related_entity_id=payment_intent.get("id"),
+            description=f"Stripe Topup: ${payment_intent['amount'] / 100}",
+            applied=False,
+        ).insert()
+    except DuplicateKeyError:
+        existing = await TransactionModel.get_motor_collection().find_one({"_id": transaction_id}, {"applied": 1})
+        if existing is None or existing.get("applied", True):
+            return
+        # A previous attempt stopped between the insert and the credit; finish it
+
+    # The event marker keeps a retry from crediting twice if it stopped after the increment
+    await UserModel.get_motor_collection().update_one(
+        {"_id": user.id, "applied_stripe_events": {"$ne": event_id}},
+        {
+            "$inc": {"coins": int(tokens)},
+            "$push": {"applied_stripe_events": {"$each": [event_id], "$slice": -APPLIED_EVENTS_KEPT}},
+        },
+    )
+    await TransactionModel.get_motor_collection().update_one({"_id": transaction_id}, {"$set": {"applied": True}})
+
+    await send_notification(
+        user=user,
+        title="Token Top-up Successful",
+        body=f"You have successfully purchased {tokens} tokens via Stripe.",
+        type=NotificationType.FINANCE,
+        related_entity_id=payment_intent.get("id")
+    )
+    logger.info(f"User {user.email} topped up with {tokens} tokens via Stripe")
+
+
+async def process_event(event: ProcessedStripeEvent):
+    if event.type == "payment_intent.succeeded":
+        await credit_payment_intent(event.event_id, event.payload)
+
+
+class StripeEventWorker:
+    """
+    Works through recorded webhook events in the background so the webhook can
+    acknowledge Stripe right after the insert. Events are claimed with a lease,
+    retried up to STRIPE_EVENT_MAX_ATTEMPTS times, and then marked failed.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _claim(self) -> Optional[ProcessedStripeEvent]:
+        now = datetime.now(timezone.utc)
+        return await ProcessedStripeEvent.find_one({
+            "$or": [
+                {"status": StripeEventStatus.PENDING},
+                {"status": StripeEventStatus.PROCESSING, "locked_until": {"$lt": now}},
+            ],
+        }).update(
+            {"$set": {"status": StripeEventStatus.PROCESSING, "locked_until": now + STRIPE_EVENT_LEASE},
+             "$inc": {"attempts": 1}},
+            response_type=UpdateResponse.NEW_DOCUMENT,
+        )
+
+    async def _finish(self, event: ProcessedStripeEvent, error: Optional[Exception]):
+        if error is None:
+            update = {"status": StripeEventStatus.DONE, "processed_at": datetime.now(timezone.utc), "last_error": None}
+        elif event.attempts >= STRIPE_EVENT_MAX_ATTEMPTS:
+            update = {"status": StripeEventStatus.FAILED, "last_error": str(error)}
+        else:
+            # Leave it claimed; it becomes eligible again when the lease runs out (backoff)
+            update = {"last_error": str(error)}
+        await ProcessedStripeEvent.find_one(ProcessedStripeEvent.id == event.id).update({"$set": update})
+
+    async def run_once(self) -> int:
+        """Process every claimable event; returns how many were handled."""
+        handled = 0
+        while True:
+            event = await self._claim()
+            if event is None:
+                return handled
+            error = None
+            try:
+                await process_event(event)
+            except Exception as e:
+                logger.error(f"Stripe event {event.event_id} failed (attempt {event.attempts}): {e}")
+                error = e
+            await self._finish(event, error)
+            handled += 1
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Stripe event worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), STRIPE_EVENT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+stripe_event_worker = StripeEventWorker()
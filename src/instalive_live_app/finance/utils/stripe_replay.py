@@ -0,0 +1,67 @@
+"""
+Re-delivers Stripe events the webhook may have missed and retries failed ones.
+
+    python -m instalive_live_app.finance.utils.stripe_replay --since 2025-01-01
+
+Events already recorded are skipped by the unique event_id index, and a user is
+never credited twice for the same event, so the command is safe to re-run.
+"""
+import asyncio
+import argparse
+import logging
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from instalive_live_app.finance.models.stripe_models import ProcessedStripeEvent, StripeEventStatus
+from instalive_live_app.finance.utils.stripe_client import get_stripe_client, close_stripe_client
+from instalive_live_app.finance.utils.stripe_events import record_event, stripe_event_worker, HANDLED_EVENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+async def replay(since: datetime) -> dict:
+    fetched = inserted = 0
+    for event_type in sorted(HANDLED_EVENT_TYPES):
+        events = await get_stripe_client().events.list_async(
+            {"type": event_type, "created": {"gte": int(since.timestamp())}, "limit": 100}
+        )
+        async for event in events.auto_paging_iter():
+            fetched += 1
+            if await record_event(event.id, event.type, event.data.object.to_dict_recursive()):
+                inserted += 1
+
+    retried = await ProcessedStripeEvent.find(
+        ProcessedStripeEvent.status == StripeEventStatus.FAILED
+    ).update({"$set": {"status": StripeEventStatus.PENDING, "attempts": 0, "locked_until": None}})
+
+    processed = await stripe_event_worker.run_once()
+    return {
+        "fetched": fetched,
+        "inserted": inserted,
+        "retried": retried.modified_count if retried else 0,
+        "processed": processed,
+    }
+
+
+async def main(since: datetime):
+    from instalive_live_app.db import MODELS, MONGODB_URL, DATABASE_NAME
+
+    client = AsyncIOMotorClient(MONGODB_URL, uuidRepresentation="standard")
+    await init_beanie(database=client[DATABASE_NAME], document_models=MODELS)
+    try:
+        print(await replay(since))
+    finally:
+        await close_stripe_client()
+        client.close()
+
+
+def parse_since(value: str) -> datetime:
+    since = datetime.fromisoformat(value)
+    return since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=parse_since, required=True, help="ISO date or datetime (UTC if no offset)")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args().since))
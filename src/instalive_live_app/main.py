@@ -20,6 +20,9 @@ from instalive_live_app.finance.routers.payout import router as payout_router
 from instalive_live_app.notifications.routers import router as notification_router
 from instalive_live_app.finance.routers.stripe_routers import router as stripe_router
 from instalive_live_app.users.routers.apology_routers import router as apology_router
+from instalive_live_app.core.rate_limit import RateLimitMiddleware
+from instalive_live_app.core.uploads import UploadSizeLimitMiddleware
+from instalive_live_app.core.routers import router as blob_router
 # Load environment variables
 import os
 load_dotenv()
@@ -46,6 +49,10 @@ origins = [
     "https://instalive.cloud"
 ]
 
+# Added before CORS so it runs inside it and 429s still carry CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -79,3 +86,5 @@ app.include_router(payout_router,prefix="/api/v1")
 app.include_router(notification_router,prefix="/api/v1")
 app.include_router(stripe_router,prefix="/api/v1")
 app.include_router(apology_router,prefix="/api/v1")
+# Served next to /uploads, outside the API prefix
+app.include_router(blob_router)
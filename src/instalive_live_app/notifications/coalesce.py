@@ -0,0 +1,142 @@
+import os
+import uuid
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+from bson import DBRef
+from pymongo import UpdateOne
+from instalive_live_app.users.models.user_models import UserModel
+from instalive_live_app.notifications.models import NotificationType
+
+# Events for the same (user, group_key) inside one window update a single notification
+COALESCE_WINDOW_SECONDS = int(os.getenv("NOTIFICATION_COALESCE_WINDOW_SECONDS", "3600"))
+# How many recent actors an aggregate notification remembers
+MAX_ACTORS = 5
+
+_NAMESPACE = uuid.UUID("0b6b7a52-5d0c-4f8e-9a43-3f1f4c2d6e10")
+
+
+def coalesced_id(user_id: UUID, group_key: str, at: datetime) -> UUID:
+    """Deterministic _id of the aggregate notification for this user, group and window."""
+    bucket = int(at.timestamp() // COALESCE_WINDOW_SECONDS)
+    return uuid.uuid5(_NAMESPACE, f"{user_id}:{group_key}:{bucket}")
+
+
+@dataclass
+class CoalescedEvent:
+    """
+    One or more events to fold into an aggregate notification.
+    `body` is shown while the aggregate holds a single event; after that the
+    body becomes "<count><summary>", e.g. "12 likes on your live stream".
+    """
+    id: UUID
+    user_id: UUID
+    group_key: str
+    type: str
+    title: str
+    body: str
+    summary: str
+    related_entity_id: Optional[str] = None
+    actors: List[str] = field(default_factory=list)
+    count: int = 1
+    at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def merge(self, later: "CoalescedEvent"):
+        """Fold a later event for the same notification into this one."""
+        self.count += later.count
+        self.actors = [a for a in self.actors if a not in later.actors] + later.actors
+        self.actors = self.actors[-MAX_ACTORS:]
+        self.title, self.body, self.summary, self.at = later.title, later.body, later.summary, later.at
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def operations(self, user_collection: str = UserModel.Settings.name) -> List[UpdateOne]:
+        """
+        Two updates that must run in order: create the aggregate if it is missing, then
+        fold this event in with a pipeline update so the body is built from the new count.
+        The created document is already a complete notification, so one that never gets
+        its fold (the batch failed in between) still loads and lists.
+        """
+        create = UpdateOne(
+            {"_id": self.id},
+            {"$setOnInsert": {
+                "user": DBRef(user_collection, self.user_id),
+                "type": self.type,
+                "title": self.title,
+                "body": self.body,
+                "related_entity_id": self.related_entity_id,
+                "is_read": False,
+                "group_key": self.group_key,
+                "event_count": 0,
+                "actors": [],
+                "delivered_at": None,
+                "created_at": self.at,
+            }},
+            upsert=True,
+        )
+        count_after = {"$add": ["$event_count", self.count]}
+        fold = UpdateOne(
+            {"_id": self.id},
+            [
+                {"$set": {"event_count": count_after}},
+                {"$set": {
+                    "actors": {"$slice": [
+                        {"$concatArrays": [
+                            {"$filter": {"input": "$actors", "cond": {"$not": [{"$in": ["$$this", self.actors]}]}}},
+                            self.actors,
+                        ]},
+                        -MAX_ACTORS,
+                    ]},
+                    "title": {"$literal": self.title},
+                    "body": {"$cond": [
+                        {"$eq": ["$event_count", 1]},
+                        {"$literal": self.body},
+                        {"$concat": [{"$toString": "$event_count"}, {"$literal": self.summary}]},
+                    ]},
+                    "is_read": False,
+                    # Changed since the client last saw it; send it again
+                    "delivered_at": None,
+                    "created_at": self.at,
+                }},
+            ],
+        )
+        return [create, fold]
+
+
+def merge_events(events: Iterable[CoalescedEvent]) -> List[CoalescedEvent]:
+    """Collapse events that target the same notification, keeping first-seen order."""
+    merged: Dict[UUID, CoalescedEvent] = {}
+    for event in events:
+        if event.id in merged:
+            merged[event.id].merge(event)
+        else:
+            merged[event.id] = CoalescedEvent(**{**event.to_dict(), "actors": list(event.actors)})
+    return list(merged.values())
+
+
+def build_event(
+    user: UserModel,
+    group_key: str,
+    actor_id: str,
+    title: str,
+    body: str,
+    summary: str,
+    type: NotificationType,
+    related_entity_id: Optional[str] = None,
+) -> CoalescedEvent:
+    user_id = user.ref.id if hasattr(user, "ref") else user.id
+    now = datetime.now(timezone.utc)
+    return CoalescedEvent(
+        id=coalesced_id(user_id, group_key, now),
+        user_id=user_id,
+        group_key=group_key,
+        type=type.value,
+        title=title,
+        body=body,
+        summary=summary,
+        related_entity_id=related_entity_id,
+        actors=[actor_id],
+        at=now,
+    )
@@ -0,0 +1,187 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Set
+from uuid import UUID
+from bson import DBRef
+from instalive_live_app.core.rate_limit import TokenBucket
+from instalive_live_app.users.models.user_models import UserModel
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.notifications.models import NotificationModel, NotificationType, BroadcastNotificationModel
+from instalive_live_app.notifications.unread import unread_counter
+from instalive_live_app.chating.utils.presence import presence
+from instalive_live_app.chating.utils.connection_manager import manager
+
+logger = logging.getLogger(__name__)
+
+# Follower ids read per cursor page
+FANOUT_PAGE_SIZE = int(os.getenv("FANOUT_PAGE_SIZE", "1000"))
+# Documents per insert_many
+FANOUT_CHUNK_SIZE = int(os.getenv("FANOUT_CHUNK_SIZE", "500"))
+# Notification writes per second across all fan-outs in this worker
+FANOUT_WRITES_PER_SECOND = float(os.getenv("FANOUT_WRITES_PER_SECOND", "20000"))
+# Fan-outs running at the same time in this worker
+FANOUT_MAX_CONCURRENT = int(os.getenv("FANOUT_MAX_CONCURRENT", "2"))
+# Hosts with at least this many followers get one broadcast document (fan-out-on-read)
+FANOUT_ON_READ_THRESHOLD = int(os.getenv("FANOUT_ON_READ_THRESHOLD", "50000"))
+
+
+@dataclass
+class FanoutResult:
+    followers: int = 0
+    written: int = 0
+    pushed: int = 0
+    fan_out_on_read: bool = False
+    duration_seconds: float = 0.0
+
+
+async def iter_follower_ids(host_id: UUID, page_size: int = FANOUT_PAGE_SIZE) -> AsyncIterator[List[UUID]]:
+    """Page through the ids of a host's followers with an _id cursor (no skip)."""
+    collection = UserModel.get_motor_collection()
+    last_id = None
+    while True:
+        query = {"following.$id": host_id}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = await collection.find(query, {"_id": 1}).sort("_id", 1).limit(page_size).to_list(page_size)
+        if not docs:
+            return
+        ids = [d["_id"] for d in docs]
+        yield ids
+        if len(ids) < page_size:
+            return
+        last_id = ids[-1]
+
+
+class FanoutEngine:
+    """
+    Delivers one host event to all of their followers.
+    Below FANOUT_ON_READ_THRESHOLD every follower gets their own notification, written in
+    rate-limited insert_many chunks as the follower cursor is paged. Above it a single
+    broadcast document is stored and merged into follower feeds at read time.
+    Either way, followers who are online get a WebSocket push.
+    """
+
+    def __init__(
+        self,
+        page_source: Callable[[UUID], AsyncIterator[List[UUID]]] = iter_follower_ids,
+        writer: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+        rate: float = FANOUT_WRITES_PER_SECOND,
+    ):
+        self.page_source = page_source
+        self.writer = writer or self._insert
+        # Shared by all fan-outs, so one large host cannot monopolise the database
+        self.limiter = TokenBucket(capacity=max(rate, FANOUT_CHUNK_SIZE), per_second=rate)
+        self._semaphore = asyncio.Semaphore(FANOUT_MAX_CONCURRENT)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _insert(self, docs: List[dict]):
+        await NotificationModel.get_motor_collection().insert_many(docs, ordered=False)
+        await unread_counter.incr_many({doc["user"].id: 1 for doc in docs})
+
+    async def _push(self, user_ids: List[UUID], event: dict) -> int:
+        online = await presence.filter_online([str(uid) for uid in user_ids])
+        if online:
+            await manager.ensure_redis()
+            await manager.send_to_users(event, online)
+        return len(online)
+
+    async def fan_out(
+        self,
+        host_id: UUID,
+        followers_count: int,
+        title: str,
+        body: str,
+        type: NotificationType,
+        related_entity_id: Optional[str] = None,
+        event: Optional[dict] = None,
+    ) -> FanoutResult:
+        result = FanoutResult(fan_out_on_read=followers_count >= FANOUT_ON_READ_THRESHOLD)
+        start = time.monotonic()
+
+        if result.fan_out_on_read:
+            await BroadcastNotificationModel(
+                host=DBRef(UserModel.Settings.name, host_id),
+                type=type,
+                title=title,
+                body=body,
+                related_entity_id=related_entity_id,
+            ).insert()
+
+        user_collection = UserModel.Settings.name
+        async for page in self.page_source(host_id):
+            result.followers += len(page)
+            if not result.fan_out_on_read:
+                # Raw documents: building 100k Beanie models would dominate the fan-out
+                now = datetime.now(timezone.utc)
+                docs = [
+                    {
+                        "_id": uuid.uuid4(),
+                        "user": DBRef(user_collection, follower_id),
+                        "type": type.value,
+                        "title": title,
+                        "body": body,
+                        "related_entity_id": related_entity_id,
+                        "is_read": False,
+                        "created_at": now,
+                    }
+                    for follower_id in page
+                ]
+                for i in range(0, len(docs), FANOUT_CHUNK_SIZE):
+                    chunk = docs[i:i + FANOUT_CHUNK_SIZE]
+                    await self.limiter.acquire(len(chunk))
+                    await self.writer(chunk)
+                    result.written += len(chunk)
+            if event:
+                try:
+                    result.pushed += await self._push(page, event)
+                except Exception as e:
+                    logger.error(f"Fan-out push failed: {e}")
+
+        result.duration_seconds = time.monotonic() - start
+        return result
+
+    async def go_live(self, host: UserModel, stream: LiveStreamModel) -> FanoutResult:
+        host_name = f"{host.first_name or ''} {host.last_name or ''}".strip() or "Someone you follow"
+        async with self._semaphore:
+            result = await self.fan_out(
+                host_id=host.id,
+                followers_count=host.followers_count,
+                title="Live Now",
+                body=f"{host_name} is live: {stream.title}",
+                type=NotificationType.LIVE,
+                related_entity_id=str(stream.id),
+                event={
+                    "type": "live_started",
+                    "stream_id": str(stream.id),
+                    "host_id": str(host.id),
+                    "host_name": host_name,
+                    "title": stream.title,
+                    "thumbnail": stream.thumbnail,
+                },
+            )
+        logger.info(
+            f"Go-live fan-out for {host.id}: {result.followers} followers, {result.written} written, "
+            f"{result.pushed} pushed, on_read={result.fan_out_on_read} in {result.duration_seconds:.2f}s"
+        )
+        return result
+
+    def schedule_go_live(self, host: UserModel, stream: LiveStreamModel):
+        """Run the go-live fan-out in the background so start_stream returns immediately."""
+        task = asyncio.create_task(self._run_go_live(host, stream))
+        # Keep a reference until done; the event loop only holds weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_go_live(self, host: UserModel, stream: LiveStreamModel):
+        try:
+            await self.go_live(host, stream)
+        except Exception as e:
+            logger.error(f"Go-live fan-out for {host.id} failed: {e}")
+
+
+fanout = FanoutEngine()
@@ -1,8 +1,9 @@
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 from beanie import Document, Link
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from instalive_live_app.core.base.base import BaseCollection
 from instalive_live_app.users.models.user_models import UserModel
 
@@ -20,8 +21,40 @@ class NotificationModel(BaseCollection):
     body: str
     related_entity_id: Optional[str] = None
     is_read: bool = False
-    
+
+    # Coalesced notifications (see notifications/coalesce.py) aggregate many events into one row
+    group_key: Optional[str] = None
+    event_count: int = 1
+    actors: List[str] = []  # ids of the most recent actors, oldest first
+    # Set when the client acknowledges the notification over /chat/ws
+    delivered_at: Optional[datetime] = None
+
+    # For coalesced notifications this is the time of the latest event
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     class Settings:
         name = "notifications"
+        indexes = [
+            IndexModel([("user.$id", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel([("user.$id", ASCENDING), ("is_read", ASCENDING)]),
+        ]
+
+
+class BroadcastNotificationModel(BaseCollection):
+    """
+    One notification addressed to all followers of a host, stored once and merged
+    into each follower's feed at read time (fan-out-on-read for very large hosts).
+    """
+    host: Link[UserModel]
+    type: NotificationType
+    title: str
+    body: str
+    related_entity_id: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "broadcast_notifications"
+        indexes = [
+            IndexModel([("host.$id", ASCENDING), ("created_at", DESCENDING)]),
+        ]
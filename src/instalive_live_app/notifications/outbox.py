@@ -0,0 +1,244 @@
+import os
+import glob
+import asyncio
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+from bson import json_util
+from bson.binary import UuidRepresentation
+from beanie.odm.utils.dump import get_dict
+from pymongo.errors import BulkWriteError
+from instalive_live_app.notifications.models import NotificationModel
+from instalive_live_app.notifications.coalesce import CoalescedEvent, merge_events
+from instalive_live_app.notifications.unread import unread_counter
+from instalive_live_app.notifications.push import push_notifications, push_aggregates
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_SIZE", "500"))
+# How long the worker waits to fill a batch after the first item arrives
+OUTBOX_FLUSH_INTERVAL_SECONDS = float(os.getenv("NOTIFICATION_OUTBOX_FLUSH_INTERVAL", "0.05"))
+OUTBOX_RETRY_DELAY_SECONDS = 1.0
+OUTBOX_MAX_RETRY_DELAY_SECONDS = 30.0
+# Optional write-ahead spill file. When set, every queued notification is appended here
+# before it is acknowledged, and replayed on the next start if the worker died before flushing.
+NOTIFICATION_SPILL_PATH = os.getenv("NOTIFICATION_SPILL_PATH")
+
+DUPLICATE_KEY_ERROR = 11000
+JSON_OPTIONS = json_util.JSONOptions(uuid_representation=UuidRepresentation.STANDARD, tz_aware=True)
+
+# Queue items are notification documents to insert or events to fold into an aggregate
+OutboxItem = Union[dict, CoalescedEvent]
+
+
+class NotificationOutbox:
+    """
+    Write-behind queue for notifications.
+    send_notification enqueues and returns immediately; a background worker persists
+    the queue with insert_many in batches and drains it on shutdown.
+    Notifications carry their _id from the start, so replaying a batch is idempotent.
+    Coalesced events are merged per aggregate within a batch and written with one bulk_write.
+    """
+
+    def __init__(self, spill_path: Optional[str] = NOTIFICATION_SPILL_PATH):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker_task: Optional[asyncio.Task] = None
+        # Batch currently being written, kept so a cancelled flush can be retried on drain
+        self._in_flight: List[OutboxItem] = []
+        self._spill_base = spill_path
+        self._spill_path = f"{spill_path}.{os.getpid()}" if spill_path else None
+        self._spill_file = None
+        # One thread does all spill file I/O, so writes and truncation stay in order off the event loop
+        self._spill_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notification-spill")
+
+    def enqueue(self, notification: NotificationModel):
+        doc = get_dict(notification, to_db=True, keep_nulls=True)
+        self._spill(doc)
+        self._queue.put_nowait(doc)
+
+    def enqueue_coalesced(self, event: CoalescedEvent):
+        self._spill({"coalesce": event.to_dict()})
+        self._queue.put_nowait(event)
+
+    def _spill(self, record: dict):
+        if self._spill_file:
+            line = json_util.dumps(record, json_options=JSON_OPTIONS) + "\n"
+            self._spill_io.submit(_write_spill, self._spill_file, line)
+
+    async def _spill_call(self, fn, *args):
+        return await asyncio.wrap_future(self._spill_io.submit(fn, *args))
+
+    async def _insert(self, items: List[OutboxItem]):
+        docs = [item for item in items if isinstance(item, dict)]
+        events = [item for item in items if isinstance(item, CoalescedEvent)]
+        if docs:
+            try:
+                await NotificationModel.get_motor_collection().insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Duplicates mean the document was already written (spill replay); anything else is a real failure
+                errors = e.details.get("writeErrors", [])
+                if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                    raise
+            # Done; a retry of this batch must not insert them again
+            items[:] = [item for item in items if not isinstance(item, dict)]
+            await unread_counter.incr_many(Counter(doc["user"].id for doc in docs))
+            await self._push(push_notifications(docs))
+        if events:
+            await self._apply_coalesced(items, merge_events(events))
+
+    async def _apply_coalesced(self, items: List[OutboxItem], events: List[CoalescedEvent]):
+        operations = [op for event in events for op in event.operations()]
+        try:
+            # Ordered: each aggregate's upsert must land before its pipeline update
+            result = await NotificationModel.get_motor_collection().bulk_write(operations, ordered=True)
+        except BulkWriteError as e:
+            # Everything before the failed operation is applied; keep only the rest for the retry
+            failed_at = e.details["writeErrors"][0]["index"]
+            items[:] = [item for item in items if not isinstance(item, CoalescedEvent)]
+            items.extend(events[failed_at // 2:])
+            raise
+        items[:] = [item for item in items if not isinstance(item, CoalescedEvent)]
+
+        # A new aggregate is one more unread notification. An existing one may or may not
+        # have been read before this update flagged it unread again, so recount those users.
+        created = {events[index // 2].id for index in result.upserted_ids}
+        await unread_counter.incr_many(Counter(e.user_id for e in events if e.id in created))
+        await unread_counter.invalidate({e.user_id for e in events if e.id not in created})
+        await self._push(push_aggregates([e.id for e in events]))
+
+    async def _push(self, push):
+        # Delivery is best effort: the data is persisted, and clients catch up on reconnect
+        try:
+            await push
+        except Exception as e:
+            logger.error(f"Notification push failed: {e}")
+
+    async def _flush(self, docs: List[OutboxItem]):
+        delay = OUTBOX_RETRY_DELAY_SECONDS
+        while True:
+            try:
+                await self._insert(docs)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification outbox flush of {len(docs)} failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, OUTBOX_MAX_RETRY_DELAY_SECONDS)
+
+    def _next_batch(self, first: OutboxItem) -> List[OutboxItem]:
+        batch = [first]
+        while len(batch) < OUTBOX_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    def _truncate_spill(self):
+        self._spill_file.seek(0)
+        self._spill_file.truncate()
+
+    async def _checkpoint(self):
+        """Everything queued so far is persisted; the spill file can be emptied."""
+        # Lines of items queued later are submitted after this, so they survive the truncation
+        if self._spill_file and self._queue.empty():
+            await self._spill_call(self._truncate_spill)
+
+    async def _worker(self):
+        while True:
+            first = await self._queue.get()
+            # Tracked before waiting, so a stop during the wait still drains it
+            self._in_flight = [first]
+            # Give concurrent requests a moment to join the batch
+            await asyncio.sleep(OUTBOX_FLUSH_INTERVAL_SECONDS)
+            self._in_flight = self._next_batch(first)
+            await self._flush(self._in_flight)
+            self._in_flight = []
+            await self._checkpoint()
+
+    async def drain(self):
+        """Persist everything still queued."""
+        if self._in_flight:
+            await self._insert(self._in_flight)
+            self._in_flight = []
+        while not self._queue.empty():
+            first = self._queue.get_nowait()
+            await self._insert(self._next_batch(first))
+        await self._checkpoint()
+
+    async def replay_spill(self):
+        """Re-insert notifications left in spill files by workers that are no longer running."""
+        if not self._spill_base:
+            return
+        for path in glob.glob(f"{glob.escape(self._spill_base)}.*"):
+            pid = path.rsplit(".", 1)[-1]
+            if not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+                continue
+            docs = await asyncio.to_thread(_read_spill, path)
+            for i in range(0, len(docs), OUTBOX_BATCH_SIZE):
+                await self._insert(docs[i:i + OUTBOX_BATCH_SIZE])
+            await asyncio.to_thread(os.remove, path)
+            logger.info(f"Replayed {len(docs)} notifications from {path}")
+
+    async def start(self):
+        if self._worker_task:
+            return
+        try:
+            await self.replay_spill()
+        except Exception as e:
+            logger.error(f"Notification spill replay failed: {e}")
+        if self._spill_path:
+            # Line buffered so each notification reaches the OS as soon as it is written
+            self._spill_file = await self._spill_call(open, self._spill_path, "a", 1)
+        self._worker_task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._worker_task:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+        try:
+            await self.drain()
+        except Exception as e:
+            logger.error(f"Notification outbox drain failed, {self._queue.qsize()} left in spill file: {e}")
+            return
+        if self._spill_file:
+            spill_file, self._spill_file = self._spill_file, None
+            await self._spill_call(spill_file.close)
+            await self._spill_call(os.remove, self._spill_path)
+
+
+def _write_spill(spill_file, line: str):
+    try:
+        spill_file.write(line)
+    except Exception as e:
+        logger.error(f"Notification spill write failed: {e}")
+
+
+def _read_spill(path: str) -> List[OutboxItem]:
+    with open(path) as f:
+        return [_from_spill(json_util.loads(line, json_options=JSON_OPTIONS)) for line in f if line.strip()]
+
+
+def _from_spill(record: dict) -> OutboxItem:
+    if set(record) == {"coalesce"}:
+        return CoalescedEvent(**record["coalesce"])
+    return record
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+outbox = NotificationOutbox()
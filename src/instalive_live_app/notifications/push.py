@@ -0,0 +1,82 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+from uuid import UUID
+from instalive_live_app.notifications.models import NotificationModel
+from instalive_live_app.chating.utils.presence import presence
+from instalive_live_app.chating.utils.connection_manager import manager
+from instalive_live_app.chating.utils.wire import ClientConnection
+
+logger = logging.getLogger(__name__)
+
+# Event type of the frames sent over /chat/ws, and of the client's acknowledgement
+NOTIFICATIONS_EVENT = "notifications"
+NOTIFICATION_ACK = "notification_ack"
+# Undelivered notifications sent to a client when it connects
+PENDING_ON_CONNECT_LIMIT = 100
+
+
+def notification_payload(doc: dict) -> dict:
+    """Wire form of a raw notification document, matching NotificationResponse."""
+    created_at = doc.get("created_at")
+    return {
+        "id": str(doc["_id"]),
+        "type": doc.get("type"),
+        "title": doc.get("title"),
+        "body": doc.get("body"),
+        "related_entity_id": doc.get("related_entity_id"),
+        "is_read": doc.get("is_read", False),
+        "event_count": doc.get("event_count", 1),
+        "actors": doc.get("actors", []),
+        "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+    }
+
+
+async def push_notifications(docs: Iterable[dict]):
+    """
+    Push freshly persisted notifications to their online owners.
+    Each user gets one `notifications` event for the whole batch, and the batch
+    is published to the other workers once.
+    """
+    by_user: Dict[str, List[dict]] = defaultdict(list)
+    for doc in docs:
+        by_user[str(doc["user"].id)].append(notification_payload(doc))
+    online = await presence.filter_online(by_user.keys())
+    if not online:
+        return
+    await manager.ensure_redis()
+    await manager.send_each({uid: {"type": NOTIFICATIONS_EVENT, "items": by_user[uid]} for uid in online})
+
+
+async def push_aggregates(notification_ids: List[UUID]):
+    """Push the current state of coalesced notifications that were just updated."""
+    if not notification_ids:
+        return
+    docs = await NotificationModel.get_motor_collection().find({"_id": {"$in": notification_ids}}).to_list(None)
+    await push_notifications(docs)
+
+
+async def deliver_pending(user_id: UUID, connection: ClientConnection):
+    """Send the unread notifications this user hasn't acknowledged yet, newest first."""
+    docs = await NotificationModel.get_motor_collection().find(
+        {"user.$id": user_id, "is_read": False, "delivered_at": None}
+    ).sort("created_at", -1).limit(PENDING_ON_CONNECT_LIMIT).to_list(PENDING_ON_CONNECT_LIMIT)
+    if docs:
+        await connection.send_json({"type": NOTIFICATIONS_EVENT, "items": [notification_payload(d) for d in docs]})
+
+
+async def acknowledge(user_id: UUID, ids: Iterable[str]):
+    """Record that the client received these notifications, so they aren't sent again on reconnect."""
+    uuids = []
+    for value in ids:
+        try:
+            uuids.append(UUID(value))
+        except (ValueError, TypeError):
+            continue
+    if not uuids:
+        return
+    await NotificationModel.get_motor_collection().update_many(
+        {"_id": {"$in": uuids}, "user.$id": user_id},
+        {"$set": {"delivered_at": datetime.now(timezone.utc)}},
+    )
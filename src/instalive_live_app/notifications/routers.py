@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from datetime import datetime, timezone
+from typing import List, Optional
 from uuid import UUID
+from beanie import Link, UpdateResponse
 from instalive_live_app.users.utils.get_current_user import get_current_user
 from instalive_live_app.users.models.user_models import UserModel
-from instalive_live_app.notifications.models import NotificationModel
+from instalive_live_app.notifications.models import NotificationModel, BroadcastNotificationModel
 from instalive_live_app.notifications.schemas import NotificationResponse
+from instalive_live_app.notifications.unread import unread_counter
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -14,36 +17,106 @@ async def get_my_notifications(
     skip: int = 0,
     current_user: UserModel = Depends(get_current_user)
 ):
-    """Get list of notifications."""
+    """Get list of notifications, including broadcasts from followed hosts."""
+    # Both sources are sorted by created_at, so the first skip+limit of each is enough to merge
+    window = skip + limit
     notifications= await NotificationModel.find(
         NotificationModel.user.id == current_user.id
-    ).sort("-created_at").limit(limit).skip(skip).to_list()
+    ).sort("-created_at").limit(window).to_list()
 
-    unread_message=await NotificationModel.find(
-        NotificationModel.user.id == current_user.id,NotificationModel.is_read==False
-    ).count()
+    broadcasts = []
+    query = await _broadcast_query(current_user)
+    if query:
+        broadcasts = await BroadcastNotificationModel.find(query).sort("-created_at").limit(window).to_list()
+
+    read_at = current_user.notifications_read_at
+    items = [NotificationResponse(**n.model_dump()) for n in notifications]
+    items += [
+        NotificationResponse(
+            **b.model_dump(exclude={"host"}),
+            is_read=read_at is not None and _as_utc(b.created_at) <= _as_utc(read_at),
+        )
+        for b in broadcasts
+    ]
+    items.sort(key=lambda n: _as_utc(n.created_at), reverse=True)
+
+    unread_message = await _unread_count(current_user, query)
 
     return {
         "unread_message":unread_message,
-        "notifications":[NotificationResponse(**n.model_dump()) for n in notifications]
+        "notifications":items[skip:window]
     }
 
 
+def _as_utc(value: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def _broadcast_query(user: UserModel) -> Optional[dict]:
+    """
+    Filter for the broadcasts shown to `user`: those of hosts they follow, sent after they
+    followed. Follows from before follow times were recorded see all of the host's broadcasts.
+    """
+    following_ids = [
+        link.ref.id if isinstance(link, Link) else link.id
+        for link in user.following
+    ]
+    if not following_ids:
+        return None
+    # Only hosts above the fan-out threshold have broadcasts, so this narrows to a few ids
+    hosts = await BroadcastNotificationModel.get_motor_collection().distinct(
+        "host.$id", {"host.$id": {"$in": following_ids}}
+    )
+    if not hosts:
+        return None
+    followed_at = user.followed_at
+    clauses, unknown = [], []
+    for host_id in hosts:
+        since = followed_at.get(str(host_id))
+        if since is None:
+            unknown.append(host_id)
+        else:
+            clauses.append({"host.$id": host_id, "created_at": {"$gte": since}})
+    if unknown:
+        clauses.append({"host.$id": {"$in": unknown}})
+    return {"$or": clauses}
+
+
+async def _unread_count(user: UserModel, query: Optional[dict]) -> int:
+    """Cached count of the user's own unread notifications plus broadcasts since their last read-all."""
+    count = await unread_counter.get(user.id)
+    if query:
+        read_at = user.notifications_read_at
+        if read_at is not None:
+            query = {**query, "created_at": {"$gt": read_at}}
+        count += await BroadcastNotificationModel.get_motor_collection().count_documents(query)
+    return count
+
+
+@router.get("/unread-count", status_code=status.HTTP_200_OK)
+async def get_unread_count(current_user: UserModel = Depends(get_current_user)):
+    """Number of unread notifications, including broadcasts from followed hosts."""
+    return {"unread_message": await _unread_count(current_user, await _broadcast_query(current_user))}
+
+
 @router.patch("/{notification_id}/read", response_model=NotificationResponse,status_code=status.HTTP_200_OK)
 async def mark_notification_read(
     notification_id: UUID,
     current_user: UserModel = Depends(get_current_user)
 ):
     """Mark a specific notification as read."""
+    # Single atomic update; the previous state tells whether the unread count changes
     notification = await NotificationModel.find_one(
         NotificationModel.id == notification_id,
         NotificationModel.user.id == current_user.id
-    )
+    ).update({"$set": {"is_read": True}}, response_type=UpdateResponse.OLD_DOCUMENT)
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
-        
+
+    if not notification.is_read:
+        await unread_counter.decr(current_user.id)
     notification.is_read = True
-    await notification.save()
     return notification
 
 
@@ -56,5 +129,10 @@ async def mark_all_read(
         NotificationModel.user.id == current_user.id,
         NotificationModel.is_read == False
     ).update({"$set": {"is_read": True}})
+    # Broadcast notifications have no per-user document; they are read up to this point in time
+    await UserModel.find_one(UserModel.id == current_user.id).update(
+        {"$set": {"notifications_read_at": datetime.now(timezone.utc)}}
+    )
+    await unread_counter.reset(current_user.id)
     
     return {"message": "All marked as read"}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
 from instalive_live_app.core.base.base import BaseResponse
@@ -11,6 +11,8 @@ class NotificationResponse(BaseResponse):
     body: str
     related_entity_id: Optional[str] = None
     is_read: bool
+    event_count: int = 1
+    actors: List[str] = []
     created_at: datetime
     
     class Config:
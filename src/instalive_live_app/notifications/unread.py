@@ -0,0 +1,117 @@
+import os
+import logging
+from typing import Dict, Iterable
+from uuid import UUID
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.notifications.models import NotificationModel
+
+logger = logging.getLogger(__name__)
+
+# Counters expire and are recomputed from Mongo on the next read, which heals any drift
+UNREAD_COUNTER_TTL_SECONDS = int(os.getenv("NOTIFICATION_UNREAD_TTL_SECONDS", "3600"))
+
+# Only adjust counters that exist: a missing key means "unknown", and the next read
+# recomputes it from the real count, so blindly creating it would start from a wrong base.
+INCR_EXISTING = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCRBY', key, ARGV[i])
+    end
+end
+return 0
+"""
+
+DECR_EXISTING = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local value = redis.call('DECR', KEYS[1])
+if value < 0 then
+    redis.call('SET', KEYS[1], 0, 'KEEPTTL')
+    return 0
+end
+return value
+"""
+
+
+def _key(user_id) -> str:
+    return f"notifications:unread:{user_id}"
+
+
+class UnreadCounter:
+    """
+    Per-user unread notification counts cached in Redis.
+    Reads are served from the counter; writes adjust it after the notification is
+    persisted. Without Redis every read falls back to a count over the unread index.
+    """
+
+    async def _count(self, user_id: UUID) -> int:
+        return await NotificationModel.find(
+            NotificationModel.user.id == user_id,
+            NotificationModel.is_read == False
+        ).count()
+
+    async def get(self, user_id: UUID) -> int:
+        r = await get_redis()
+        if r:
+            try:
+                cached = await r.get(_key(user_id))
+                if cached is not None:
+                    return int(cached)
+            except Exception as e:
+                logger.error(f"Unread counter read failed: {e}")
+                r = None
+        count = await self._count(user_id)
+        if r:
+            try:
+                # nx: an increment that raced with the count wins over the recomputed value
+                await r.set(_key(user_id), count, ex=UNREAD_COUNTER_TTL_SECONDS, nx=True)
+            except Exception as e:
+                logger.error(f"Unread counter write failed: {e}")
+        return count
+
+    async def incr_many(self, counts: Dict[UUID, int]):
+        if not counts:
+            return
+        r = await get_redis()
+        if not r:
+            return
+        keys = [_key(uid) for uid in counts]
+        try:
+            await r.eval(INCR_EXISTING, len(keys), *keys, *counts.values())
+        except Exception as e:
+            logger.error(f"Unread counter increment failed: {e}")
+
+    async def decr(self, user_id: UUID):
+        r = await get_redis()
+        if not r:
+            return
+        try:
+            await r.eval(DECR_EXISTING, 1, _key(user_id))
+        except Exception as e:
+            logger.error(f"Unread counter decrement failed: {e}")
+
+    async def reset(self, user_id: UUID):
+        r = await get_redis()
+        if not r:
+            return
+        try:
+            await r.set(_key(user_id), 0, ex=UNREAD_COUNTER_TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"Unread counter reset failed: {e}")
+
+    async def invalidate(self, user_ids: Iterable[UUID]):
+        """Drop counters whose change can't be computed locally; the next read recounts."""
+        keys = [_key(uid) for uid in user_ids]
+        if not keys:
+            return
+        r = await get_redis()
+        if not r:
+            return
+        try:
+            await r.delete(*keys)
+        except Exception as e:
+            logger.error(f"Unread counter invalidate failed: {e}")
+
+
+unread_counter = UnreadCounter()
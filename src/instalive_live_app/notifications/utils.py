@@ -1,5 +1,7 @@
 from instalive_live_app.users.models.user_models import UserModel
 from instalive_live_app.notifications.models import NotificationModel, NotificationType
+from instalive_live_app.notifications.outbox import outbox
+from instalive_live_app.notifications.coalesce import build_event
 
 async def send_notification(
     user: UserModel, 
@@ -10,7 +12,8 @@ async def send_notification(
 ):
     """
     Centralized function to send notifications.
-    Currently saves to DB. Can be extended to Push/Socket.
+    Queues the notification on the outbox and returns immediately;
+    the outbox worker persists it in batches and pushes it to the user over /chat/ws.
     """
     notification = NotificationModel(
         user=user.to_ref(),
@@ -19,9 +22,33 @@ async def send_notification(
         type=type,
         related_entity_id=related_entity_id
     )
-    await notification.insert()
-    
-    # Future: Trigger Socket.IO event here
-    # await sio.emit("notification", notification.model_dump(), room=str(user.id))
-    
+    outbox.enqueue(notification)
     return notification
+
+
+async def send_coalesced_notification(
+    user: UserModel,
+    group_key: str,
+    actor_id: str,
+    title: str,
+    body: str,
+    summary: str,
+    type: NotificationType,
+    related_entity_id: str = None
+):
+    """
+    Notification for high-volume events (likes, comments).
+    All events with the same group_key inside the coalescing window update one
+    notification: its count goes up, the latest actors are kept, and once it holds
+    more than one event the body reads "<count><summary>".
+    """
+    outbox.enqueue_coalesced(build_event(
+        user=user,
+        group_key=group_key,
+        actor_id=actor_id,
+        title=title,
+        body=body,
+        summary=summary,
+        type=type,
+        related_entity_id=related_entity_id,
+    ))
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Dict
+from uuid import UUID
+from pymongo import IndexModel, ASCENDING
+from instalive_live_app.core.base.base import BaseCollection
+
+
+class StreamAnalyticsBucketModel(BaseCollection):
+    """
+    One hour of a stream's per-minute metrics. `minutes` is keyed by minute of the hour
+    ("0".."59") and `totals` holds the hour's sums, both kept up to date with $inc/$max
+    by streaming/utils/stream_analytics.py, so reading a range never aggregates raw events.
+    """
+    session_id: UUID
+    hour: datetime
+    minutes: Dict[str, Dict[str, int]] = {}
+    totals: Dict[str, int] = {}
+
+    class Settings:
+        name = "stream_analytics"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("hour", ASCENDING)], unique=True),
+        ]
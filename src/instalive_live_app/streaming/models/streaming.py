@@ -1,17 +1,22 @@
 from beanie import before_event, Replace, Save, Link,after_event, Delete
 from pydantic import Field
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, Optional
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
 from instalive_live_app.core.base.base import BaseCollection
+from instalive_live_app.core import blob_store
 from instalive_live_app.users.models.user_models import UserModel
 from instalive_live_app.users.models.moderator_models import ModeratorModel
 
 class LiveStreamModel(BaseCollection):
     host: Link[UserModel]
+    # Copy of the host's display name so search doesn't need to join users
+    host_name: str = ""
     channel_name:str
     title:str=""
     category:str=""
     thumbnail: Optional[str] = Field(default=None)
+    thumbnail_variants: Dict[str, str] = {}
     livekit_token: str = Field(unique=True)
     is_premium: bool = False
     entry_fee: int = 0
@@ -21,7 +26,14 @@ class LiveStreamModel(BaseCollection):
     earn_coins: int = 0
     total_views: int = 0
     total_comments: int = 0
+    # Kept up to date from LiveKit participant webhooks by streaming/utils/viewer_tracker.py
+    current_viewers: int = 0
+    peak_viewers: int = 0
+    unique_viewers: int = 0
+    media_started_at: Optional[datetime] = None
     status: str = "live"
+    # "stopped" (host or moderator), "room_finished" (LiveKit webhook) or "orphaned" (see streaming/utils/reconciler.py)
+    end_reason: Optional[str] = None
 
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -39,8 +51,21 @@ class LiveStreamModel(BaseCollection):
         await LiveCommentModel.find(LiveCommentModel.session.id == session_id).delete()
         await LiveLikeModel.find(LiveLikeModel.session.id == session_id).delete()
         await LiveRatingModel.find(LiveRatingModel.session.id == session_id).delete()
+        await blob_store.release(self.thumbnail)
     class Settings:
         name = "livestreams"
+        indexes = [
+            # status is an equality prefix, so a search only walks the text keys of live streams
+            IndexModel(
+                [("status", ASCENDING), ("title", TEXT), ("host_name", TEXT), ("channel_name", TEXT), ("category", TEXT)],
+                weights={"title": 10, "host_name": 10, "category": 5, "channel_name": 1},
+                default_language="none",
+                name="live_search",
+            ),
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+            # LiveKit webhooks identify streams by room name
+            IndexModel([("channel_name", ASCENDING)]),
+        ]
 
 
 
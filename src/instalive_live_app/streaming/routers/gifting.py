@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, cast
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Literal, cast
+from uuid import UUID
 from instalive_live_app.users.utils.get_current_user import get_current_user
 from instalive_live_app.users.models.user_models import UserModel
 from instalive_live_app.streaming.models.streaming import LiveStreamModel
 from instalive_live_app.streaming.models.gifts import GiftLogModel
 from instalive_live_app.finance.models.transaction import TransactionModel, TransactionType, TransactionReason
+from instalive_live_app.streaming.utils.stream_analytics import analytics_recorder
+from instalive_live_app.streaming.utils.trending import trending
+from instalive_live_app.streaming.utils.leaderboards import leaderboards, stream_key, hosts_key, supporters_key
+from instalive_live_app.streaming.schemas.streaming import LeaderboardEntry
 
 router = APIRouter(prefix="/streaming/gifts", tags=["Gifting"])
 
@@ -53,6 +58,11 @@ async def send_coins(
         price_at_time=amount
     )
     await gift_log.insert()
+    analytics_recorder.record(stream.id, "gifts")
+    analytics_recorder.record(stream.id, "coins", amount)
+    await trending.bump(stream.id, stream.category, "coins", amount)
+    await leaderboards.record_gift(stream.id, stream.channel_name, current_user.id, host_user.id, amount,
+                                   at=gift_log.created_at)
 
     # 5. Log Transactions
     # Debit for Sender
@@ -76,3 +86,47 @@ async def send_coins(
     ).insert()
 
     return {"status": "success", "new_balance": current_user.coins, "sent_amount": amount}
+
+
+async def leaderboard_entries(board: str, limit: int) -> List[dict]:
+    top = await leaderboards.top(board, limit)
+    if not top:
+        return []
+    users = await UserModel.get_motor_collection().find(
+        {"_id": {"$in": [user_id for user_id, _ in top]}},
+        {"first_name": 1, "last_name": 1, "profile_image": 1, "profile_image_variants": 1},
+    ).to_list(length=None)
+    by_id = {user["_id"]: user for user in users}
+    return [
+        {
+            "rank": rank,
+            "user_id": user_id,
+            "coins": coins,
+            "first_name": by_id.get(user_id, {}).get("first_name"),
+            "last_name": by_id.get(user_id, {}).get("last_name"),
+            "profile_image": by_id.get(user_id, {}).get("profile_image"),
+            "profile_image_variants": by_id.get(user_id, {}).get("profile_image_variants") or {},
+        }
+        for rank, (user_id, coins) in enumerate(top, start=1)
+    ]
+
+
+@router.get("/leaderboard/stream/{session_id}", response_model=List[LeaderboardEntry])
+async def get_stream_leaderboard(session_id: UUID, limit: int = Query(10, ge=1, le=100)):
+    """Top gifters of a stream."""
+    return await leaderboard_entries(stream_key(session_id), limit)
+
+
+@router.get("/leaderboard/hosts", response_model=List[LeaderboardEntry])
+async def get_hosts_leaderboard(
+    period: Literal["day", "week", "month"] = "day",
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Hosts who received the most coins in the current UTC day, ISO week or month."""
+    return await leaderboard_entries(hosts_key(period), limit)
+
+
+@router.get("/leaderboard/supporters/{host_id}", response_model=List[LeaderboardEntry])
+async def get_supporters_leaderboard(host_id: UUID, limit: int = Query(10, ge=1, le=100)):
+    """A host's top supporters of all time."""
+    return await leaderboard_entries(supporters_key(host_id), limit)
@@ -11,8 +11,10 @@ from typing import Union, Optional
 from uuid import UUID
 from instalive_live_app.streaming.models.streaming import LiveStreamModel, LiveLikeModel, LiveCommentModel, LiveRatingModel, \
     LiveViewerModel, LiveStreamReportModel, LiveStreamReportReviewModel
-from instalive_live_app.notifications.utils import send_notification
+from instalive_live_app.notifications.utils import send_coalesced_notification
 from instalive_live_app.notifications.models import NotificationType
+from instalive_live_app.streaming.utils.stream_analytics import analytics_recorder
+from instalive_live_app.streaming.utils.trending import trending
 
 router = APIRouter(prefix="/streaming/interactions", tags=["Interactions"])
 
@@ -30,16 +32,21 @@ async def like_stream(session_id: str, current_user: UserModel = Depends(get_cur
     
     stream.total_likes += 1
     await stream.save()
+    analytics_recorder.record(stream.id, "likes")
+    await trending.bump(stream.id, stream.category, "like")
     
-    # Send Notification to Host
+    # Send Notification to Host; likes on one stream are folded into a single notification
     if stream.host:
         host = stream.host
         # Refresh not needed if we check host.id or name directly
-        if host and host.id != current_user.id:
-            await send_notification(
+        if host and host.ref.id != current_user.id:
+            await send_coalesced_notification(
                 user=host,
+                group_key=f"stream_like:{stream.id}",
+                actor_id=str(current_user.id),
                 title="New Like!",
                 body=f"{current_user.first_name} liked your live stream.",
+                summary=f" likes on your live stream. Latest from {current_user.first_name}.",
                 type=NotificationType.LIVE,
                 related_entity_id=str(stream.id)
             )
@@ -60,16 +67,21 @@ async def comment_stream(session_id: str, content: str, current_user: UserModel
 
     stream.total_comments += 1
     await stream.save()
+    analytics_recorder.record(stream.id, "comments")
+    await trending.bump(stream.id, stream.category, "comment")
 
-    # Send Notification to Host
+    # Send Notification to Host; comments on one stream are folded into a single notification
     if stream.host:
         host = stream.host
         # Refresh not needed
-        if host and host.id != current_user.id:
-            await send_notification(
+        if host and host.ref.id != current_user.id:
+            await send_coalesced_notification(
                 user=host,
+                group_key=f"stream_comment:{stream.id}",
+                actor_id=str(current_user.id),
                 title="New Comment",
                 body=f"{current_user.first_name} commented: {content[:30]}...",
+                summary=f" new comments on your live stream. Latest from {current_user.first_name}: {content[:30]}...",
                 type=NotificationType.LIVE,
                 related_entity_id=str(stream.id)
             )
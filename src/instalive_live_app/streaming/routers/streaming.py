@@ -1,9 +1,9 @@
-import os
 import time
 import asyncio
 import logging
+from uuid import UUID
 from datetime import datetime, timezone
-from typing import cast, List, Union, Optional
+from typing import cast, List, Literal, Union, Optional
 from fastapi import APIRouter, status, HTTPException, Depends, Request
 from livekit import api
 from dotenv import load_dotenv
@@ -14,19 +14,26 @@ from instalive_live_app.users.utils.user_role import UserRole
 from instalive_live_app.users.utils.get_current_user import get_current_user
 from instalive_live_app.finance.models.transaction import TransactionModel, TransactionType, TransactionReason
 from instalive_live_app.streaming.models.streaming import LiveCommentModel, LiveLikeModel, LiveViewerReportModel
-from instalive_live_app.streaming.schemas.streaming import LiveStreamResponse, ActiveStreamsStatsResponse, LiveViewerReportCreate, LiveViewerReportResponse
-from instalive_live_app.users.utils.populate_kyc import populate_user_kyc
+from instalive_live_app.streaming.schemas.streaming import LiveStreamResponse, ActiveStreamsStatsResponse, LiveViewerReportCreate, LiveViewerReportResponse, \
+    StreamAnalyticsResponse
+from instalive_live_app.users.utils.populate_kyc import populate_user_kyc, populate_users_kyc
 from instalive_live_app.notifications.utils import send_notification
 from instalive_live_app.notifications.models import NotificationType
+from instalive_live_app.notifications.fanout import fanout
+from instalive_live_app.streaming.utils.stream_search import search_live_streams, host_display_name
+from instalive_live_app.core.image_variants import image_variants
+from instalive_live_app.core import blob_store
+from instalive_live_app.streaming.utils.livekit_client import (
+    LIVEKIT_API_KEY, LIVEKIT_API_SECRET, get_livekit_api, webhook_receiver,
+)
+from instalive_live_app.streaming.utils.viewer_tracker import viewer_tracker, mark_media_started, host_identity
+from instalive_live_app.streaming.utils.stream_analytics import analytics_recorder, stream_series, as_utc, MAX_RANGE
+from instalive_live_app.streaming.utils.trending import trending
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 router = APIRouter(prefix="/streaming", tags=["Livestream"])
 
-LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
-LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
-LIVEKIT_URL = os.getenv("LIVEKIT_URL", "http://localhost:7880")
-
 async def delayed_kick_participant(session_id: str, participant_identity: str, timeout: int = 8):
     """
     Waits for a timeout and then kicks the participant if they haven't paid for a premium stream.
@@ -50,12 +57,11 @@ async def delayed_kick_participant(session_id: str, participant_identity: str, t
             should_kick = True
         else:
             # Check if registered user has paid
-            from beanie import PydanticObjectId
             try:
-                user_oid = PydanticObjectId(participant_identity)
+                user_id = UUID(participant_identity)
                 viewer = await LiveViewerModel.find_one(
                     LiveViewerModel.session.id == db_stream.id,
-                    LiveViewerModel.user.id == user_oid
+                    LiveViewerModel.user.id == user_id
                 )
                 if not viewer or not viewer.has_paid:
                     should_kick = True
@@ -64,10 +70,9 @@ async def delayed_kick_participant(session_id: str, participant_identity: str, t
                 should_kick = True
 
         if should_kick:
-            # LiveKit URL for service client should be https for cloud
-            service_url = LIVEKIT_URL.replace("wss://", "https://").replace("ws://", "http://")
-            room_service = api.RoomServiceClient(service_url, LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
-            await room_service.remove_participant(db_stream.channel_name, participant_identity)
+            await get_livekit_api().room.remove_participant(
+                api.RoomParticipantIdentity(room=db_stream.channel_name, identity=participant_identity)
+            )
             logger.info(f"Kicked {participant_identity} from {db_stream.channel_name} (Premium Enforcement)")
             
     except Exception as e:
@@ -93,38 +98,40 @@ def create_livekit_token(identity: str, name: str, room_name: str, can_publish:
 
 @router.post("/webhook")
 async def livekit_webhook(request: Request):
-    # In newer versions, KeyProvider should be used or keys should be provided directly to WebhookReceiver
-    # But the easiest way is to verify the token
-
     auth_header = request.headers.get("Authorization")
     if not auth_header:
         raise HTTPException(status_code=400, detail="Authorization header missing")
 
     try:
         body = await request.body()
-        # Create receiver directly with API key and Secret
-        receiver = api.WebhookReceiver(
-            api.TokenVerifier(LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
-        )
-
-        # Receive event
-        event = receiver.receive(body.decode("utf-8"), auth_header)
-
+        event = webhook_receiver.receive(body.decode("utf-8"), auth_header)
     except Exception as e:
         logger.error(f"Webhook Verification Error: {e}")
         raise HTTPException(status_code=400, detail="Verification failed")
 
-    # Remaining logic remains the same
-    if event.event == "room_finished":
-        room_name = event.room.name
-        live_session = await LiveStreamModel.find_one(
-            LiveStreamModel.channel_name == room_name,
-            LiveStreamModel.status == "live"
+    room_name = event.room.name
+    if event.event == "participant_joined":
+        await viewer_tracker.joined(room_name, event.participant.identity)
+    elif event.event == "participant_left":
+        await viewer_tracker.left(room_name, event.participant.identity)
+    elif event.event == "room_started":
+        await viewer_tracker.touch(room_name)
+    elif event.event == "track_published":
+        if event.participant.identity == host_identity(room_name):
+            await mark_media_started(room_name)
+    elif event.event == "room_finished":
+        current, peak, uniques = await viewer_tracker.finish(room_name)
+        analytics_recorder.gauge_room(room_name, "viewers", 0)
+        await LiveStreamModel.get_motor_collection().update_one(
+            {"channel_name": room_name, "status": "live"},
+            {
+                "$set": {
+                    "status": "ended", "end_reason": "room_finished", "end_time": datetime.now(timezone.utc),
+                    "updated_at": datetime.now(timezone.utc), "current_viewers": 0,
+                },
+                "$max": {"peak_viewers": peak, "unique_viewers": uniques},
+            },
         )
-        if live_session:
-            live_session.status = "ended"
-            live_session.end_time = datetime.now(timezone.utc)
-            await live_session.save()
 
     return {"status": "success"}
 
@@ -164,13 +171,16 @@ async def start_stream(
     channel_name = f"live_{current_user.id}_{int(time.time())}"
     token = create_livekit_token(
         identity=str(current_user.id),
-        name=f"{current_user.first_name or ''} {current_user.last_name or ''}".strip(),
+        name=host_display_name(current_user),
         room_name=channel_name,
         can_publish=True
     )
     stream_thumbnail = thumbnail if thumbnail else current_user.profile_image
+    # The profile picture's variants are reused; any other uploaded thumbnail gets its own below
+    reuse_variants = stream_thumbnail == current_user.profile_image
     new_live = LiveStreamModel(
         host=current_user.to_ref(),
+        host_name=host_display_name(current_user),
         channel_name=channel_name,
         livekit_token=token,
         is_premium=is_premium,
@@ -178,9 +188,14 @@ async def start_stream(
         status="live",
         title=title,
         category=category,
-        thumbnail=stream_thumbnail
+        thumbnail=stream_thumbnail,
+        thumbnail_variants=current_user.profile_image_variants if reuse_variants else {}
     )
     await new_live.insert()
+    # The stream holds its own reference, so a later profile picture change keeps the thumbnail
+    await blob_store.retain(stream_thumbnail)
+    if not reuse_variants:
+        image_variants.schedule(LiveStreamModel, new_live.id, "thumbnail", "thumbnail_variants", stream_thumbnail)
 
     # Log Transaction for Host
     if is_premium and entry_fee > 0:
@@ -201,6 +216,8 @@ async def start_stream(
         type=NotificationType.LIVE,
         related_entity_id=str(new_live.id)
     )
+    # Notify followers in the background; large audiences are paged and rate limited
+    fanout.schedule_go_live(current_user, new_live)
 
     return {
         "live_id": str(new_live.id), 
@@ -248,8 +265,10 @@ async def join_stream(session_id: str, request: Request):
         if is_admin: has_paid = True
 
         if not existing_viewer:
-            db_live_stream.total_views += 1
-            await db_live_stream.save()
+            # Atomic, so concurrent joins don't overwrite each other's count
+            await LiveStreamModel.find_one(LiveStreamModel.id == db_live_stream.id).update(
+                {"$inc": {LiveStreamModel.total_views: 1}}
+            )
 
             await LiveViewerModel(
                 session=db_live_stream.to_ref(),
@@ -277,6 +296,8 @@ async def join_stream(session_id: str, request: Request):
         can_publish=False,
         can_subscribe=True # Always allow subscribe initially for the 3s preview
     )
+    analytics_recorder.record(db_live_stream.id, "joins")
+    await trending.bump(db_live_stream.id, db_live_stream.category, "join")
 
     # SECURE ENFORCEMENT: Start a background task to kick if not paid
     if not has_paid:
@@ -361,6 +382,8 @@ async def pay_stream_fee(session_id: str, current_user: UserModel = Depends(get_
     # Update Viewer Record
     viewer_record.has_paid = True
     await viewer_record.save()
+    analytics_recorder.record(db_live_stream.id, "paid")
+    analytics_recorder.record(db_live_stream.id, "coins", int(db_live_stream.entry_fee))
 
     # Issue NEW token with can_subscribe=True
     new_token = create_livekit_token(
@@ -398,6 +421,7 @@ async def stop_stream(session_id: str, current_user: Union[UserModel, ModeratorM
         raise HTTPException(status_code=403, detail="You are not authorized to stop this livestream")
 
     live_session.status = "ended"
+    live_session.end_reason = "stopped"
     live_session.end_time = datetime.now(timezone.utc)
     await live_session.save()
 
@@ -477,6 +501,31 @@ async def get_active_streams():
     return streams_with_kyc
 
 
+@router.get("/trending", response_model=List[LiveStreamResponse])
+async def get_trending_streams(category: Optional[str] = None, limit: int = 20):
+    """
+    Live streams ranked by recent joins, likes, comments, gifts and current viewers,
+    optionally within one category.
+    """
+    ids = await trending.top_ids(category, limit)
+    if not ids:
+        return []
+    streams = await LiveStreamModel.find({"_id": {"$in": ids}, "status": "live"}, fetch_links=True).to_list()
+    rank = {stream_id: i for i, stream_id in enumerate(ids)}
+    streams.sort(key=lambda stream: rank[stream.id])
+
+    # One KYC query for all hosts
+    hosts = {stream.host.id: stream.host for stream in streams if stream.host}
+    by_id = {host["id"]: host for host in await populate_users_kyc(list(hosts.values()))}
+    streams_with_kyc = []
+    for stream in streams:
+        stream_dict = stream.model_dump()
+        if stream.host:
+            stream_dict["host"] = by_id[stream.host.id]
+        streams_with_kyc.append(stream_dict)
+    return streams_with_kyc
+
+
 @router.get("/active/{category_name}", response_model=List[LiveStreamResponse])
 async def get_active_category_streams(category_name:str):
     streams = await LiveStreamModel.find(LiveStreamModel.status == "live",LiveStreamModel.category==category_name, fetch_links=True).to_list()
@@ -559,57 +608,44 @@ async def get_active_streams_stats():
         "paid": paid
     }
 @router.get("/search", response_model=List[LiveStreamResponse])
-async def search_streams(q: str):
+async def search_streams(q: str, skip: int = 0, limit: int = 20):
     """
-    Endpoint to search by host name, title, channel name, and category.
+    Endpoint to search live streams by host name, title, channel name, and category.
+    Results are ranked by relevance, then popularity.
     """
-    pipeline = [
-        {"$match": {"status": "live"}},
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "host.$id",
-                "foreignField": "_id",
-                "as": "host_info"
-            }
-        },
-        {"$unwind": "$host_info"},
-        {
-            "$match": {
-                "$or": [
-                    {"title": {"$regex": q, "$options": "i"}},
-                    {"category": {"$regex": q, "$options": "i"}},
-                    {"channel_name": {"$regex": q, "$options": "i"}},
-                    {"host_info.first_name": {"$regex": q, "$options": "i"}},
-                    {"host_info.last_name": {"$regex": q, "$options": "i"}}
-                ]
-            }
-        },
-        {"$sort": {"created_at": -1}}
-    ]
-    
-    results = await LiveStreamModel.aggregate(pipeline).to_list()
-    
-    # To match with LiveStreamResponse and populate KYC
-    # Processing results manually
-    streams_with_kyc = []
-    for res in results:
-        # Setting DB ID as string and _id as id
-        res["id"] = res["_id"]
-        
-        # KYC Population
-        host_info = res.get("host_info")
-        if host_info:
-            # We need a UserModel object for populate_user_kyc
-            # Minimally converting host_info to something the helper can use
-            # Or just fetch user again for safety
-            user = await UserModel.get(host_info["_id"])
-            if user:
-                res["host"] = await populate_user_kyc(user)
-        
-        streams_with_kyc.append(res)
-        
-    return streams_with_kyc
+    return await search_live_streams(q, skip=skip, limit=limit)
+
+
+@router.get("/{session_id}/analytics", response_model=StreamAnalyticsResponse)
+async def get_stream_analytics(
+    session_id: UUID,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[Literal["1m", "5m", "15m", "1h"]] = None,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Per-minute viewers, joins, paid entries, likes, comments and gifts of a stream,
+    downsampled to `resolution` (by default the finest that fits the range).
+    Defaults to the whole stream. Data lags by up to one analytics flush interval.
+    """
+    live_session = await LiveStreamModel.get(session_id)
+    if not live_session:
+        raise HTTPException(status_code=404, detail="Live stream not found")
+
+    is_host = live_session.host.ref.id == current_user.id
+    is_admin = current_user.role == UserRole.ADMIN
+    if not (is_host or is_admin):
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    start = as_utc(start or live_session.start_time)
+    end = as_utc(end or live_session.end_time or datetime.now(timezone.utc))
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > MAX_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range must be at most {MAX_RANGE.days} days")
+
+    return await stream_series(live_session.id, start, end, resolution)
 
 
 @router.get("/lottery/{session_id}")
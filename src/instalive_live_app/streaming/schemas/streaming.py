@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
+from uuid import UUID
 from datetime import datetime
 from instalive_live_app.core.base.base import BaseResponse
 from instalive_live_app.users.schemas.user_schemas import UserResponse, ModeratorResponse
@@ -20,6 +21,7 @@ class LiveStreamResponse(BaseResponse):
     title: str
     category: str
     thumbnail:  Optional[str] = Field(default=None)
+    thumbnail_variants: Dict[str, str] = {}
     is_premium: bool
     entry_fee: int
     start_time: datetime
@@ -29,6 +31,9 @@ class LiveStreamResponse(BaseResponse):
     livekit_token:str
     total_views: int
     total_comments: int
+    current_viewers: int = 0
+    peak_viewers: int = 0
+    unique_viewers: int = 0
     status: str
     created_at: datetime
     updated_at: datetime
@@ -37,6 +42,38 @@ class LiveStreamResponse(BaseResponse):
         from_attributes = True
 
 
+class StreamAnalyticsPoint(BaseModel):
+    t: datetime
+    viewers: int = 0
+    joins: int = 0
+    paid: int = 0
+    likes: int = 0
+    comments: int = 0
+    gifts: int = 0
+    coins: int = 0
+
+
+class StreamAnalyticsResponse(BaseModel):
+    session_id: UUID
+    start: datetime
+    end: datetime
+    resolution_seconds: int
+    points: List[StreamAnalyticsPoint]
+    totals: Dict[str, int]
+    # Paid entries per join
+    conversion_rate: float
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: UUID
+    coins: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    profile_image: Optional[str] = None
+    profile_image_variants: Dict[str, str] = {}
+
+
 class ActiveStreamsStatsResponse(BaseModel):
     total: int
     free: int
@@ -0,0 +1,293 @@
+"""
+Gift leaderboards kept in Redis sorted sets, scored by coins:
+
+    lb:stream:<session id>           top gifters of a stream
+    lb:hosts:day:<YYYYMMDD>          top earning hosts today (UTC)
+    lb:hosts:week:<YYYY-Www>         ... this ISO week
+    lb:hosts:month:<YYYYMM>          ... this month
+    lb:supporters:<host id>          a host's top supporters, all time
+
+Every gift bumps all five in one script, and reading the top k of a board is a single
+ZREVRANGE. The boards can be rebuilt from gift_logs, e.g. after Redis lost its data
+(gifts sent while the rebuild runs may be missed):
+
+    python -m instalive_live_app.streaming.utils.leaderboards --rebuild
+"""
+import os
+import json
+import time
+import heapq
+import asyncio
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+from livekit import api
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.streaming.models.gifts import GiftLogModel
+from instalive_live_app.streaming.utils.livekit_client import get_livekit_api
+
+logger = logging.getLogger(__name__)
+
+# Stream boards outlive the stream long enough to show a recap
+STREAM_BOARD_TTL_SECONDS = int(os.getenv("STREAM_BOARD_TTL_SECONDS", str(7 * 24 * 3600)))
+# Period boards are kept a while after the period ends
+PERIOD_TTL_SECONDS = {"day": 3 * 24 * 3600, "week": 15 * 24 * 3600, "month": 62 * 24 * 3600}
+PERIODS = tuple(PERIOD_TTL_SECONDS)
+LEADERBOARD_MAX_LIMIT = 100
+# Gifters sent to the stream room with every update
+PUSH_TOP = 5
+PUSH_TOPIC = "leaderboard"
+
+KEY_PREFIX = "lb:"
+
+# Bumps every board a gift counts towards and returns the sender's total in the stream
+# with the stream's top gifters, so the push needs no second round trip.
+# KEYS: stream, day, week, month, supporters. ARGV: sender, host, coins, top, ttl per key (0 keeps it).
+GIFT = """
+redis.call('ZINCRBY', KEYS[1], ARGV[3], ARGV[1])
+for i = 2, 4 do
+    redis.call('ZINCRBY', KEYS[i], ARGV[3], ARGV[2])
+end
+redis.call('ZINCRBY', KEYS[5], ARGV[3], ARGV[1])
+for i = 1, 5 do
+    local ttl = tonumber(ARGV[4 + i])
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[i], ttl)
+    end
+end
+local total = redis.call('ZSCORE', KEYS[1], ARGV[1])
+return {total, redis.call('ZREVRANGE', KEYS[1], 0, tonumber(ARGV[4]) - 1, 'WITHSCORES')}
+"""
+
+
+def period_id(period: str, at: Optional[datetime] = None) -> str:
+    at = at or datetime.now(timezone.utc)
+    if period == "day":
+        return at.strftime("%Y%m%d")
+    if period == "week":
+        year, week, _ = at.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return at.strftime("%Y%m")
+    raise ValueError(f"Unknown period {period}")
+
+
+def period_start(period: str, at: datetime) -> datetime:
+    day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown period {period}")
+
+
+def stream_key(session_id) -> str:
+    return f"{KEY_PREFIX}stream:{session_id}"
+
+
+def hosts_key(period: str, at: Optional[datetime] = None) -> str:
+    return f"{KEY_PREFIX}hosts:{period}:{period_id(period, at)}"
+
+
+def supporters_key(host_id) -> str:
+    return f"{KEY_PREFIX}supporters:{host_id}"
+
+
+def board_ttl(key: str) -> int:
+    """Seconds a board lives after its last update; 0 keeps it."""
+    kind, _, rest = key[len(KEY_PREFIX):].partition(":")
+    if kind == "stream":
+        return STREAM_BOARD_TTL_SECONDS
+    if kind == "hosts":
+        return PERIOD_TTL_SECONDS[rest.split(":")[0]]
+    return 0
+
+
+def gift_keys(session_id, host_id, at: Optional[datetime] = None) -> List[str]:
+    """The boards a gift counts towards, in the order GIFT expects them."""
+    return [stream_key(session_id), *(hosts_key(period, at) for period in PERIODS), supporters_key(host_id)]
+
+
+def top_entries(flat: List) -> List[Tuple[str, int]]:
+    """Pairs up a flat member, score, member, score... reply from a script."""
+    return [(flat[i], int(float(flat[i + 1]))) for i in range(0, len(flat), 2)]
+
+
+class LocalBoards:
+    """Per-worker boards used while Redis is unavailable; reads take the top k with a heap."""
+
+    def __init__(self):
+        self.boards: Dict[str, Dict[str, float]] = {}
+        self.expires: Dict[str, float] = {}
+
+    def _expire(self, key: str):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.boards.pop(key, None)
+            self.expires.pop(key, None)
+
+    def incr(self, key: str, member: str, amount: int, ttl: int) -> float:
+        self._expire(key)
+        board = self.boards.setdefault(key, {})
+        board[member] = board.get(member, 0) + amount
+        if ttl:
+            self.expires[key] = time.time() + ttl
+        return board[member]
+
+    def top(self, key: str, limit: int) -> List[Tuple[str, int]]:
+        self._expire(key)
+        board = self.boards.get(key, {})
+        return [(member, int(score)) for member, score in heapq.nlargest(limit, board.items(), key=lambda e: e[1])]
+
+
+class Leaderboards:
+    """Maintains the gift leaderboards and pushes stream board updates to the stream's room."""
+
+    def __init__(self):
+        self.local = LocalBoards()
+        # Pushes in flight; held so they aren't garbage collected mid-send
+        self._pushes: Set[asyncio.Task] = set()
+
+    async def record_gift(self, session_id, room: Optional[str], sender_id, host_id, coins: int,
+                          at: Optional[datetime] = None):
+        keys = gift_keys(session_id, host_id, at)
+        sender, host = str(sender_id), str(host_id)
+        result = None
+        r = await get_redis()
+        if r:
+            try:
+                total, flat = await r.eval(
+                    GIFT, len(keys), *keys, sender, host, coins, PUSH_TOP, *(board_ttl(key) for key in keys),
+                )
+                result = int(float(total)), top_entries(flat)
+            except Exception as e:
+                logger.error(f"Leaderboard update for stream {session_id} failed: {e}")
+        if result is None:
+            stream, *periods, supporters = keys
+            total = self.local.incr(stream, sender, coins, board_ttl(stream))
+            for key in periods:
+                self.local.incr(key, host, coins, board_ttl(key))
+            self.local.incr(supporters, sender, coins, 0)
+            result = int(total), self.local.top(stream, PUSH_TOP)
+        if room:
+            total, top = result
+            self._push(room, {
+                "type": "gift_leaderboard",
+                "session_id": str(session_id),
+                "sender_id": sender,
+                "sender_total": total,
+                "top": [{"user_id": user_id, "coins": score} for user_id, score in top],
+            })
+
+    async def top(self, key: str, limit: int = 10) -> List[Tuple[UUID, int]]:
+        limit = max(1, min(limit, LEADERBOARD_MAX_LIMIT))
+        entries = None
+        r = await get_redis()
+        if r:
+            try:
+                entries = [(member, int(score)) for member, score in await r.zrevrange(key, 0, limit - 1, withscores=True)]
+            except Exception as e:
+                logger.error(f"Leaderboard read of {key} failed: {e}")
+        if entries is None:
+            entries = self.local.top(key, limit)
+        return [(UUID(member), score) for member, score in entries]
+
+    def _push(self, room: str, payload: dict):
+        task = asyncio.create_task(self._send(room, payload))
+        self._pushes.add(task)
+        task.add_done_callback(self._pushes.discard)
+
+    @staticmethod
+    async def _send(room: str, payload: dict):
+        try:
+            await get_livekit_api().room.send_data(api.SendDataRequest(
+                room=room,
+                data=json.dumps(payload).encode(),
+                kind=api.DataPacket.RELIABLE,
+                topic=PUSH_TOPIC,
+            ))
+        except Exception as e:
+            logger.warning(f"Leaderboard push to {room} failed: {e}")
+
+    async def rebuild(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Recomputes every board from gift_logs and swaps it in; returns how many boards of each kind."""
+        r = await get_redis()
+        if not r:
+            raise RuntimeError("Redis is not available")
+        now = now or datetime.now(timezone.utc)
+        gifts = GiftLogModel.get_motor_collection()
+        boards: Dict[str, Dict[str, int]] = {}
+
+        stream_since = now - timedelta(seconds=STREAM_BOARD_TTL_SECONDS)
+        async for doc in gifts.aggregate([
+            {"$match": {"created_at": {"$gte": stream_since}}},
+            {"$group": {"_id": {"session": "$session.$id", "sender": "$sender.$id"}, "coins": {"$sum": "$price_at_time"}}},
+        ]):
+            boards.setdefault(stream_key(doc["_id"]["session"]), {})[str(doc["_id"]["sender"])] = doc["coins"]
+
+        starts = {period: period_start(period, now) for period in PERIODS}
+        async for doc in gifts.aggregate([
+            {"$match": {"created_at": {"$gte": min(starts.values())}}},
+            {"$group": {"_id": "$receiver.$id", **{
+                period: {"$sum": {"$cond": [{"$gte": ["$created_at", start]}, "$price_at_time", 0]}}
+                for period, start in starts.items()
+            }}},
+        ]):
+            for period in PERIODS:
+                if doc[period]:
+                    boards.setdefault(hosts_key(period, now), {})[str(doc["_id"])] = doc[period]
+
+        async for doc in gifts.aggregate([
+            {"$group": {"_id": {"receiver": "$receiver.$id", "sender": "$sender.$id"}, "coins": {"$sum": "$price_at_time"}}},
+        ]):
+            boards.setdefault(supporters_key(doc["_id"]["receiver"]), {})[str(doc["_id"]["sender"])] = doc["coins"]
+
+        stale = [key async for key in r.scan_iter(match=f"{KEY_PREFIX}*") if key not in boards]
+        async with r.pipeline(transaction=True) as pipe:
+            if stale:
+                pipe.delete(*stale)
+            for key, members in boards.items():
+                # Built aside and swapped in, so readers never see a half-written board
+                pipe.zadd(f"{key}:next", members)
+                pipe.rename(f"{key}:next", key)
+                if board_ttl(key):
+                    pipe.expire(key, board_ttl(key))
+            await pipe.execute()
+
+        kinds = {"stream": 0, "hosts": 0, "supporters": 0}
+        for key in boards:
+            kinds[key[len(KEY_PREFIX):].partition(":")[0]] += 1
+        return kinds
+
+    async def stop(self):
+        if self._pushes:
+            await asyncio.gather(*self._pushes, return_exceptions=True)
+
+
+leaderboards = Leaderboards()
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from beanie import init_beanie
+    from instalive_live_app.db import MODELS, MONGODB_URL, DATABASE_NAME
+    from instalive_live_app.core.redis_client import close_redis
+
+    client = AsyncIOMotorClient(MONGODB_URL, uuidRepresentation="standard")
+    await init_beanie(database=client[DATABASE_NAME], document_models=MODELS)
+    try:
+        print(await leaderboards.rebuild())
+    finally:
+        await close_redis()
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", required=True)
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
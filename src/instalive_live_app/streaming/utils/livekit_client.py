@@ -0,0 +1,37 @@
+import os
+import logging
+from typing import Optional
+from dotenv import load_dotenv
+from livekit import api
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+LIVEKIT_URL = os.getenv("LIVEKIT_URL", "http://localhost:7880")
+
+# Verifying a webhook only needs the keys, so one receiver serves every request
+webhook_receiver = api.WebhookReceiver(api.TokenVerifier(LIVEKIT_API_KEY, LIVEKIT_API_SECRET))
+
+_api: Optional[api.LiveKitAPI] = None
+
+
+def get_livekit_api() -> api.LiveKitAPI:
+    """
+    Shared server API client. It owns one aiohttp session, so connections to LiveKit
+    are pooled across calls instead of opened per request.
+    """
+    global _api
+    if _api is None:
+        # The server API is plain HTTP(S) even when clients connect over ws(s)
+        service_url = LIVEKIT_URL.replace("wss://", "https://").replace("ws://", "http://")
+        _api = api.LiveKitAPI(service_url, LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
+    return _api
+
+
+async def close_livekit_api():
+    global _api
+    if _api is not None:
+        await _api.aclose()
+        _api = None
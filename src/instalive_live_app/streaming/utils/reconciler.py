@@ -0,0 +1,189 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from livekit import api
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.streaming.utils.livekit_client import get_livekit_api
+from instalive_live_app.streaming.utils.stream_analytics import analytics_recorder
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_SECONDS = float(os.getenv("RECONCILE_INTERVAL_SECONDS", "60"))
+# The room only exists once the host connects, so a fresh stream without one isn't an orphan yet
+RECONCILE_GRACE_SECONDS = int(os.getenv("RECONCILE_GRACE_SECONDS", "300"))
+# Streams ended this long ago are never resumed
+RECONCILE_RESUME_WINDOW_SECONDS = int(os.getenv("RECONCILE_RESUME_WINDOW_SECONDS", str(6 * 3600)))
+# Room names listed per report; the counts are always complete
+REPORT_SAMPLE_SIZE = 20
+
+# Streams ended because their room went away may come back with it; a stream someone stopped stays stopped
+RESUMABLE_END_REASONS = ("room_finished", "orphaned")
+
+LOCK_KEY = "reconciler:lock"
+REPORT_KEY = "reconciler:last_report"
+TOTALS_KEY = "reconciler:totals"
+
+
+class ReconcileReport(BaseModel):
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    rooms: int = 0
+    live_streams: int = 0
+    # Live streams without a room, now ended
+    orphaned: int = 0
+    # Ended streams whose room still has its host publishing, now live again
+    resumed: int = 0
+    orphaned_rooms: List[str] = []
+    resumed_rooms: List[str] = []
+    error: Optional[str] = None
+
+
+class StreamReconciler:
+    """
+    Reconciles stream status with LiveKit for when webhooks are lost: live streams whose room
+    is gone are ended, and streams that ended with their room while the room is still up with
+    the host publishing are put back live. Each run is one list_rooms call, one query for the
+    candidate streams and at most one update_many per direction.
+    """
+
+    def __init__(self, interval: float = RECONCILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_report: Optional[ReconcileReport] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self, now: Optional[datetime] = None) -> ReconcileReport:
+        now = now or datetime.now(timezone.utc)
+        report = ReconcileReport(started_at=now)
+        try:
+            rooms = (await get_livekit_api().room.list_rooms(api.ListRoomsRequest())).rooms
+            publishing = {room.name for room in rooms if room.num_publishers > 0}
+            names = [room.name for room in rooms]
+            report.rooms = len(names)
+
+            streams = await LiveStreamModel.get_motor_collection().find(
+                {"$or": [
+                    {"status": "live"},
+                    {
+                        "status": "ended",
+                        "channel_name": {"$in": names},
+                        "end_reason": {"$in": list(RESUMABLE_END_REASONS)},
+                        "end_time": {"$gte": now - timedelta(seconds=RECONCILE_RESUME_WINDOW_SECONDS)},
+                    },
+                ]},
+                {"channel_name": 1, "status": 1, "created_at": 1},
+            ).to_list(length=None)
+
+            existing = set(names)
+            cutoff = now - timedelta(seconds=RECONCILE_GRACE_SECONDS)
+            orphans, resumed = [], []
+            for doc in streams:
+                if doc["status"] == "live":
+                    report.live_streams += 1
+                    created_at = doc["created_at"].replace(tzinfo=doc["created_at"].tzinfo or timezone.utc)
+                    if doc["channel_name"] not in existing and created_at < cutoff:
+                        orphans.append(doc)
+                elif doc["channel_name"] in publishing:
+                    resumed.append(doc)
+
+            if orphans:
+                # status in the filter: a stream stopped meanwhile keeps its own end_time
+                result = await LiveStreamModel.get_motor_collection().update_many(
+                    {"_id": {"$in": [doc["_id"] for doc in orphans]}, "status": "live"},
+                    {"$set": {
+                        "status": "ended", "end_reason": "orphaned", "end_time": now,
+                        "updated_at": now, "current_viewers": 0,
+                    }},
+                )
+                report.orphaned = result.modified_count
+                for doc in orphans:
+                    analytics_recorder.gauge_room(doc["channel_name"], "viewers", 0)
+            if resumed:
+                result = await LiveStreamModel.get_motor_collection().update_many(
+                    {"_id": {"$in": [doc["_id"] for doc in resumed]}, "status": "ended"},
+                    {"$set": {"status": "live", "end_reason": None, "end_time": None, "updated_at": now}},
+                )
+                report.resumed = result.modified_count
+            report.orphaned_rooms = [doc["channel_name"] for doc in orphans[:REPORT_SAMPLE_SIZE]]
+            report.resumed_rooms = [doc["channel_name"] for doc in resumed[:REPORT_SAMPLE_SIZE]]
+        except Exception as e:
+            logger.error(f"Stream reconciliation failed: {e}")
+            report.error = str(e)
+
+        report.finished_at = datetime.now(timezone.utc)
+        self.last_report = report
+        if report.orphaned or report.resumed:
+            logger.warning(
+                f"Stream reconciliation: {report.orphaned} orphaned streams ended, {report.resumed} resumed"
+            )
+        await self._save(report)
+        return report
+
+    @staticmethod
+    async def _save(report: ReconcileReport):
+        """Keeps the report where every worker can read it; runs move between workers with the lock."""
+        r = await get_redis()
+        if not r:
+            return
+        try:
+            async with r.pipeline(transaction=False) as pipe:
+                pipe.set(REPORT_KEY, report.model_dump_json())
+                pipe.hincrby(TOTALS_KEY, "runs", 1)
+                pipe.hincrby(TOTALS_KEY, "orphaned", report.orphaned)
+                pipe.hincrby(TOTALS_KEY, "resumed", report.resumed)
+                if report.error:
+                    pipe.hincrby(TOTALS_KEY, "errors", 1)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Saving the reconciliation report failed: {e}")
+
+    async def status(self) -> Dict:
+        """The last run's report and drift totals since Redis was last emptied."""
+        report, totals = self.last_report, {}
+        r = await get_redis()
+        if r:
+            try:
+                saved, totals = await r.get(REPORT_KEY), await r.hgetall(TOTALS_KEY)
+                if saved:
+                    report = ReconcileReport.model_validate_json(saved)
+            except Exception as e:
+                logger.error(f"Reading the reconciliation report failed: {e}")
+        return {
+            "last_report": report,
+            "totals": {key: int(value) for key, value in totals.items()},
+        }
+
+    async def _acquire_lock(self) -> bool:
+        r = await get_redis()
+        if not r:
+            return True
+        try:
+            return bool(await r.set(LOCK_KEY, os.getpid(), nx=True, px=int(self.interval * 900)))
+        except Exception as e:
+            logger.error(f"Reconciler lock failed: {e}")
+            return True
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not await self._acquire_lock():
+                continue
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Reconciler loop error: {e}")
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+stream_reconciler = StreamReconciler()
@@ -0,0 +1,205 @@
+import os
+import uuid
+import asyncio
+import logging
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from pymongo import UpdateOne
+from instalive_live_app.streaming.models.analytics import StreamAnalyticsBucketModel
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "10"))
+# Summed per bucket when downsampling
+COUNTERS = ("joins", "paid", "likes", "comments", "gifts", "coins")
+# Concurrent viewers: the highest sample in the bucket
+GAUGES = ("viewers",)
+# Allowed resolutions in seconds; without one, the finest that fits MAX_POINTS is used
+RESOLUTIONS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600}
+MAX_POINTS = 360
+MAX_RANGE = timedelta(days=31)
+ROOM_CACHE_SIZE = 10_000
+
+Key = Tuple[UUID, datetime]
+
+
+def minute_of(at: Optional[datetime] = None) -> datetime:
+    return (at or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+
+
+def as_utc(at: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes
+    return at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+
+class AnalyticsRecorder:
+    """
+    Collects per-minute stream metrics in memory and writes them every flush as one
+    upsert per stream-hour bucket ($inc for counters, $max for viewers).
+    `record` is a dict update, so the like/comment/gift/payment paths pay nothing for it.
+    """
+
+    def __init__(self, flush_seconds: float = ANALYTICS_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._counts: Dict[Key, Counter] = defaultdict(Counter)
+        self._room_gauges: Dict[Tuple[str, datetime], Dict[str, int]] = {}
+        # Channel names never change, so resolved rooms are cached
+        self._rooms: "OrderedDict[str, UUID]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, session_id, metric: str, amount: int = 1, at: Optional[datetime] = None):
+        key = (session_id if isinstance(session_id, UUID) else UUID(str(session_id)), minute_of(at))
+        self._counts[key][metric] += amount
+
+    def gauge_room(self, room: str, metric: str, value: int, at: Optional[datetime] = None):
+        """Samples a gauge for a stream known only by its LiveKit room, e.g. from webhooks."""
+        gauges = self._room_gauges.setdefault((room, minute_of(at)), {})
+        gauges[metric] = max(gauges.get(metric, 0), value)
+
+    async def _resolve(self, rooms) -> Dict[str, UUID]:
+        missing = [room for room in rooms if room not in self._rooms]
+        if missing:
+            cursor = LiveStreamModel.get_motor_collection().find(
+                {"channel_name": {"$in": missing}}, {"channel_name": 1}
+            )
+            async for doc in cursor:
+                self._rooms[doc["channel_name"]] = doc["_id"]
+                while len(self._rooms) > ROOM_CACHE_SIZE:
+                    self._rooms.popitem(last=False)
+        return {room: self._rooms[room] for room in rooms if room in self._rooms}
+
+    @staticmethod
+    def _updates(counts: Dict[Key, Counter], gauges: Dict[Key, Dict[str, int]]) -> List[UpdateOne]:
+        buckets: Dict[Key, dict] = defaultdict(lambda: {"$inc": {}, "$max": {}})
+        for (session_id, minute), metrics in counts.items():
+            update = buckets[(session_id, minute.replace(minute=0))]
+            for metric, amount in metrics.items():
+                update["$inc"][f"minutes.{minute.minute}.{metric}"] = amount
+                update["$inc"][f"totals.{metric}"] = update["$inc"].get(f"totals.{metric}", 0) + amount
+        for (session_id, minute), metrics in gauges.items():
+            update = buckets[(session_id, minute.replace(minute=0))]
+            for metric, value in metrics.items():
+                update["$max"][f"minutes.{minute.minute}.{metric}"] = value
+                update["$max"][f"totals.{metric}"] = max(update["$max"].get(f"totals.{metric}", 0), value)
+        ops = []
+        for (session_id, hour), update in buckets.items():
+            update = {op: fields for op, fields in update.items() if fields}
+            update["$setOnInsert"] = {"_id": uuid.uuid4()}
+            ops.append(UpdateOne({"session_id": session_id, "hour": hour}, update, upsert=True))
+        return ops
+
+    def _restore(self, counts: Dict[Key, Counter], room_gauges: Dict[Tuple[str, datetime], Dict[str, int]]):
+        for key, metrics in counts.items():
+            self._counts[key].update(metrics)
+        for key, metrics in room_gauges.items():
+            gauges = self._room_gauges.setdefault(key, {})
+            for metric, value in metrics.items():
+                gauges[metric] = max(gauges.get(metric, 0), value)
+
+    async def flush(self) -> int:
+        counts, self._counts = self._counts, defaultdict(Counter)
+        room_gauges, self._room_gauges = self._room_gauges, {}
+        if not counts and not room_gauges:
+            return 0
+        try:
+            ids = await self._resolve({room for room, _ in room_gauges})
+            gauges = {
+                (ids[room], minute): metrics for (room, minute), metrics in room_gauges.items() if room in ids
+            }
+            ops = self._updates(counts, gauges)
+            await StreamAnalyticsBucketModel.get_motor_collection().bulk_write(ops, ordered=False)
+            return len(ops)
+        except Exception as e:
+            logger.error(f"Stream analytics flush failed: {e}")
+            # Retried with whatever arrives until the next flush
+            self._restore(counts, room_gauges)
+            return 0
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+analytics_recorder = AnalyticsRecorder()
+
+
+def pick_resolution(start: datetime, end: datetime, requested: Optional[str] = None) -> int:
+    if requested:
+        return RESOLUTIONS[requested]
+    span = (end - start).total_seconds()
+    for seconds in sorted(RESOLUTIONS.values()):
+        if span / seconds <= MAX_POINTS:
+            return seconds
+    return max(RESOLUTIONS.values())
+
+
+def downsample(docs: List[dict], start: datetime, end: datetime, resolution: int) -> List[dict]:
+    """
+    Folds per-minute samples into `resolution`-second points from start to end: counters
+    are summed, gauges take their maximum. Viewer counts are only sampled when they
+    change, so minutes without a sample carry the last one forward.
+    """
+    samples: Dict[datetime, Dict[str, int]] = {}
+    for doc in docs:
+        hour = as_utc(doc["hour"])
+        for minute, metrics in doc.get("minutes", {}).items():
+            samples[hour + timedelta(minutes=int(minute))] = metrics
+
+    step = timedelta(seconds=resolution)
+    origin = datetime.fromtimestamp(start.timestamp() // resolution * resolution, timezone.utc)
+    points: "OrderedDict[datetime, dict]" = OrderedDict()
+    t = origin
+    while t < end:
+        points[t] = {"t": t, **{metric: 0 for metric in COUNTERS + GAUGES}}
+        t += step
+
+    gauges = {metric: 0 for metric in GAUGES}
+    for at in sorted(at for at in samples if at < minute_of(start)):
+        gauges.update({metric: samples[at][metric] for metric in GAUGES if metric in samples[at]})
+    at = minute_of(start)
+    while at < end:
+        metrics = samples.get(at, {})
+        gauges.update({metric: metrics[metric] for metric in GAUGES if metric in metrics})
+        point = points[origin + (at - origin) // step * step]
+        for metric in COUNTERS:
+            point[metric] += metrics.get(metric, 0)
+        for metric in GAUGES:
+            point[metric] = max(point[metric], gauges[metric])
+        at += timedelta(minutes=1)
+    return list(points.values())
+
+
+async def stream_series(session_id: UUID, start: datetime, end: datetime, resolution: Optional[str] = None) -> dict:
+    resolution_seconds = pick_resolution(start, end, resolution)
+    # Includes the hour before `start`, so the viewer count at the start of the range is known
+    docs = await StreamAnalyticsBucketModel.get_motor_collection().find({
+        "session_id": session_id,
+        "hour": {"$gte": minute_of(start).replace(minute=0) - timedelta(hours=1), "$lt": end},
+    }).sort("hour", 1).to_list(length=None)
+    points = downsample(docs, start, end, resolution_seconds)
+
+    totals = {metric: sum(p[metric] for p in points) for metric in COUNTERS}
+    totals["peak_viewers"] = max((p["viewers"] for p in points), default=0)
+    return {
+        "session_id": session_id,
+        "start": start,
+        "end": end,
+        "resolution_seconds": resolution_seconds,
+        "points": points,
+        "totals": totals,
+        "conversion_rate": round(totals["paid"] / totals["joins"], 4) if totals["joins"] else 0.0,
+    }
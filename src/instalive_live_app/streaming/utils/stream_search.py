@@ -0,0 +1,112 @@
+import re
+import logging
+from typing import List
+from beanie.operators import In
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.users.models.user_models import UserModel
+from instalive_live_app.users.utils.populate_kyc import populate_users_kyc
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MAX_LIMIT = 50
+# Popular rooms win ties: the text score is scaled by 1 + POPULARITY_WEIGHT * ln(1 + views + likes)
+POPULARITY_WEIGHT = 0.1
+
+
+def host_display_name(user: UserModel) -> str:
+    return f"{user.first_name or ''} {user.last_name or ''}".strip()
+
+
+def _popularity():
+    return {"$ln": {"$add": [1, {"$ifNull": ["$total_views", 0]}, {"$ifNull": ["$total_likes", 0]}]}}
+
+
+def text_pipeline(q: str, skip: int, limit: int) -> list:
+    return [
+        {"$match": {"status": "live", "$text": {"$search": q}}},
+        {"$addFields": {"_score": {"$multiply": [
+            {"$meta": "textScore"},
+            {"$add": [1, {"$multiply": [POPULARITY_WEIGHT, _popularity()]}]},
+        ]}}},
+        {"$sort": {"_score": -1, "created_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+    ]
+
+
+def substring_pipeline(q: str, skip: int, limit: int) -> list:
+    # User input is escaped: it's matched literally and can't inject a pathological pattern
+    pattern = {"$regex": re.escape(q), "$options": "i"}
+    return [
+        {"$match": {
+            "status": "live",
+            "$or": [{field: pattern} for field in ("title", "host_name", "channel_name", "category")],
+        }},
+        {"$addFields": {"_score": _popularity()}},
+        {"$sort": {"_score": -1, "created_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+    ]
+
+
+async def search_live_streams(q: str, skip: int = 0, limit: int = 20) -> List[dict]:
+    """
+    Live streams matching `q` by title, host name, category or channel, best first.
+    Whole words go through the text index; when that finds nothing (a partial word
+    like "gam"), an escaped substring match over the live streams is used instead.
+    """
+    q = q.strip()
+    if not q:
+        return []
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    collection = LiveStreamModel.get_motor_collection()
+
+    results = await collection.aggregate(text_pipeline(q, skip, limit)).to_list(length=limit)
+    if not results and (skip == 0 or await _text_has_no_matches(q)):
+        results = await collection.aggregate(substring_pipeline(q, skip, limit)).to_list(length=limit)
+    return await _with_hosts(results)
+
+
+async def _text_has_no_matches(q: str) -> bool:
+    # An empty later page of a text search must not switch to substring results
+    return await LiveStreamModel.get_motor_collection().count_documents(
+        {"status": "live", "$text": {"$search": q}}, limit=1
+    ) == 0
+
+
+async def _with_hosts(results: List[dict]) -> List[dict]:
+    host_ids = list({res["host"].id for res in results})
+    hosts = await UserModel.find(In(UserModel.id, host_ids)).to_list()
+    by_id = {user["id"]: user for user in await populate_users_kyc(hosts)}
+
+    streams = []
+    for res in results:
+        host = by_id.get(res["host"].id)
+        if host is None:
+            continue
+        res.pop("_score", None)
+        res["id"] = res.pop("_id")
+        res["host"] = host
+        streams.append(res)
+    return streams
+
+
+async def sync_host_name(user: UserModel):
+    """Refresh the denormalized name on the user's live streams after a profile change."""
+    await LiveStreamModel.get_motor_collection().update_many(
+        {"host.$id": user.id, "status": "live"},
+        {"$set": {"host_name": host_display_name(user)}},
+    )
+
+
+async def backfill_host_names():
+    """Fill host_name on live streams started before it existed."""
+    streams = await LiveStreamModel.get_motor_collection().find(
+        {"status": "live", "host_name": {"$exists": False}}, {"host": 1}
+    ).to_list(length=None)
+    if not streams:
+        return
+    hosts = await UserModel.find(In(UserModel.id, list({s["host"].id for s in streams}))).to_list()
+    for user in hosts:
+        await sync_host_name(user)
+    logger.info(f"Backfilled host_name on {len(streams)} live streams")
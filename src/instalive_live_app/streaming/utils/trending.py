@@ -0,0 +1,278 @@
+import os
+import json
+import math
+import time
+import heapq
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence
+from uuid import UUID
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the tick falls back to plain Python
+    np = None
+
+# An event counts half as much after this long
+TRENDING_HALF_LIFE_SECONDS = float(os.getenv("TRENDING_HALF_LIFE_SECONDS", "600"))
+TRENDING_TICK_SECONDS = float(os.getenv("TRENDING_TICK_SECONDS", "15"))
+# Overrides as JSON, e.g. {"like": 0.2, "viewers": 5}
+TRENDING_WEIGHTS = os.getenv("TRENDING_WEIGHTS")
+TRENDING_MAX_LIMIT = 50
+# A bump this many half-lives after the epoch rescales first, long before e^(λ·age) overflows
+# (that would be ~1000 half-lives, a week at the default); ticks normally keep the epoch seconds old
+MAX_EPOCH_HALF_LIVES = 32
+
+# Per event; "coins" is per coin gifted. "viewers" weighs log(1 + concurrent viewers).
+DEFAULT_WEIGHTS = {"join": 1.0, "like": 0.1, "comment": 0.5, "coins": 0.02, "viewers": 3.0}
+
+EPOCH_KEY = "trending:epoch"
+EVENTS_KEY = "trending:events"
+ALL_KEY = "trending:all"
+CATEGORIES_KEY = "trending:categories"
+# One worker recomputes per tick
+LOCK_KEY = "trending:lock"
+
+# Scores are kept in units of the epoch: an event at time t adds weight * e^(λ(t - epoch)),
+# so one ZINCRBY ranks it against older events without touching them. The tick moves the
+# epoch forward and rescales, which keeps the numbers small. Without ticks (every worker
+# down, or the tick failing) the bump rescales the sets it touches itself; other category
+# sets are rewritten by the next tick.
+BUMP = """
+local clock = redis.call('TIME')
+local now = clock[1] + clock[2] / 1000000
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if epoch == nil then
+    epoch = now
+    redis.call('SET', KEYS[1], tostring(now))
+elseif now - epoch > tonumber(ARGV[4]) then
+    local factor = math.exp(-tonumber(ARGV[2]) * (now - epoch))
+    for i = 2, #KEYS do
+        local entries = redis.call('ZRANGE', KEYS[i], 0, -1, 'WITHSCORES')
+        for j = 1, #entries, 2 do
+            redis.call('ZADD', KEYS[i], tonumber(entries[j + 1]) * factor, entries[j])
+        end
+    end
+    epoch = now
+    redis.call('SET', KEYS[1], tostring(now))
+end
+local inc = tonumber(ARGV[1]) * math.exp(tonumber(ARGV[2]) * (now - epoch))
+for i = 2, #KEYS do
+    redis.call('ZINCRBY', KEYS[i], inc, ARGV[3])
+end
+return tostring(inc)
+"""
+
+# Rescales every event score to the current time and makes it the new epoch.
+REBASE = """
+local clock = redis.call('TIME')
+local now = clock[1] + clock[2] / 1000000
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if epoch ~= nil then
+    local factor = math.exp(-tonumber(ARGV[1]) * (now - epoch))
+    local entries = redis.call('ZRANGE', KEYS[2], 0, -1, 'WITHSCORES')
+    for i = 1, #entries, 2 do
+        redis.call('ZADD', KEYS[2], tonumber(entries[i + 1]) * factor, entries[i])
+    end
+end
+redis.call('SET', KEYS[1], tostring(now))
+return redis.call('ZRANGE', KEYS[2], 0, -1, 'WITHSCORES')
+"""
+
+
+def load_weights() -> Dict[str, float]:
+    weights = dict(DEFAULT_WEIGHTS)
+    if TRENDING_WEIGHTS:
+        try:
+            weights.update({k: float(v) for k, v in json.loads(TRENDING_WEIGHTS).items()})
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Invalid TRENDING_WEIGHTS, using defaults: {e}")
+    return weights
+
+
+def category_key(category: Optional[str]) -> str:
+    return f"trending:cat:{(category or '').strip().lower()}"
+
+
+def combine(events: Sequence[float], viewers: Sequence[int], weight: float) -> List[float]:
+    """Trending score per stream: decayed event score plus the weighted log of its live audience."""
+    if np is not None:
+        return (np.asarray(events, dtype=float) + weight * np.log1p(np.asarray(viewers, dtype=float))).tolist()
+    return [e + weight * math.log1p(v) for e, v in zip(events, viewers)]
+
+
+class LocalTrending:
+    """Per-worker scores used while Redis is unavailable; reads take the top k with a heap."""
+
+    def __init__(self, decay: float):
+        self.decay = decay
+        self.max_age = MAX_EPOCH_HALF_LIVES * math.log(2) / decay
+        self.epoch = time.time()
+        self.events: Dict[str, float] = {}
+        self.scores: Dict[str, float] = {}
+        self.categories: Dict[str, str] = {}
+
+    def bump(self, stream_id: str, category: Optional[str], weight: float):
+        age = time.time() - self.epoch
+        if age > self.max_age:
+            # No tick for a long while; the published scores decay along with the events
+            factor = math.exp(-self.decay * age)
+            self.scores = {k: v * factor for k, v in self.scores.items()}
+            self.rebase()
+        inc = weight * math.exp(self.decay * (time.time() - self.epoch))
+        self.events[stream_id] = self.events.get(stream_id, 0.0) + inc
+        self.scores[stream_id] = self.scores.get(stream_id, 0.0) + inc
+        self.categories[stream_id] = category_key(category)
+
+    def rebase(self) -> Dict[str, float]:
+        now = time.time()
+        factor = math.exp(-self.decay * (now - self.epoch))
+        self.events = {k: v * factor for k, v in self.events.items()}
+        self.epoch = now
+        return self.events
+
+    def top(self, category: Optional[str], limit: int) -> List[str]:
+        key = category_key(category) if category else None
+        candidates = (
+            (score, stream_id) for stream_id, score in self.scores.items()
+            if key is None or self.categories.get(stream_id) == key
+        )
+        return [stream_id for _, stream_id in heapq.nlargest(limit, candidates)]
+
+
+class TrendingRanker:
+    """
+    Ranks live streams by a time-decayed blend of joins, likes, comments, gifted coins
+    and concurrent viewers. Events bump Redis sorted sets (O(log n)); reads take the top
+    of one set (O(log n + k)). A periodic tick rescales the scores, folds in the viewer
+    counts for every live stream at once and drops streams that ended.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, half_life: float = TRENDING_HALF_LIFE_SECONDS):
+        self.weights = weights if weights is not None else load_weights()
+        self.decay = math.log(2) / half_life
+        self.local = LocalTrending(self.decay)
+        self._task: Optional[asyncio.Task] = None
+
+    async def bump(self, stream_id, category: Optional[str], event: str, amount: float = 1):
+        weight = self.weights.get(event, 0.0) * amount
+        if weight <= 0:
+            return
+        r = await get_redis()
+        if r:
+            try:
+                await r.eval(
+                    BUMP, 4, EPOCH_KEY, EVENTS_KEY, ALL_KEY, category_key(category),
+                    weight, self.decay, str(stream_id), self.local.max_age,
+                )
+                return
+            except Exception as e:
+                logger.error(f"Trending bump failed: {e}")
+        self.local.bump(str(stream_id), category, weight)
+
+    async def top_ids(self, category: Optional[str] = None, limit: int = 20) -> List[UUID]:
+        limit = max(1, min(limit, TRENDING_MAX_LIMIT))
+        ids = None
+        r = await get_redis()
+        if r:
+            try:
+                ids = await r.zrevrange(category_key(category) if category else ALL_KEY, 0, limit - 1)
+            except Exception as e:
+                logger.error(f"Trending read failed: {e}")
+        if ids is None:
+            ids = self.local.top(category, limit)
+        return [UUID(i) for i in ids]
+
+    async def tick(self) -> int:
+        """Recomputes every live stream's score; returns how many were ranked."""
+        live = await LiveStreamModel.get_motor_collection().find(
+            {"status": "live"}, {"category": 1, "current_viewers": 1}
+        ).to_list(length=None)
+        ids = [str(doc["_id"]) for doc in live]
+        categories = [category_key(doc.get("category")) for doc in live]
+
+        r = await get_redis()
+        events = None
+        if r:
+            try:
+                flat = await r.eval(REBASE, 2, EPOCH_KEY, EVENTS_KEY, self.decay)
+                events = {flat[i]: float(flat[i + 1]) for i in range(0, len(flat), 2)}
+            except Exception as e:
+                logger.error(f"Trending rebase failed: {e}")
+                r = None
+        if events is None:
+            events = self.local.rebase()
+
+        scores = combine([events.get(i, 0.0) for i in ids], [doc.get("current_viewers", 0) for doc in live],
+                         self.weights.get("viewers", 0.0))
+        live_ids = set(ids)
+        ended = [i for i in events if i not in live_ids]
+        if r:
+            await self._publish(r, ids, categories, scores, ended)
+        else:
+            for stream_id in ended:
+                self.local.events.pop(stream_id, None)
+            self.local.scores = dict(zip(ids, scores))
+            self.local.categories = dict(zip(ids, categories))
+        return len(ids)
+
+    @staticmethod
+    async def _publish(r, ids: List[str], categories: List[str], scores: List[float], ended: List[str]):
+        by_key: Dict[str, Dict[str, float]] = {ALL_KEY: {}}
+        for stream_id, key, score in zip(ids, categories, scores):
+            by_key[ALL_KEY][stream_id] = score
+            by_key.setdefault(key, {})[stream_id] = score
+        previous = set(await r.smembers(CATEGORIES_KEY))
+        async with r.pipeline(transaction=True) as pipe:
+            if ended:
+                pipe.zrem(EVENTS_KEY, *ended)
+            for key, members in by_key.items():
+                if members:
+                    # Built aside and swapped in, so readers never see a half-written ranking
+                    pipe.zadd(f"{key}:next", members)
+                    pipe.rename(f"{key}:next", key)
+                else:
+                    pipe.delete(key)
+            for key in previous - set(by_key):
+                pipe.delete(key)
+            pipe.delete(CATEGORIES_KEY)
+            categories_now = [k for k in by_key if k != ALL_KEY]
+            if categories_now:
+                pipe.sadd(CATEGORIES_KEY, *categories_now)
+            await pipe.execute()
+
+    async def _acquire_lock(self) -> bool:
+        r = await get_redis()
+        if not r:
+            return True
+        try:
+            return bool(await r.set(LOCK_KEY, os.getpid(), nx=True, px=int(TRENDING_TICK_SECONDS * 900)))
+        except Exception as e:
+            logger.error(f"Trending lock failed: {e}")
+            return True
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(TRENDING_TICK_SECONDS)
+            if not await self._acquire_lock():
+                continue
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Trending tick failed: {e}")
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+trending = TrendingRanker()
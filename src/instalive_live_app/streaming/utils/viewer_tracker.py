@@ -0,0 +1,234 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from pymongo import UpdateOne
+from instalive_live_app.core.redis_client import get_redis
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.streaming.utils.stream_analytics import analytics_recorder
+
+logger = logging.getLogger(__name__)
+
+# Counts are written to the streams this often; webhooks only touch Redis
+VIEWER_FLUSH_SECONDS = float(os.getenv("VIEWER_FLUSH_SECONDS", "5"))
+VIEWER_FLUSH_BATCH = 500
+# Room state outlives any stream; it is dropped when the room finishes
+ROOM_STATE_TTL_SECONDS = 24 * 3600
+
+DIRTY_KEY = "live:dirty"
+
+# Adds a viewer, raises the peak if needed and counts them towards the uniques, in one round trip.
+# KEYS: viewers set, peak, uniques HLL, dirty rooms. ARGV: identity, room, ttl.
+JOIN = """
+redis.call('SADD', KEYS[1], ARGV[1])
+local count = redis.call('SCARD', KEYS[1])
+local peak = tonumber(redis.call('GET', KEYS[2]) or '0')
+if count > peak then
+    peak = count
+    redis.call('SET', KEYS[2], peak)
+end
+redis.call('PFADD', KEYS[3], ARGV[1])
+redis.call('SADD', KEYS[4], ARGV[2])
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], ARGV[3])
+end
+return {count, peak}
+"""
+
+
+def room_keys(room: str) -> List[str]:
+    return [f"live:viewers:{room}", f"live:peak:{room}", f"live:uniques:{room}"]
+
+
+def host_identity(room: str) -> Optional[str]:
+    """Rooms are named live_<host id>_<timestamp>; the host isn't one of their viewers."""
+    parts = room.split("_")
+    return parts[1] if len(parts) == 3 and parts[0] == "live" else None
+
+
+class LocalRooms:
+    """Per-worker room state used while Redis is unavailable. Uniques are counted exactly."""
+
+    def __init__(self):
+        self.viewers: Dict[str, Set[str]] = {}
+        self.peaks: Dict[str, int] = {}
+        self.uniques: Dict[str, Set[str]] = {}
+        self.dirty: Set[str] = set()
+
+    def join(self, room: str, identity: str) -> Tuple[int, int]:
+        viewers = self.viewers.setdefault(room, set())
+        viewers.add(identity)
+        self.uniques.setdefault(room, set()).add(identity)
+        self.peaks[room] = max(self.peaks.get(room, 0), len(viewers))
+        self.dirty.add(room)
+        return len(viewers), self.peaks[room]
+
+    def leave(self, room: str, identity: str):
+        self.viewers.get(room, set()).discard(identity)
+        self.dirty.add(room)
+
+    def counts(self, room: str) -> Tuple[int, int, int]:
+        return len(self.viewers.get(room, ())), self.peaks.get(room, 0), len(self.uniques.get(room, ()))
+
+    def drop(self, room: str):
+        self.viewers.pop(room, None)
+        self.peaks.pop(room, None)
+        self.uniques.pop(room, None)
+        self.dirty.discard(room)
+
+
+class ViewerTracker:
+    """
+    Concurrent, peak and unique viewer counts per LiveKit room, fed by participant webhooks.
+    The counts live in Redis (a set of identities, a peak counter and a HyperLogLog of
+    everyone who joined) and are written to the live streams in periodic bulk writes,
+    so a burst of joins costs one database round trip per flush instead of one per join.
+    """
+
+    def __init__(self, flush_seconds: float = VIEWER_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.local = LocalRooms()
+        self._task: Optional[asyncio.Task] = None
+
+    async def joined(self, room: str, identity: str) -> Optional[Tuple[int, int]]:
+        if not identity or identity == host_identity(room):
+            return None
+        r = await get_redis()
+        if r:
+            try:
+                count, peak = await r.eval(JOIN, 4, *room_keys(room), DIRTY_KEY, identity, room, ROOM_STATE_TTL_SECONDS)
+                return int(count), int(peak)
+            except Exception as e:
+                logger.error(f"Viewer join for {room} failed: {e}")
+        return self.local.join(room, identity)
+
+    async def left(self, room: str, identity: str):
+        if not identity or identity == host_identity(room):
+            return
+        r = await get_redis()
+        if r:
+            try:
+                async with r.pipeline(transaction=False) as pipe:
+                    pipe.srem(room_keys(room)[0], identity)
+                    pipe.sadd(DIRTY_KEY, room)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                logger.error(f"Viewer leave for {room} failed: {e}")
+        self.local.leave(room, identity)
+
+    async def touch(self, room: str):
+        """Makes the next flush write the room's counts, e.g. zeros for a room that just started."""
+        r = await get_redis()
+        if r:
+            try:
+                await r.sadd(DIRTY_KEY, room)
+                return
+            except Exception as e:
+                logger.error(f"Marking {room} failed: {e}")
+        self.local.dirty.add(room)
+
+    async def _redis_counts(self, r, rooms: List[str]) -> List[Tuple[int, int, int]]:
+        async with r.pipeline(transaction=False) as pipe:
+            for room in rooms:
+                viewers, peak, uniques = room_keys(room)
+                pipe.scard(viewers)
+                pipe.get(peak)
+                pipe.pfcount(uniques)
+            results = await pipe.execute()
+        return [
+            (int(results[i]), int(results[i + 1] or 0), int(results[i + 2]))
+            for i in range(0, len(results), 3)
+        ]
+
+    @staticmethod
+    def _update(room: str, counts: Tuple[int, int, int]) -> UpdateOne:
+        current, peak, uniques = counts
+        # $max: a flush from a worker that fell back to local counts never lowers the totals
+        return UpdateOne(
+            {"channel_name": room},
+            {"$set": {"current_viewers": current}, "$max": {"peak_viewers": peak, "unique_viewers": uniques}},
+        )
+
+    async def flush(self) -> int:
+        """Writes the counts of every room that changed since the last flush."""
+        local_rooms = list(self.local.dirty)
+        self.local.dirty.clear()
+        counted = [(room, self.local.counts(room)) for room in local_rooms]
+
+        r = await get_redis()
+        rooms: List[str] = []
+        if r:
+            try:
+                rooms = await r.spop(DIRTY_KEY, VIEWER_FLUSH_BATCH) or []
+                if rooms:
+                    counted.extend(zip(rooms, await self._redis_counts(r, rooms)))
+            except Exception as e:
+                logger.error(f"Reading viewer counts failed: {e}")
+        if not counted:
+            return 0
+        ops = []
+        for room, counts in counted:
+            ops.append(self._update(room, counts))
+            # Sampled whenever the count changes; the analytics carry it forward in between
+            analytics_recorder.gauge_room(room, "viewers", counts[0])
+        try:
+            await LiveStreamModel.get_motor_collection().bulk_write(ops, ordered=False)
+        except Exception as e:
+            logger.error(f"Viewer count flush failed: {e}")
+            # Retried on the next flush
+            self.local.dirty.update(local_rooms)
+            if r and rooms:
+                try:
+                    await r.sadd(DIRTY_KEY, *rooms)
+                except Exception:
+                    pass
+        return len(ops)
+
+    async def finish(self, room: str) -> Tuple[int, int, int]:
+        """Final counts of a finished room; its state is dropped afterwards."""
+        counts = self.local.counts(room)
+        self.local.drop(room)
+        r = await get_redis()
+        if r:
+            try:
+                redis_counts = (await self._redis_counts(r, [room]))[0]
+                counts = tuple(max(a, b) for a, b in zip(counts, redis_counts))
+                async with r.pipeline(transaction=False) as pipe:
+                    pipe.delete(*room_keys(room))
+                    pipe.srem(DIRTY_KEY, room)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f"Final viewer counts for {room} failed: {e}")
+        return counts
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Viewer tracker loop error: {e}")
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        # Whatever changed since the last tick
+        await self.flush()
+
+
+viewer_tracker = ViewerTracker()
+
+
+async def mark_media_started(room: str):
+    """Records when the host's first track was published; later tracks leave it alone."""
+    await LiveStreamModel.get_motor_collection().update_one(
+        {"channel_name": room, "media_started_at": None},
+        {"$set": {"media_started_at": datetime.now(timezone.utc)}},
+    )
@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from typing import Optional
+from enum import Enum
+from pydantic import Field
+from instalive_live_app.core.base.base import BaseCollection
+
+
+class OutboundEmailStatus(str, Enum):
+    PENDING = "PENDING"  # not delivered yet; replayed by the email queue
+    FAILED = "FAILED"    # rejected by the provider or out of attempts; kept for inspection, not retried
+    EXPIRED = "EXPIRED"  # time-sensitive mail (OTP codes) that could not be sent while still useful
+
+
+class OutboundEmailModel(BaseCollection):
+    """Mail the email queue could not deliver (provider down, or the worker shut down first)."""
+    to_email: str
+    from_email: str
+    subject: str
+    content: str
+    status: OutboundEmailStatus = OutboundEmailStatus.PENDING
+    attempts: int = 0
+    last_error: Optional[str] = None
+    # Not sent after this (see EmailMessage.expires_at)
+    expires_at: Optional[datetime] = None
+    # A worker that picked the email up for replay owns it until then
+    locked_until: Optional[datetime] = None
+
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "outbound_emails"
@@ -1,12 +1,14 @@
-from beanie import before_event, Replace, Save
+from beanie import before_event, Insert, Replace, Save
 from pydantic import EmailStr, Field
 from typing import Optional
 from datetime import datetime, timezone
 from instalive_live_app.core.base.base import BaseCollection
 from instalive_live_app.users.utils.account_status import AccountStatus
 from instalive_live_app.users.utils.user_role import UserRole
-from typing import List
+from typing import Dict, List
 from beanie import Link
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from instalive_live_app.users.utils.search_prefixes import user_search_prefixes
 
 
 class UserModel(BaseCollection):
@@ -23,10 +25,19 @@ class UserModel(BaseCollection):
     date_of_birth:Optional[str]=None
     bio:Optional[str]=None
 
+    # Not kept up to date in Mongo; the presence service (chating/utils/presence.py) is the source of truth
     is_online: bool = Field(default=False)
     following: List[Link["UserModel"]] = [] 
+    # When each followed user (by id) was followed; hides their broadcasts from before that
+    followed_at: Dict[str, datetime] = {}
     following_count: int = Field(default=0)
     followers_count: int = Field(default=0)
+    # Broadcast (fan-out-on-read) notifications older than this count as read
+    notifications_read_at: Optional[datetime] = None
+    # Last Stripe events credited to this account; guards the coin increment against re-processing
+    applied_stripe_events: List[str] = []
+    # Edge n-grams of the name and email local part, for prefix search (users/utils/search_prefixes.py)
+    search_prefixes: List[str] = []
     total_likes: int = Field(default=0)
     shady:float = Field(default=0.0)
 
@@ -35,6 +46,9 @@ class UserModel(BaseCollection):
     role: Optional[UserRole] = Field(default=UserRole.USER)
     profile_image: Optional[str] = Field(default=None)
     cover_image: Optional[str] = Field(default=None)
+    # Downscaled WebP copies keyed by size ("64", "256", "1024"), see core/image_variants.py
+    profile_image_variants: Dict[str, str] = {}
+    cover_image_variants: Dict[str, str] = {}
     auth_provider: str =  Field(default="email")
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -44,6 +58,16 @@ class UserModel(BaseCollection):
     def update_timestamp(self):
         self.updated_at = datetime.now(timezone.utc)
 
+    @before_event([Insert, Save, Replace])
+    def update_search_prefixes(self):
+        self.search_prefixes = user_search_prefixes(self.first_name, self.last_name, self.email)
+
     class Settings:
         name = "users"
+        indexes = [
+            # Follower lookups page through `following` by _id
+            IndexModel([("following.$id", ASCENDING), ("_id", ASCENDING)]),
+            # Prefix search returns the most followed matches first straight from the index
+            IndexModel([("search_prefixes", ASCENDING), ("followers_count", DESCENDING)]),
+        ]
 
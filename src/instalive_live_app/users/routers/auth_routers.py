@@ -10,9 +10,9 @@ from instalive_live_app.users.utils.password import hash_password, verify_passwo
 from instalive_live_app.users.utils.token_generate import create_access_token
 from instalive_live_app.users.utils.user_role import UserRole
 from instalive_live_app.users.utils.get_current_user import get_current_user
-import requests
+from instalive_live_app.users.utils.google_auth import google_verifier, GoogleAuthError
 from uuid import UUID
-from typing import Union
+from typing import Optional, Union
 from instalive_live_app.notifications.utils import send_notification
 from instalive_live_app.notifications.models import NotificationType
 from instalive_live_app.users.utils.email_config import send_otp
@@ -321,19 +321,23 @@ async def reset_password(request: ResetPasswordRequest):
 
 
 @router.post("/google-login",status_code=status.HTTP_201_CREATED)
-async def google_login_token(access_token: str):
-
-    if access_token is None:
+async def google_login_token(access_token: Optional[str] = None, id_token: Optional[str] = None):
+    """
+    Sign in with Google. Prefer `id_token`: it is verified locally against Google's cached keys.
+    `access_token` is checked with Google's userinfo endpoint (cached for a few minutes).
+    """
+    if access_token is None and id_token is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="please give me token")
 
-
-    response = requests.get(
-        f'https://www.googleapis.com/oauth2/v2/userinfo?access_token={access_token}'
-    )
-    if response.status_code != 200:
+    try:
+        if id_token:
+            user_info = await google_verifier.verify_id_token(id_token)
+        else:
+            user_info = await google_verifier.verify_access_token(access_token)
+    except GoogleAuthError as e:
+        logger.info(f"Google login rejected: {e}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Google token")
 
-    user_info = response.json()
     email = user_info["email"]
     name = user_info.get("name", "")
     picture = user_info.get("picture", "")
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from uuid import UUID
+from datetime import datetime, timezone
 from instalive_live_app.users.utils.get_current_user import get_current_user
 from instalive_live_app.users.models.user_models import UserModel
 from typing import List
 from instalive_live_app.notifications.utils import send_notification
 from instalive_live_app.notifications.models import NotificationType
+from instalive_live_app.chating.utils.presence import presence, hydrate_online_users
 
 router = APIRouter(
     prefix="/social",
@@ -41,6 +43,7 @@ async def follow_user(target_id: str, current_user: UserModel = Depends(get_curr
         return {"message": "Already following this user"}
 
     current_user.following.append(target_user)
+    current_user.followed_at[str(target_oid)] = datetime.now(timezone.utc)
     current_user.following_count += 1
     target_user.followers_count += 1
 
@@ -81,6 +84,7 @@ async def unfollow_user(target_id: str, current_user: UserModel = Depends(get_cu
         raise HTTPException(status_code=404, detail="User not found")
 
     current_user.following.remove(target_user_in_list)
+    current_user.followed_at.pop(str(target_oid), None)
     current_user.following_count = max(0, current_user.following_count - 1)
     target_user.followers_count = max(0, target_user.followers_count - 1)
 
@@ -98,20 +102,39 @@ async def get_my_following(current_user: UserModel = Depends(get_current_user)):
 
 
 @router.get("/active-priority-list")
-async def get_active_priority_list(current_user: UserModel = Depends(get_current_user)):
+async def get_active_priority_list(skip: int = 0, limit: int = 50, current_user: UserModel = Depends(get_current_user)):
     """
     Original requirement: Online list with followed user (User B) at the top
     """
-    # 1. Get online users
-    online_users = await UserModel.find(UserModel.is_online == True).to_list()
+    me = str(current_user.id)
 
-    # 2. Create a set of following IDs for the current user (for fast searching)
-    following_ids = {get_link_id(link) for link in current_user.following}
+    # 1. Online followings first: intersect the following ids with the online set
+    following_ids = [get_link_id(link) for link in current_user.following]
+    online_following = await presence.filter_online(following_ids)
 
-    # 3. Sorting: Followed users (User B) will be at the top of the list
-    online_users.sort(key=lambda u: str(u.id) in following_ids, reverse=True)
+    # 2. Fill the rest of the page with other online users
+    page_ids = online_following[skip:skip + limit]
+    remaining = limit - len(page_ids)
+    if remaining > 0:
+        exclude = set(online_following)
+        exclude.add(me)
+        others_skip = max(0, skip - len(online_following))
+        candidates = await presence.online_ids(skip=0, limit=others_skip + remaining + len(exclude))
+        others = [uid for uid in candidates if uid not in exclude]
+        page_ids.extend(others[others_skip:others_skip + remaining])
 
-    return online_users
+    # 3. One $in query for the whole page, order preserved
+    return await hydrate_online_users(page_ids)
+
+
+@router.get("/me/following-online")
+async def get_online_following(current_user: UserModel = Depends(get_current_user)):
+    """
+    Which of the users I follow are online right now.
+    """
+    following_ids = [get_link_id(link) for link in current_user.following]
+    online_following = await presence.filter_online(following_ids)
+    return await hydrate_online_users(online_following)
 
 
 @router.get("/me/followers-list")
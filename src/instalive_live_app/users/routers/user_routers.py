@@ -1,26 +1,25 @@
 
 from fastapi import APIRouter, HTTPException, status, Depends, File, UploadFile
 from uuid import UUID
-import shutil
-import os
-from pathlib import Path
 from typing import List
 from instalive_live_app.users.models.user_models import UserModel
-from instalive_live_app.users.schemas.user_schemas import UserResponse, ProfileResponse, ModeratorProfileResponse, ProfileUpdateRequest, KYCResponse, ModeratorResponse, PendingKYCStatsResponse, KYCUpdate, PublicProfileResponse
+from instalive_live_app.users.schemas.user_schemas import UserResponse, ProfileResponse, ModeratorProfileResponse, ProfileUpdateRequest, KYCResponse, ModeratorResponse, PendingKYCStatsResponse, KYCUpdate, PublicProfileResponse, UserTypeaheadResponse
 from instalive_live_app.users.utils.get_current_user import get_current_user
 from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.streaming.utils.stream_search import sync_host_name
 from instalive_live_app.users.models.kyc_models import KYCModel
 from instalive_live_app.users.models.moderator_models import ModeratorModel
-from instalive_live_app.users.utils.populate_kyc import populate_user_kyc
+from instalive_live_app.users.utils.populate_kyc import populate_user_kyc, populate_users_kyc
+from instalive_live_app.users.utils import user_search
+from instalive_live_app.core.uploads import save_upload
+from instalive_live_app.core import blob_store
+from instalive_live_app.core.image_variants import image_variants
 from typing import Union
-from datetime import datetime
 from instalive_live_app.users.utils.user_role import UserRole
 
 # Define the router for User Management
 user_router = APIRouter(prefix="/users", tags=["Users"])
 
-ALLOWED_TYPES = {"image/jpeg", "image/png", "image/jpg", "image/webp"}
-MAX_SIZE = 5 * 1024 * 1024  # 5MB
 
 @user_router.get("/", response_model=List[UserResponse], status_code=status.HTTP_200_OK)
 async def get_all_users(skip: int = 0, limit: int = 20):
@@ -45,24 +44,18 @@ async def get_all_users(skip: int = 0, limit: int = 20):
 @user_router.get("/search", response_model=List[UserResponse], status_code=status.HTTP_200_OK)
 async def search_users(query: str, skip: int = 0, limit: int = 20):
     """
-    Search users by name or email.
+    Search users by the start of any word in their name or email, most followed first.
     """
-    search_filter = {
-        "$or": [
-            {"first_name": {"$regex": query, "$options": "i"}},
-            {"last_name": {"$regex": query, "$options": "i"}},
-            {"email": {"$regex": query, "$options": "i"}}
-        ]
-    }
-    users = await UserModel.find(search_filter).skip(skip).limit(limit).to_list()
-    
-    # Populate KYC data for each user
-    users_with_kyc = []
-    for user in users:
-        user_data = await populate_user_kyc(user)
-        users_with_kyc.append(user_data)
-    
-    return users_with_kyc
+    users = await user_search.search_users(query, skip=skip, limit=limit)
+    return await populate_users_kyc(users)
+
+
+@user_router.get("/typeahead", response_model=List[UserTypeaheadResponse], status_code=status.HTTP_200_OK)
+async def typeahead_users(q: str, limit: int = 10):
+    """
+    Suggestions while typing: slim profiles of the top matches for a name prefix.
+    """
+    return await user_search.typeahead(q, limit=limit)
 
 
 @user_router.get("/my_profile", response_model=Union[ProfileResponse, ModeratorProfileResponse])
@@ -104,6 +97,8 @@ async def update_my_profile(
         setattr(current_user, key, value)
     
     await current_user.save()
+    if "first_name" in update_dict or "last_name" in update_dict:
+        await sync_host_name(current_user)
     return current_user
 
 
@@ -115,47 +110,15 @@ async def upload_profile_image(
     """
     Upload a profile image and return the URL.
     """
+    image_url = await save_upload(image)
 
-
-    # Robust check: allow application/octet-stream if extension is valid
-    is_valid_type = image.content_type in ALLOWED_TYPES
-    if not is_valid_type and image.content_type == "application/octet-stream":
-        extension = Path(image.filename).suffix.lower()
-        if extension in ['.jpg', '.jpeg', '.png', '.webp']:
-            is_valid_type = True
-
-    if not is_valid_type:
-        raise HTTPException(
-            status_code=400,
-            detail="Only JPG, PNG or WEBP images are allowed",
-        )
-
-        # Size validation
-    contents = await image.read()
-
-    if len(contents) > MAX_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail="Image size must be under 5MB",
-        )
-
-    extension = Path(image.filename).suffix
-
-    profile_dir = os.path.join("uploads", "profiles")
-    if not os.path.exists(profile_dir):
-        os.makedirs(profile_dir)
-
-    filename = f"profile{current_user.id}{datetime.now().timestamp()}{extension}"
-    file_path = os.path.join(profile_dir, filename)
-    
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
-    
-    image_url = f"/uploads/profiles/{filename}"
-    
     # Update user profile
+    previous = current_user.profile_image
     current_user.profile_image = image_url
+    current_user.profile_image_variants = {}
     await current_user.save()
+    await blob_store.release(previous)
+    image_variants.schedule(UserModel, current_user.id, "profile_image", "profile_image_variants", image_url)
     
     return {"image_url": image_url}
 
@@ -168,46 +131,15 @@ async def upload_cover_image(
     """
     Upload a cover image and return the URL.
     """
+    image_url = await save_upload(image)
 
-    # Robust check: allow application/octet-stream if extension is valid
-    is_valid_type = image.content_type in ALLOWED_TYPES
-    if not is_valid_type and image.content_type == "application/octet-stream":
-        extension = Path(image.filename).suffix.lower()
-        if extension in ['.jpg', '.jpeg', '.png', '.webp']:
-            is_valid_type = True
-
-    if not is_valid_type:
-        raise HTTPException(
-            status_code=400,
-            detail="Only JPG, PNG or WEBP images are allowed",
-        )
-
-        # Size validation
-    contents = await image.read()
-
-    if len(contents) > MAX_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail="Image size must be under 5MB",
-        )
-
-    extension = Path(image.filename).suffix
-
-    cover_dir = os.path.join("uploads", "covers")
-    if not os.path.exists(cover_dir):
-        os.makedirs(cover_dir)
-
-    filename = f"cover{current_user.id}{datetime.now().timestamp()}{extension}"
-    file_path = os.path.join(cover_dir, filename)
-    
-    with open(file_path, "wb") as buffer:
-        buffer.write(contents)
-    
-    image_url = f"/uploads/covers/{filename}"
-    
     # Update user profile
+    previous = current_user.cover_image
     current_user.cover_image = image_url
+    current_user.cover_image_variants = {}
     await current_user.save()
+    await blob_store.release(previous)
+    image_variants.schedule(UserModel, current_user.id, "cover_image", "cover_image_variants", image_url)
 
     return {"image_url": image_url}
 
@@ -273,89 +205,24 @@ async def kyc_submit(
     id_back: UploadFile = File(...),
     current_user: UserModel = Depends(get_current_user)
 ):
-
-
-    # Robust check for id_front
-    is_front_valid = id_front.content_type in ALLOWED_TYPES
-    if not is_front_valid and id_front.content_type == "application/octet-stream":
-        if Path(id_front.filename).suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
-             is_front_valid = True
-
-    if not is_front_valid:
-        raise HTTPException(
-            status_code=400,
-            detail="ID Front: Only JPG, PNG or WEBP images are allowed",
-        )
-
-    # Robust check for id_back
-    is_back_valid = id_back.content_type in ALLOWED_TYPES
-    if not is_back_valid and id_back.content_type == "application/octet-stream":
-        if Path(id_back.filename).suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
-             is_back_valid = True
-
-    if not is_back_valid:
-        raise HTTPException(
-            status_code=400,
-            detail="ID Back: Only JPG, PNG or WEBP images are allowed",
-        )
-
-        # Size validation
-    contents_id_font = await id_front.read()
-
-    if len(contents_id_font) > MAX_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail="Image size must be under 5MB",
-        )
-
-    extension_id_front = Path(id_front.filename).suffix
-
-
-
-
-        # Size validation
-    contents_id_back = await id_back.read()
-
-    if len(contents_id_back) > MAX_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail="Image size must be under 5MB",
-        )
-
-    extension_id_back = Path(id_back.filename).suffix
-
-
-
-
-    # Create KYC directory if not exists
-    kyc_dir = os.path.join("uploads", "kyc")
-    if not os.path.exists(kyc_dir):
-        os.makedirs(kyc_dir)
-
-    # Save Front ID
-    front_filename = f"front{current_user.id}{datetime.now().timestamp()}{extension_id_front}"
-    front_path = os.path.join(kyc_dir, front_filename)
-    with open(front_path, "wb") as buffer:
-        buffer.write(contents_id_font)
-
-    # Save Back ID
-    back_filename = f"back{current_user.id}{datetime.now().timestamp()}{extension_id_back}"
-    back_path = os.path.join(kyc_dir, back_filename)
-    with open(back_path, "wb") as buffer:
-        buffer.write(contents_id_back)
-
-    # Create model entry
-    # Note: Using absolute URL or relative web path. Frontend likely needs web path.
-    front_url = f"/uploads/kyc/{front_filename}"
-    back_url = f"/uploads/kyc/{back_filename}"
+    # Identity documents stay out of the public, cacheable store
+    front_url = await save_upload(id_front, label="ID Front", private=True)
+    try:
+        back_url = await save_upload(id_back, label="ID Back", private=True)
+    except Exception:
+        await blob_store.release(front_url)
+        raise
 
     # Check if a KYC already exists for this user
     existing_kyc = await KYCModel.find_one(KYCModel.user.id == current_user.id)
     if existing_kyc:
+        previous = [existing_kyc.id_front, existing_kyc.id_back]
         existing_kyc.id_front = front_url
         existing_kyc.id_back = back_url
         existing_kyc.status = "pending"
         await existing_kyc.save()
+        for url in previous:
+            await blob_store.release(url)
         return {"message": "KYC updated successfully", "status": "pending"}
     
     new_kyc = KYCModel(
@@ -508,5 +375,13 @@ async def delete_user(user_id: str, current_user: Union[UserModel, ModeratorMode
 
     # Execute the delete command via Beanie
     await user.delete()
+    await blob_store.release(user.profile_image)
+    await blob_store.release(user.cover_image)
+    # The identity documents of a deleted account aren't kept
+    kyc = await KYCModel.find_one(KYCModel.user.id == user.id)
+    if kyc:
+        await kyc.delete()
+        await blob_store.release(kyc.id_front)
+        await blob_store.release(kyc.id_back)
 
     return {"message": "User deleted successfully"}
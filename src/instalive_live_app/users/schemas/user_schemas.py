@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr,Field
-from typing import Optional,List
+from typing import Dict, Optional,List
 from datetime import datetime
 from instalive_live_app.core.base.base import BaseResponse
 from instalive_live_app.users.utils.account_status import AccountStatus
@@ -32,6 +32,8 @@ class UserResponse(BaseResponse):
     is_verified: bool
     profile_image: Optional[str] = None
     cover_image: Optional[str] = None
+    profile_image_variants: Dict[str, str] = {}
+    cover_image_variants: Dict[str, str] = {}
     bio: Optional[str] = None
     gender: Optional[str] = None
     country: Optional[str] = None
@@ -49,15 +51,27 @@ class UserResponse(BaseResponse):
         from_attributes = True
 
 
+class UserTypeaheadResponse(BaseResponse):
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    profile_image: Optional[str] = None
+    profile_image_variants: Dict[str, str] = {}
+    is_verified: bool = False
+    followers_count: int = 0
+
+
 class LiveStreamSimpleResponse(BaseResponse):
     title: str = ""
     category: str = ""
     thumbnail: Optional[str] = Field(default=None)
+    thumbnail_variants: Dict[str, str] = {}
     is_premium: bool
     entry_fee: int = 0
     created_at: datetime
     total_views: int = 0
     total_likes: int = 0
+    current_viewers: int = 0
+    peak_viewers: int = 0
     status: str
 
     class Config:
@@ -77,6 +91,8 @@ class PublicProfileResponse(BaseResponse):
     is_verified: bool = False
     profile_image: Optional[str] = None
     cover_image: Optional[str] = None
+    profile_image_variants: Dict[str, str] = {}
+    cover_image_variants: Dict[str, str] = {}
     bio: Optional[str] = None
     gender: Optional[str] = None
     country: Optional[str] = None
@@ -1,11 +1,14 @@
 import os
 import logging
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel, EmailStr
+from instalive_live_app.users.utils.email_queue import email_queue, EmailMessage, DEFAULT_SENDER
 
 logger = logging.getLogger(__name__)
 
+# An OTP email that couldn't be sent within this long is dropped; the user asks for a new code
+OTP_EMAIL_MAX_AGE = timedelta(minutes=int(os.getenv("OTP_EMAIL_MAX_AGE_MINUTES", "15")))
+
 # 🔹 Pydantic v2 model
 class SendOtpModel(BaseModel):
     email: EmailStr
@@ -16,32 +19,23 @@ class SendOtpModel(BaseModel):
 
 async def send_otp(otp_user: SendOtpModel):
     """
-    Send OTP to user's email asynchronously using SendGrid
+    Queue the OTP email; the email queue sends it in the background
     """
-    try:
-        message = Mail(
-            from_email=os.getenv("SENDER_EMAIL"),
-            to_emails=otp_user.email,
-            subject='🔑 Your OTP Code',
-            plain_text_content=f'Your OTP code is: {otp_user.otp}'
-        )
-        sg = SendGridAPIClient(os.getenv('SENDGRID_API_KEY'))
-        sg.send(message)
-    except Exception as e:
-        logger.error(f"Error sending email to {otp_user.email}: {e}")
+    email_queue.enqueue(EmailMessage(
+        to_email=otp_user.email,
+        from_email=os.getenv("SENDER_EMAIL", DEFAULT_SENDER),
+        subject='🔑 Your OTP Code',
+        content=f'Your OTP code is: {otp_user.otp}',
+        expires_at=datetime.now(timezone.utc) + OTP_EMAIL_MAX_AGE,
+    ))
 
 async def send_custom_email(email: str, subject: str, content: str):
     """
-    Generic function to send custom emails
+    Generic function to send custom emails (queued, sent in the background)
     """
-    try:
-        message = Mail(
-            from_email=os.getenv("SENDER_EMAIL", "InstaLive@InstaLiveeous.biz"),
-            to_emails=email,
-            subject=subject,
-            plain_text_content=content
-        )
-        sg = SendGridAPIClient(os.getenv('SENDGRID_API_KEY'))
-        sg.send(message)
-    except Exception as e:
-        logger.error(f"Error sending custom email to {email}: {e}")
+    email_queue.enqueue(EmailMessage(
+        to_email=email,
+        from_email=os.getenv("SENDER_EMAIL", DEFAULT_SENDER),
+        subject=subject,
+        content=content
+    ))
@@ -0,0 +1,293 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from uuid import UUID
+import httpx
+from beanie import UpdateResponse
+from pydantic import BaseModel
+from instalive_live_app.users.models.email_models import OutboundEmailModel, OutboundEmailStatus
+
+logger = logging.getLogger(__name__)
+
+SENDGRID_API_URL = "https://api.sendgrid.com/v3/mail/send"
+DEFAULT_SENDER = "InstaLive@InstaLiveeous.biz"
+
+# "sendgrid" (the default, needs SENDGRID_API_KEY) or "stub" to only log mail in development
+EMAIL_PROVIDER = os.getenv("EMAIL_PROVIDER", "sendgrid")
+# Emails being sent at the same time
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "4"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+# Attempts across all replays; a stored email that reaches this is marked FAILED
+EMAIL_MAX_TOTAL_ATTEMPTS = int(os.getenv("EMAIL_MAX_TOTAL_ATTEMPTS", "25"))
+EMAIL_RETRY_DELAY_SECONDS = float(os.getenv("EMAIL_RETRY_DELAY_SECONDS", "1"))
+EMAIL_MAX_RETRY_DELAY_SECONDS = 60.0
+# How often undelivered mail in outbound_emails is put back on the queue
+EMAIL_REPLAY_INTERVAL_SECONDS = int(os.getenv("EMAIL_REPLAY_INTERVAL_SECONDS", "600"))
+EMAIL_TIMEOUT_SECONDS = 10.0
+# A replayed email is not picked up by another worker for this long
+EMAIL_REPLAY_LEASE = timedelta(minutes=10)
+
+
+class EmailMessage(BaseModel):
+    to_email: str
+    subject: str
+    content: str
+    from_email: str = DEFAULT_SENDER
+    # Time-sensitive mail (e.g. an OTP code) is dropped rather than sent after this
+    expires_at: Optional[datetime] = None
+    # Set when the message came from outbound_emails, so the record can be cleared once sent
+    record_id: Optional[UUID] = None
+
+    def expired(self, now: Optional[datetime] = None) -> bool:
+        return self.expires_at is not None and (now or datetime.now(timezone.utc)) >= _as_utc(self.expires_at)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class EmailSendError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class EmailProvider:
+    async def send(self, message: EmailMessage):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class SendGridProvider(EmailProvider):
+    """SendGrid v3 mail/send over one pooled HTTP client."""
+
+    def __init__(self, api_key: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = api_key or os.getenv("SENDGRID_API_KEY")
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=EMAIL_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=EMAIL_CONCURRENCY, max_keepalive_connections=EMAIL_CONCURRENCY),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                transport=self._transport,
+            )
+        return self._client
+
+    async def send(self, message: EmailMessage):
+        body = {
+            "personalizations": [{"to": [{"email": message.to_email}]}],
+            "from": {"email": message.from_email},
+            "subject": message.subject,
+            "content": [{"type": "text/plain", "value": message.content}],
+        }
+        try:
+            response = await self.client.post(SENDGRID_API_URL, json=body)
+        except httpx.HTTPError as e:
+            raise EmailSendError(f"SendGrid request failed: {e}")
+        if response.status_code >= 400:
+            # Rate limits and server errors are worth retrying; other 4xx won't get better
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise EmailSendError(f"SendGrid returned {response.status_code}: {response.text[:200]}", retryable)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class StubEmailProvider(EmailProvider):
+    """Keeps messages in memory instead of sending them (local development and tests)."""
+
+    def __init__(self):
+        self.sent: List[EmailMessage] = []
+
+    async def send(self, message: EmailMessage):
+        logger.info(f"[stub email] to={message.to_email} subject={message.subject!r}")
+        self.sent.append(message)
+
+
+def default_provider() -> EmailProvider:
+    """The configured provider. Misconfiguration fails startup rather than silently dropping OTP mail."""
+    if EMAIL_PROVIDER == "stub":
+        return StubEmailProvider()
+    if EMAIL_PROVIDER != "sendgrid":
+        raise RuntimeError(f"Unknown EMAIL_PROVIDER {EMAIL_PROVIDER!r}; use 'sendgrid' or 'stub'")
+    if not os.getenv("SENDGRID_API_KEY"):
+        raise RuntimeError("SENDGRID_API_KEY is not set; set it, or EMAIL_PROVIDER=stub for development")
+    return SendGridProvider()
+
+
+class EmailQueue:
+    """
+    Outbound email dispatch off the request path.
+    enqueue() returns immediately; a fixed pool of workers sends through the provider
+    with bounded concurrency and retries transient failures with exponential backoff.
+    Mail that still can't be delivered, or is queued when the worker stops, is stored
+    in outbound_emails and replayed later.
+    """
+
+    def __init__(self, provider: Optional[EmailProvider] = None, concurrency: int = EMAIL_CONCURRENCY):
+        # Resolved on start, so importing this module never needs the mail settings
+        self.provider = provider
+        self.concurrency = concurrency
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        # Messages the workers are sending right now, by id(), so a stop can store them
+        self._in_flight: Dict[int, EmailMessage] = {}
+        self._replay_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, message: EmailMessage):
+        self._queue.put_nowait(message)
+
+    async def _deliver(self, message: EmailMessage):
+        delay = EMAIL_RETRY_DELAY_SECONDS
+        error: Optional[EmailSendError] = None
+        for attempt in range(1, EMAIL_MAX_ATTEMPTS + 1):
+            if message.expired():
+                logger.warning(f"Dropping expired email to {message.to_email}: {message.subject!r}")
+                await self._persist(message, OutboundEmailStatus.EXPIRED, "Expired before delivery", 0)
+                return
+            try:
+                await self.provider.send(message)
+                if message.record_id:
+                    await OutboundEmailModel.find_one(OutboundEmailModel.id == message.record_id).delete()
+                return
+            except EmailSendError as e:
+                error = e
+                if not e.retryable or attempt == EMAIL_MAX_ATTEMPTS:
+                    break
+                logger.warning(f"Email to {message.to_email} failed (attempt {attempt}), retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, EMAIL_MAX_RETRY_DELAY_SECONDS)
+
+        logger.error(f"Giving up on email to {message.to_email}: {error}")
+        status = OutboundEmailStatus.PENDING if error.retryable else OutboundEmailStatus.FAILED
+        await self._persist(message, status, str(error), EMAIL_MAX_ATTEMPTS if error.retryable else 1)
+
+    async def _persist(self, message: EmailMessage, status: OutboundEmailStatus, error: Optional[str], attempts: int):
+        try:
+            if message.record_id:
+                await OutboundEmailModel.find_one(OutboundEmailModel.id == message.record_id).update(
+                    {"$set": {"status": status, "last_error": error}, "$inc": {"attempts": attempts}}
+                )
+            else:
+                await OutboundEmailModel(
+                    to_email=message.to_email,
+                    from_email=message.from_email,
+                    subject=message.subject,
+                    content=message.content,
+                    status=status,
+                    attempts=attempts,
+                    last_error=error,
+                    expires_at=message.expires_at,
+                ).insert()
+        except Exception as e:
+            logger.error(f"Could not store undelivered email to {message.to_email}: {e}")
+
+    async def _worker(self):
+        while True:
+            message = await self._queue.get()
+            self._in_flight[id(message)] = message
+            try:
+                await self._deliver(message)
+            except Exception as e:
+                logger.error(f"Email worker error for {message.to_email}: {e}")
+                await self._persist(message, OutboundEmailStatus.PENDING, str(e), 1)
+            finally:
+                self._in_flight.pop(id(message), None)
+                self._queue.task_done()
+
+    @staticmethod
+    async def retire(now: Optional[datetime] = None):
+        """Stop replaying stored mail that is out of attempts or past its expiry."""
+        now = now or datetime.now(timezone.utc)
+        collection = OutboundEmailModel.get_motor_collection()
+        await collection.update_many(
+            {"status": OutboundEmailStatus.PENDING, "attempts": {"$gte": EMAIL_MAX_TOTAL_ATTEMPTS}},
+            {"$set": {"status": OutboundEmailStatus.FAILED}},
+        )
+        await collection.update_many(
+            {"status": OutboundEmailStatus.PENDING, "expires_at": {"$lte": now}},
+            {"$set": {"status": OutboundEmailStatus.EXPIRED, "last_error": "Expired before delivery"}},
+        )
+
+    async def replay(self, limit: int = 500) -> int:
+        """Claim stored undelivered mail and put it back on the queue."""
+        await self.retire()
+        count = 0
+        for _ in range(limit):
+            now = datetime.now(timezone.utc)
+            # Claim one record at a time so two workers never replay the same email
+            record = await OutboundEmailModel.find_one(
+                {
+                    "status": OutboundEmailStatus.PENDING,
+                    "attempts": {"$lt": EMAIL_MAX_TOTAL_ATTEMPTS},
+                    "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}],
+                }
+            ).update(
+                {"$set": {"locked_until": now + EMAIL_REPLAY_LEASE}},
+                response_type=UpdateResponse.NEW_DOCUMENT,
+            )
+            if not record:
+                break
+            self.enqueue(EmailMessage(
+                to_email=record.to_email,
+                from_email=record.from_email,
+                subject=record.subject,
+                content=record.content,
+                expires_at=record.expires_at,
+                record_id=record.id,
+            ))
+            count += 1
+        return count
+
+    async def _replay_loop(self):
+        while True:
+            try:
+                # Only replay when idle, so stored mail isn't queued twice
+                if self._queue.empty():
+                    count = await self.replay()
+                    if count:
+                        logger.info(f"Replaying {count} undelivered emails")
+            except Exception as e:
+                logger.error(f"Email replay failed: {e}")
+            await asyncio.sleep(EMAIL_REPLAY_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._workers:
+            return
+        if self.provider is None:
+            self.provider = default_provider()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._replay_task = asyncio.create_task(self._replay_loop())
+
+    async def stop(self):
+        if self._replay_task:
+            self._replay_task.cancel()
+            self._replay_task = None
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Whatever is still queued or was mid-send is stored and sent by the next process
+        leftover = list(self._in_flight.values())
+        self._in_flight = {}
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        for message in leftover:
+            if not message.record_id:
+                await self._persist(message, OutboundEmailStatus.PENDING, "Queued at shutdown", 0)
+        if self.provider is not None:
+            await self.provider.close()
+
+
+email_queue = EmailQueue()
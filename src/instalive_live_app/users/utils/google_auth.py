@@ -0,0 +1,160 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import httpx
+from jose import jwt, JWTError
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# OAuth client ids an ID token may be issued for (comma separated). Empty: ID tokens are rejected.
+GOOGLE_CLIENT_IDS = [c.strip() for c in os.getenv("GOOGLE_CLIENT_IDS", "").split(",") if c.strip()]
+# Verified access tokens are remembered this long (keyed by their sha256, never stored in clear)
+GOOGLE_TOKEN_CACHE_SECONDS = int(os.getenv("GOOGLE_TOKEN_CACHE_SECONDS", "300"))
+GOOGLE_TOKEN_CACHE_SIZE = 10_000
+# Fallback when Google's JWKS response has no max-age
+JWKS_DEFAULT_MAX_AGE_SECONDS = 3600
+# An unknown key id triggers a JWKS refresh at most this often
+JWKS_MIN_REFRESH_SECONDS = 60
+GOOGLE_TIMEOUT_SECONDS = 5.0
+
+
+class GoogleAuthError(Exception):
+    pass
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class GoogleTokenVerifier:
+    """
+    Verifies Google sign-in tokens without blocking the event loop.
+    Access tokens are checked against the userinfo endpoint over one pooled client,
+    and the result is cached for a few minutes. ID tokens are verified locally against
+    Google's signing keys, which are cached for as long as Google allows.
+    """
+
+    def __init__(self, client_ids: Optional[List[str]] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.client_ids = GOOGLE_CLIENT_IDS if client_ids is None else client_ids
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._jwks: Dict[str, dict] = {}
+        self._jwks_expires_at = 0.0
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock = asyncio.Lock()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=GOOGLE_TIMEOUT_SECONDS, transport=self._transport)
+        return self._client
+
+    def _cached(self, key: str) -> Optional[dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, info = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return info
+
+    def _remember(self, key: str, info: dict):
+        self._cache[key] = (time.monotonic() + GOOGLE_TOKEN_CACHE_SECONDS, info)
+        self._cache.move_to_end(key)
+        while len(self._cache) > GOOGLE_TOKEN_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def verify_access_token(self, access_token: str) -> dict:
+        key = _token_key(access_token)
+        info = self._cached(key)
+        if info is not None:
+            return info
+        try:
+            # Bearer header rather than a query parameter, so the token doesn't end up in access logs
+            response = await self.client.get(GOOGLE_USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"})
+        except httpx.HTTPError as e:
+            raise GoogleAuthError(f"Google userinfo request failed: {e}")
+        if response.status_code != 200:
+            raise GoogleAuthError("Invalid Google token")
+        info = response.json()
+        if not info.get("email"):
+            raise GoogleAuthError("Google account has no email")
+        self._remember(key, info)
+        return info
+
+    async def _refresh_jwks(self):
+        response = await self.client.get(GOOGLE_JWKS_URL)
+        response.raise_for_status()
+        match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else JWKS_DEFAULT_MAX_AGE_SECONDS
+        now = time.monotonic()
+        self._jwks = {k["kid"]: k for k in response.json().get("keys", [])}
+        self._jwks_expires_at = now + max_age
+        self._jwks_fetched_at = now
+
+    async def _signing_key(self, kid: str) -> dict:
+        now = time.monotonic()
+        if kid in self._jwks and now < self._jwks_expires_at:
+            return self._jwks[kid]
+        async with self._jwks_lock:
+            now = time.monotonic()
+            stale = now >= self._jwks_expires_at
+            # Google rotates keys; an unknown kid may be brand new, but don't let bad tokens force refetches
+            unknown = kid not in self._jwks and now - self._jwks_fetched_at >= JWKS_MIN_REFRESH_SECONDS
+            if stale or unknown:
+                try:
+                    await self._refresh_jwks()
+                except httpx.HTTPError as e:
+                    if not self._jwks:
+                        raise GoogleAuthError(f"Could not fetch Google signing keys: {e}")
+                    logger.warning(f"Google JWKS refresh failed, using cached keys: {e}")
+        if kid not in self._jwks:
+            raise GoogleAuthError("Unknown Google signing key")
+        return self._jwks[kid]
+
+    async def verify_id_token(self, id_token: str) -> dict:
+        # Without an audience to check, a token issued to any other app would be accepted
+        if not self.client_ids:
+            raise GoogleAuthError("Google ID token sign-in is not configured")
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except JWTError:
+            raise GoogleAuthError("Malformed Google ID token")
+        key = await self._signing_key(header.get("kid", ""))
+        try:
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=["RS256"],
+                # Checked below against every configured client id
+                options={"verify_aud": False, "verify_at_hash": False},
+            )
+        except JWTError as e:
+            raise GoogleAuthError(f"Invalid Google ID token: {e}")
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise GoogleAuthError("Google ID token has the wrong issuer")
+        if claims.get("aud") not in self.client_ids:
+            raise GoogleAuthError("Google ID token was issued for another client")
+        if not claims.get("email") or claims.get("email_verified") not in (True, "true"):
+            raise GoogleAuthError("Google account email is not verified")
+        return claims
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+google_verifier = GoogleTokenVerifier()
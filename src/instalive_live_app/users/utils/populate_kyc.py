@@ -1,3 +1,5 @@
+from typing import List
+from beanie.operators import In
 from instalive_live_app.users.models.user_models import UserModel
 from instalive_live_app.users.models.kyc_models import KYCModel
 
@@ -19,3 +21,21 @@ async def populate_user_kyc(user: UserModel) -> dict:
     else:
         user_dict["kyc"] = None
     return user_dict
+
+
+async def populate_users_kyc(users: List[UserModel]) -> List[dict]:
+    """
+    Same as populate_user_kyc for a list of users, with one KYC query for all of them.
+    """
+    if not users:
+        return []
+    kycs = await KYCModel.find(In(KYCModel.user.id, [u.id for u in users])).to_list()
+    by_user = {kyc.user.ref.id: kyc for kyc in kycs}
+
+    result = []
+    for user in users:
+        user_dict = user.model_dump()
+        kyc = by_user.get(user.id)
+        user_dict["kyc"] = kyc.model_dump(exclude={"user", "id"}) if kyc else None
+        result.append(user_dict)
+    return result
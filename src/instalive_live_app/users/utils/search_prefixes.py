@@ -0,0 +1,46 @@
+import re
+import unicodedata
+from typing import List, Optional
+
+# Longest prefix stored per word; longer queries are matched on their first MAX_PREFIX_LENGTH characters
+MAX_PREFIX_LENGTH = 20
+# Words of a name or email local part beyond this are not indexed
+MAX_WORDS = 6
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str) -> str:
+    """Case- and accent-insensitive form used on both sides of the prefix index ("Zoë" -> "zoe")."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def words(text: Optional[str]) -> List[str]:
+    return _WORD.findall(normalize(text)) if text else []
+
+
+def user_search_prefixes(first_name: Optional[str], last_name: Optional[str], email: Optional[str]) -> List[str]:
+    """Edge n-grams of every word in the user's name and email local part."""
+    local_part = email.split("@", 1)[0] if email else None
+    seen = []
+    for word in words(first_name) + words(last_name) + words(local_part):
+        if word not in seen:
+            seen.append(word)
+    prefixes = set()
+    for word in seen[:MAX_WORDS]:
+        for i in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1):
+            prefixes.add(word[:i])
+    return sorted(prefixes)
+
+
+def query_prefixes(q: str) -> List[str]:
+    """The prefixes a query must all match; an email searches by its local part."""
+    if "@" in q:
+        q = q.split("@", 1)[0]
+    terms = []
+    for word in words(q)[:MAX_WORDS]:
+        prefix = word[:MAX_PREFIX_LENGTH]
+        if prefix not in terms:
+            terms.append(prefix)
+    return terms
@@ -0,0 +1,137 @@
+"""
+Prefix search over users, served by the (search_prefixes, followers_count) index.
+
+Backfill users created before search_prefixes existed (safe to re-run):
+
+    python -m instalive_live_app.users.utils.user_search --backfill
+"""
+import time
+import asyncio
+import argparse
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from pymongo import UpdateOne
+from instalive_live_app.users.models.user_models import UserModel
+from instalive_live_app.users.utils.search_prefixes import user_search_prefixes, query_prefixes
+
+logger = logging.getLogger(__name__)
+
+TYPEAHEAD_MAX_LIMIT = 20
+TYPEAHEAD_CACHE_SIZE = 2048
+# Short enough that renames and new users show up while someone is still typing
+TYPEAHEAD_CACHE_SECONDS = 30
+TYPEAHEAD_FIELDS = {
+    "first_name": 1, "last_name": 1, "profile_image": 1, "profile_image_variants": 1,
+    "is_verified": 1, "followers_count": 1,
+}
+BACKFILL_BATCH_SIZE = 1000
+BACKFILL_PAUSE_SECONDS = 0.05
+
+
+def prefix_filter(q: str) -> Optional[dict]:
+    terms = query_prefixes(q)
+    if not terms:
+        return None
+    return {"search_prefixes": terms[0] if len(terms) == 1 else {"$all": terms}}
+
+
+class TypeaheadCache:
+    """LRU of recent typeahead answers; hot prefixes ("a", "jo") are asked for constantly."""
+
+    def __init__(self, size: int = TYPEAHEAD_CACHE_SIZE, ttl: float = TYPEAHEAD_CACHE_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, List[dict]]]" = OrderedDict()
+
+    def get(self, key: Tuple[str, int]) -> Optional[List[dict]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Tuple[str, int], value: List[dict]):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+typeahead_cache = TypeaheadCache()
+
+
+async def typeahead(q: str, limit: int = 10) -> List[dict]:
+    """Slim profiles of the most followed users whose words start with the query's words."""
+    limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+    query = prefix_filter(q)
+    if query is None:
+        return []
+    key = (" ".join(query_prefixes(q)), limit)
+    cached = typeahead_cache.get(key)
+    if cached is not None:
+        return cached
+
+    docs = await UserModel.get_motor_collection().find(query, TYPEAHEAD_FIELDS) \
+        .sort("followers_count", -1).limit(limit).to_list(length=limit)
+    for doc in docs:
+        doc["id"] = doc.pop("_id")
+    typeahead_cache.put(key, docs)
+    return docs
+
+
+async def search_users(q: str, skip: int = 0, limit: int = 20) -> List[UserModel]:
+    query = prefix_filter(q)
+    if query is None:
+        return []
+    return await UserModel.find(query).sort(-UserModel.followers_count).skip(skip).limit(limit).to_list()
+
+
+async def backfill_search_prefixes(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Walks users in _id order and writes search_prefixes where missing or stale."""
+    collection = UserModel.get_motor_collection()
+    fields = {"first_name": 1, "last_name": 1, "email": 1, "search_prefixes": 1}
+    last_id, updated = None, 0
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await collection.find(query, fields).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return updated
+        ops = []
+        for doc in batch:
+            prefixes = user_search_prefixes(doc.get("first_name"), doc.get("last_name"), doc.get("email"))
+            if doc.get("search_prefixes") != prefixes:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_prefixes": prefixes}}))
+        if ops:
+            result = await collection.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+        last_id = batch[-1]["_id"]
+        logger.info(f"search_prefixes backfill: {updated} updated, up to {last_id}")
+        # Leave room for live traffic between batches
+        await asyncio.sleep(BACKFILL_PAUSE_SECONDS)
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from beanie import init_beanie
+    from instalive_live_app.db import MODELS, MONGODB_URL, DATABASE_NAME
+
+    client = AsyncIOMotorClient(MONGODB_URL, uuidRepresentation="standard")
+    # Also builds the prefix index if it doesn't exist yet
+    await init_beanie(database=client[DATABASE_NAME], document_models=MODELS)
+    try:
+        print({"updated": await backfill_search_prefixes()})
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", required=True)
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
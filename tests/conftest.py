@@ -0,0 +1,246 @@
+"""
+Fixtures shared by the tests: Redis, either absent (every feature's local fallback) or
+fakeredis with Lua, and an in-memory stand-in for the Motor collections behind the models.
+"""
+import operator
+from types import SimpleNamespace
+import fakeredis
+import pytest
+
+MISSING = object()
+
+COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def resolve(doc: dict, path: str):
+    """Value at a dotted path; `field.$id` reads the id of a DBRef."""
+    value = doc
+    for part in path.split("."):
+        if part == "$id":
+            value = value.id
+        elif isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return MISSING
+    return value
+
+
+def _test(op: str, value, operand) -> bool:
+    values = value if isinstance(value, list) else [value]
+    if op == "$in":
+        return any(v in operand for v in values) or (value is MISSING and None in operand)
+    if op == "$ne":
+        return not _test("$eq", value, operand)
+    if op == "$eq":
+        return operand in values or value == operand or (value is MISSING and operand is None)
+    if op == "$exists":
+        return (value is not MISSING) == operand
+    if value is MISSING or value is None:
+        return False
+    return COMPARISONS[op](value, operand)
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """The subset of MongoDB query semantics the code under test uses."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            value = resolve(doc, key)
+            if not all(_test(op, value, operand) for op, operand in condition.items()):
+                return False
+        elif not _test("$eq", resolve(doc, key), condition):
+            return False
+    return True
+
+
+EXPRESSIONS = {
+    "$concatArrays": lambda *arrays: [item for array in arrays for item in array],
+    "$ifNull": lambda value, default: default if value is None else value,
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+}
+
+
+def evaluate(expression, doc: dict, variables: dict):
+    """An aggregation expression, as used in pipeline updates: field paths, $$variables, EXPRESSIONS and $filter."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        name, _, path = expression.lstrip("$").partition(".")
+        value = variables[name] if expression.startswith("$$") else doc.get(name, MISSING)
+        if path and value is not MISSING:
+            value = resolve(value, path)
+        return None if value is MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(item, doc, variables) for item in expression]
+    if isinstance(expression, dict):
+        if len(expression) == 1 and next(iter(expression)).startswith("$"):
+            (op, args), = expression.items()
+            if op == "$filter":
+                items = evaluate(args["input"], doc, variables) or []
+                return [item for item in items if evaluate(args["cond"], doc, {**variables, "this": item})]
+            return EXPRESSIONS[op](*evaluate(args, doc, variables))
+        return {key: evaluate(value, doc, variables) for key, value in expression.items()}
+    return expression
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    def sort(self, key, direction=1):
+        """sort(field, direction) or sort([(field, direction), ...]), like Motor."""
+        for field, direction in reversed(key if isinstance(key, list) else [(key, direction)]):
+            self.docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def skip(self, n):
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n):
+        if n:
+            self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:length] if length else self.docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    """
+    Documents kept in a list and queried with `matches`. Updates support $set, $inc, $max
+    and $unset, or a pipeline of $set stages; bulk writes are recorded per call, as
+    (filter, update) pairs, not applied.
+    """
+
+    def __init__(self, docs=(), indexes=None):
+        self.docs = list(docs)
+        self.indexes = indexes or {"_id_": {"key": [("_id", 1)]}}
+        self.queries = []
+        self.inserted = []
+        self.bulk_writes = []
+
+    def find(self, query=None, projection=None):
+        self.queries.append(query or {})
+        return FakeCursor(doc for doc in self.docs if matches(doc, query or {}))
+
+    async def find_one(self, query=None, projection=None):
+        return next((doc for doc in self.docs if matches(doc, query or {})), None)
+
+    async def count_documents(self, query, limit=None):
+        count = sum(matches(doc, query) for doc in self.docs)
+        return min(count, limit) if limit else count
+
+    async def distinct(self, field, query=None):
+        values = [resolve(doc, field) for doc in self.docs if matches(doc, query or {})]
+        return list(dict.fromkeys(v for v in values if v is not MISSING))
+
+    async def insert_many(self, docs, ordered=True):
+        self.inserted.append(list(docs))
+        self.docs.extend(docs)
+
+    async def insert_one(self, doc):
+        await self.insert_many([doc])
+
+    @staticmethod
+    def _apply(doc: dict, update):
+        if isinstance(update, list):
+            for stage in update:
+                doc.update({field: evaluate(value, doc, {}) for field, value in stage["$set"].items()})
+            return
+        doc.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        for field, value in update.get("$max", {}).items():
+            doc[field] = max(doc.get(field, value), value)
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+
+    async def update_many(self, query, update):
+        matched = [doc for doc in self.docs if matches(doc, query)]
+        for doc in matched:
+            self._apply(doc, update)
+        return SimpleNamespace(matched_count=len(matched), modified_count=len(matched))
+
+    async def update_one(self, query, update):
+        doc = await self.find_one(query)
+        if doc is not None:
+            self._apply(doc, update)
+        return SimpleNamespace(matched_count=int(doc is not None), modified_count=int(doc is not None))
+
+    async def find_one_and_update(self, query, update, projection=None):
+        """Returns the document as it was before the update, like pymongo's default."""
+        doc = await self.find_one(query)
+        if doc is None:
+            return None
+        before = dict(doc)
+        self._apply(doc, update)
+        if projection is None:
+            return before
+        return {field: before[field] for field in ("_id", *projection) if field in before}
+
+    async def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if not matches(doc, query)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_writes.append([(op._filter, op._doc) for op in operations])
+
+    def aggregate(self, pipeline):
+        return FakeCursor([])
+
+    async def index_information(self):
+        return self.indexes
+
+    async def create_index(self, key, name, **options):
+        self.indexes[name] = {"key": key, **options}
+
+    async def drop_index(self, name):
+        del self.indexes[name]
+
+
+@pytest.fixture(params=["local", "redis"])
+def redis(request):
+    """None or a fakeredis client; a test using it runs once without Redis and once with it."""
+    if request.param == "local":
+        return None
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def fake_redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def use_redis(monkeypatch):
+    """use_redis(module, client) makes the module's get_redis() return `client`."""
+    def use(module, client):
+        async def get_redis():
+            return client
+        monkeypatch.setattr(module, "get_redis", get_redis)
+        return client
+    return use
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    """collection(docs, model=...) builds a FakeCollection, served as the model's Motor collection if given."""
+    def make(docs=(), model=None, **options) -> FakeCollection:
+        fake = FakeCollection(docs, **options)
+        if model is not None:
+            monkeypatch.setattr(model, "get_motor_collection", classmethod(lambda cls: fake))
+        return fake
+    return make
@@ -0,0 +1,63 @@
+"""In-process stand-in for Google's userinfo and JWKS endpoints, served through httpx.MockTransport."""
+import time
+import asyncio
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from instalive_live_app.users.utils.google_auth import GOOGLE_USERINFO_URL, GOOGLE_JWKS_URL
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+
+class GoogleStub:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.kid = "test-key"
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        self.public_jwk = {**jwk.construct(public_pem, "RS256").to_dict(), "kid": self.kid, "use": "sig"}
+        self.access_tokens = {}
+        self.requests = []
+
+    def add_access_token(self, token: str, email: str, name: str = "Test User"):
+        self.access_tokens[token] = {"email": email, "name": name, "picture": "https://example.com/p.png"}
+
+    def id_token(self, email: str, audience: str = CLIENT_ID, **claims) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com",
+            "aud": audience,
+            "sub": "1234567890",
+            "email": email,
+            "email_verified": True,
+            "name": "Test User",
+            "iat": now,
+            "exp": now + 3600,
+            **claims,
+        }
+        return jwt.encode(payload, self.private_pem, algorithm="RS256", headers={"kid": self.kid})
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        url = str(request.url)
+        if url == GOOGLE_JWKS_URL:
+            return httpx.Response(200, json={"keys": [self.public_jwk]}, headers={"Cache-Control": "public, max-age=3600"})
+        if url == GOOGLE_USERINFO_URL:
+            token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            info = self.access_tokens.get(token)
+            if info is None:
+                return httpx.Response(401, json={"error": "invalid_token"})
+            return httpx.Response(200, json=info)
+        return httpx.Response(404)
+
+    @property
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handler)
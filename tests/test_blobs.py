@@ -0,0 +1,146 @@
+import os
+import asyncio
+import gzip
+import uuid
+import hashlib
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from instalive_live_app.core import blob_store, routers
+from instalive_live_app.core.blob_store import blob_path, private_sha
+from instalive_live_app.core.routers import router
+from instalive_live_app.users.utils.get_current_user import get_current_user
+
+CSS = b"body { color: red; }\n" * 200
+
+
+def put(data: bytes, ext: str) -> str:
+    name = hashlib.sha256(data).hexdigest() + ext
+    path = blob_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return name
+
+
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_blob_is_served_immutable_with_strong_etag_and_ranges(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    name = put(b"\x89PNG\r\n\x1a\n" + bytes(range(200)), ".png")
+    http = client()
+
+    response = http.get(f"/blobs/{name}")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["etag"] == f'"{name[:-4]}"'
+    assert response.headers["content-type"] == "image/png"
+
+    assert http.get(f"/blobs/{name}", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    partial = http.get(f"/blobs/{name}", headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.content == b"\x89PNG\r\n\x1a\n"
+
+    assert http.get("/blobs/../../etc/passwd").status_code == 404
+    assert http.get(f"/blobs/{'0' * 64}.png").status_code == 404
+
+
+def test_precompressed_copy_is_sent_to_clients_that_accept_it(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    name = put(CSS, ".css")
+    with open(blob_path(name) + ".gz", "wb") as f:
+        f.write(gzip.compress(CSS))
+    http = client()
+
+    encoded = http.get(f"/blobs/{name}", headers={"Accept-Encoding": "gzip"})
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.headers["vary"] == "Accept-Encoding"
+    assert encoded.content == CSS
+
+    plain = http.get(f"/blobs/{name}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == CSS
+    assert plain.headers["etag"] != encoded.headers["etag"]
+
+
+def test_private_blobs_are_only_served_to_their_owner_and_never_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    owner, stranger = SimpleNamespace(id=uuid.uuid4(), role="user"), SimpleNamespace(id=uuid.uuid4(), role="user")
+    name = private_sha(hashlib.sha256(b"scan").hexdigest()) + ".jpg"
+    path = blob_path(name, private=True)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(b"scan")
+
+    async def find_one(query):
+        return object() if query["user.$id"] == owner.id else None
+
+    monkeypatch.setattr(routers.KYCModel, "find_one", find_one)
+    app = FastAPI()
+    app.include_router(router)
+    http = TestClient(app)
+
+    app.dependency_overrides[get_current_user] = lambda: owner
+    response = http.get(f"/blobs/private/{name}")
+    assert response.content == b"scan"
+    assert response.headers["cache-control"] == "private, no-store"
+    # Not reachable through the public route
+    assert http.get(f"/blobs/{name}").status_code == 404
+
+    app.dependency_overrides[get_current_user] = lambda: stranger
+    assert http.get(f"/blobs/private/{name}").status_code == 404
+
+
+class FakeBlobs:
+    """Just enough of update_one for grant/claim/retain."""
+
+    def __init__(self, docs):
+        self.docs = {doc["sha256"]: doc for doc in docs}
+
+    async def update_one(self, query, update):
+        doc = self.docs.get(query["sha256"])
+        if doc is None or ("private" in query and doc["private"]) or \
+                ("pending_claims" in query and query["pending_claims"] not in doc["pending_claims"]):
+            return SimpleNamespace(modified_count=0)
+        claims = doc["pending_claims"]
+        if "$push" in update:
+            push = update["$push"]["pending_claims"]
+            claims[:] = (claims + push["$each"])[push["$slice"]:]
+        if "pending_claims.$" in update.get("$set", {}):
+            claims[claims.index(query["pending_claims"])] = None
+        if "$pull" in update:
+            claims[:] = [c for c in claims if c is not None]
+        doc["refcount"] += update.get("$inc", {}).get("refcount", 0)
+        return SimpleNamespace(modified_count=1)
+
+
+def test_chat_images_can_only_be_claimed_by_their_uploader_once_per_upload(monkeypatch):
+    uploader, other = uuid.uuid4(), uuid.uuid4()
+    public, private = "a" * 64, "b" * 64
+    blobs = FakeBlobs([
+        {"sha256": public, "private": False, "refcount": 0, "pending_claims": []},
+        {"sha256": private, "private": True, "refcount": 1, "pending_claims": [uploader]},
+    ])
+    monkeypatch.setattr(blob_store.BlobModel, "get_motor_collection", classmethod(lambda cls: blobs))
+    url = f"/blobs/{public}.png"
+
+    async def main():
+        await blob_store.grant(url, uploader)
+        return [
+            await blob_store.claim(url, other),
+            await blob_store.claim(url, uploader),
+            # The upload was used up by the first message
+            await blob_store.claim(url, uploader),
+            await blob_store.claim(f"/blobs/private/{private}.jpg", uploader),
+            await blob_store.claim("https://example.com/cat.png", uploader),
+        ]
+
+    assert asyncio.run(main()) == [False, True, False, False, False]
+    assert (blobs.docs[public]["refcount"], blobs.docs[public]["pending_claims"]) == (1, [])
+
+    asyncio.run(blob_store.retain(f"/blobs/private/{private}.jpg"))
+    assert blobs.docs[private]["refcount"] == 1
@@ -0,0 +1,40 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from bson import DBRef
+from instalive_live_app.notifications import routers as routers_module
+from instalive_live_app.notifications.models import BroadcastNotificationModel
+
+BIG, OLD_FOLLOW, SMALL = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+NOW = datetime(2026, 3, 4, 20, tzinfo=timezone.utc)
+
+
+def broadcast(host, hours_ago) -> dict:
+    return {"_id": uuid.uuid4(), "host": DBRef("users", host), "created_at": NOW - timedelta(hours=hours_ago)}
+
+
+def test_broadcasts_count_as_unread_only_from_after_the_follow(monkeypatch, collection):
+    collection([broadcast(BIG, 5), broadcast(BIG, 1), broadcast(OLD_FOLLOW, 5), broadcast(OLD_FOLLOW, 30)],
+               model=BroadcastNotificationModel)
+
+    async def personal(user_id):
+        return 2
+    monkeypatch.setattr(routers_module.unread_counter, "get", personal)
+
+    user = SimpleNamespace(
+        id=uuid.uuid4(),
+        following=[SimpleNamespace(id=host) for host in (BIG, OLD_FOLLOW, SMALL)],
+        # Followed BIG two hours ago; OLD_FOLLOW was followed before follow times were kept
+        followed_at={str(BIG): NOW - timedelta(hours=2)},
+        notifications_read_at=None,
+    )
+
+    async def unread():
+        return await routers_module._unread_count(user, await routers_module._broadcast_query(user))
+
+    assert asyncio.run(unread()) == 2 + 1 + 2
+    user.notifications_read_at = NOW - timedelta(hours=10)
+    assert asyncio.run(unread()) == 2 + 1 + 1
+    user.following = [SimpleNamespace(id=SMALL)]
+    assert asyncio.run(routers_module._broadcast_query(user)) is None
@@ -0,0 +1,29 @@
+import asyncio
+import uuid
+from bson import DBRef
+from instalive_live_app.chating.models.chat_model import ChatMessageModel
+
+SENDER, RECEIVER = uuid.uuid4(), uuid.uuid4()
+
+
+def message(**fields) -> dict:
+    return {"_id": uuid.uuid4(), "sender": DBRef("users", SENDER), "receiver": DBRef("users", RECEIVER), **fields}
+
+
+def test_a_new_reaction_replaces_the_users_previous_one(collection):
+    reacted = message(reactions=[{"user_id": "alice", "emoji": "👍"}, {"user_id": "bob", "emoji": "😂"}])
+    # Messages from before reactions existed have no field at all
+    bare = message()
+    collection([reacted, bare], model=ChatMessageModel)
+
+    async def main():
+        participants = await ChatMessageModel.set_reaction(reacted["_id"], "alice", "❤️")
+        await ChatMessageModel.set_reaction(reacted["_id"], "alice", "🔥")
+        await ChatMessageModel.set_reaction(bare["_id"], "bob", "👍")
+        return participants, await ChatMessageModel.set_reaction(uuid.uuid4(), "alice", "👍")
+
+    participants, missing = asyncio.run(main())
+    assert participants == (str(SENDER), str(RECEIVER))
+    assert missing is None
+    assert reacted["reactions"] == [{"user_id": "bob", "emoji": "😂"}, {"user_id": "alice", "emoji": "🔥"}]
+    assert bare["reactions"] == [{"user_id": "bob", "emoji": "👍"}]
@@ -0,0 +1,39 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from bson import DBRef
+from instalive_live_app.chating.utils.sync_cursor import SYNC_SORT, decode_cursor, encode_cursor, sync_query
+
+ME, FRIEND, STRANGER = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+START = datetime(2026, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def message(sender, receiver, seconds) -> dict:
+    return {"_id": uuid.uuid4(), "sender": DBRef("users", sender), "receiver": DBRef("users", receiver),
+            "updated_at": START + timedelta(seconds=seconds)}
+
+
+def sync(messages, since=None, cursor=None, limit=2):
+    """One /chat/sync page: (ids, next cursor)."""
+    query = sync_query(ME, *decode_cursor(cursor)) if cursor else sync_query(ME, since)
+    page = asyncio.run(messages.find(query).sort(SYNC_SORT).limit(limit).to_list())
+    return [doc["_id"] for doc in page], encode_cursor(page[-1]["updated_at"], page[-1]["_id"]) if page else cursor
+
+
+def test_paging_with_the_cursor_neither_skips_nor_repeats_same_time_updates(collection):
+    # Three updates in the same second (e.g. a read receipt over several messages) straddle a page boundary
+    mine = [message(FRIEND, ME, 1), message(ME, FRIEND, 2), message(FRIEND, ME, 2), message(ME, FRIEND, 2),
+            message(FRIEND, ME, 3)]
+    messages = collection([*mine, message(FRIEND, STRANGER, 2)])
+    expected = [doc["_id"] for doc in sorted(mine, key=lambda doc: (doc["updated_at"], doc["_id"]))]
+
+    synced, cursor = sync(messages, since=START)
+    # Bounded, so a cursor that stops advancing fails instead of looping
+    for _ in range(len(mine)):
+        page, cursor = sync(messages, cursor=cursor)
+        synced += page
+    assert synced == expected
+
+    # A reaction later bumps an old message: the next sync from the same cursor returns just that one
+    mine[0]["updated_at"] = START + timedelta(seconds=10)
+    assert sync(messages, cursor=cursor)[0] == [mine[0]["_id"]]
@@ -0,0 +1,46 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from instalive_live_app.notifications import coalesce as coalesce_module
+from instalive_live_app.notifications.coalesce import CoalescedEvent, coalesced_id, merge_events
+from instalive_live_app.notifications.models import NotificationModel
+
+USER = uuid.uuid4()
+AT = datetime(2026, 3, 4, 20, tzinfo=timezone.utc)
+
+
+def like(actor: str, at: datetime = AT) -> CoalescedEvent:
+    return CoalescedEvent(
+        id=coalesced_id(USER, "likes:stream", at), user_id=USER, group_key="likes:stream", type="SOCIAL",
+        title="New like", body=f"{actor} liked your live stream", summary=" likes on your live stream",
+        actors=[actor], at=at,
+    )
+
+
+def test_events_share_an_id_only_within_their_window(monkeypatch):
+    monkeypatch.setattr(coalesce_module, "COALESCE_WINDOW_SECONDS", 3600)
+    assert coalesced_id(USER, "likes:stream", AT) == coalesced_id(USER, "likes:stream", AT + timedelta(minutes=59))
+    assert coalesced_id(USER, "likes:stream", AT) != coalesced_id(USER, "likes:stream", AT + timedelta(hours=1))
+    assert coalesced_id(USER, "likes:stream", AT) != coalesced_id(USER, "likes:other", AT)
+    assert coalesced_id(USER, "likes:stream", AT) != coalesced_id(uuid.uuid4(), "likes:stream", AT)
+
+
+def test_merged_events_keep_the_latest_text_and_recent_actors():
+    later = AT + timedelta(minutes=5)
+    events = [like(f"u{i}") for i in range(6)] + [like("u1", at=later), like("other", at=AT + timedelta(hours=2))]
+    first = events[0]
+
+    merged, other = merge_events(events)
+    assert (merged.count, merged.at, merged.body) == (7, later, "u1 liked your live stream")
+    # u1 moves to the end instead of being listed twice, and only the last MAX_ACTORS are kept
+    assert merged.actors == ["u2", "u3", "u4", "u5", "u1"]
+    assert (other.count, other.actors) == (1, ["other"])
+    # The inputs, which may be retried, are left alone
+    assert (first.count, first.actors) == (1, ["u0"])
+
+
+def test_a_created_aggregate_is_a_complete_notification():
+    create, fold = like("u0").operations()
+    inserted = create._doc["$setOnInsert"]
+    required = {name for name, info in NotificationModel.model_fields.items() if info.is_required()}
+    assert required <= set(inserted)
+    assert (inserted["title"], inserted["created_at"], inserted["is_read"]) == ("New like", AT, False)
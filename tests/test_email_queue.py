@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+from instalive_live_app.users.utils import email_queue as email_module
+from instalive_live_app.users.utils.email_queue import EmailQueue, EmailMessage, SendGridProvider, StubEmailProvider
+
+
+def make_message(i=0):
+    return EmailMessage(to_email=f"user{i}@example.com", subject="Hi", content="Your OTP code is: 123456")
+
+
+def run_queue(queue, messages):
+    async def main():
+        queue.start()
+        for message in messages:
+            queue.enqueue(message)
+        await queue._queue.join()
+        await queue.stop()
+    asyncio.run(main())
+
+
+def test_transient_sendgrid_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(email_module, "EMAIL_RETRY_DELAY_SECONDS", 0)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        # First attempt hits a 503, the retry is accepted
+        return httpx.Response(503 if len(calls) == 1 else 202)
+
+    provider = SendGridProvider(api_key="test", transport=httpx.MockTransport(handler))
+    queue = EmailQueue(provider=provider, concurrency=1)
+    stored = []
+    monkeypatch.setattr(queue, "_persist", lambda *args: stored.append(args) or asyncio.sleep(0))
+
+    run_queue(queue, [make_message()])
+
+    assert len(calls) == 2
+    assert calls[-1].headers["Authorization"] == "Bearer test"
+    assert stored == []
+
+
+def test_rejected_mail_is_stored_without_retry(monkeypatch):
+    calls = []
+    provider = SendGridProvider(api_key="test", transport=httpx.MockTransport(lambda r: calls.append(r) or httpx.Response(400)))
+    queue = EmailQueue(provider=provider, concurrency=1)
+    stored = []
+    monkeypatch.setattr(queue, "_persist", lambda message, status, *args: stored.append(status) or asyncio.sleep(0))
+
+    run_queue(queue, [make_message()])
+
+    assert len(calls) == 1
+    assert stored == [email_module.OutboundEmailStatus.FAILED]
+
+
+def test_stub_provider_sends_everything_with_bounded_concurrency():
+    active = 0
+    peak = 0
+
+    class SlowStub(StubEmailProvider):
+        async def send(self, message):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            await super().send(message)
+
+    provider = SlowStub()
+    run_queue(EmailQueue(provider=provider, concurrency=3), [make_message(i) for i in range(10)])
+
+    assert len(provider.sent) == 10
+    assert peak == 3
+
+
+def test_provider_is_the_stub_only_when_asked_for(monkeypatch):
+    monkeypatch.setattr(email_module, "EMAIL_PROVIDER", "stub")
+    assert isinstance(email_module.default_provider(), StubEmailProvider)
+
+    monkeypatch.setattr(email_module, "EMAIL_PROVIDER", "sendgrid")
+    monkeypatch.delenv("SENDGRID_API_KEY", raising=False)
+    queue = EmailQueue()
+
+    async def start():
+        queue.start()
+    with pytest.raises(RuntimeError, match="SENDGRID_API_KEY"):
+        asyncio.run(start())
+
+
+def test_expired_mail_is_dropped_instead_of_sent(monkeypatch):
+    provider = StubEmailProvider()
+    queue = EmailQueue(provider=provider, concurrency=1)
+    stored = []
+    monkeypatch.setattr(queue, "_persist", lambda message, status, *args: stored.append(status) or asyncio.sleep(0))
+    stale = make_message(1)
+    stale.expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    fresh = make_message(2)
+    fresh.expires_at = datetime.now(timezone.utc) + timedelta(minutes=15)
+
+    run_queue(queue, [stale, fresh])
+
+    assert [m.to_email for m in provider.sent] == [fresh.to_email]
+    assert stored == [email_module.OutboundEmailStatus.EXPIRED]
+
+
+def test_stored_mail_stops_being_replayed_when_out_of_attempts_or_expired(collection):
+    now = datetime.now(timezone.utc)
+    pending = email_module.OutboundEmailStatus.PENDING
+    emails = collection([
+        {"_id": "fresh", "status": pending, "attempts": 5, "expires_at": None},
+        {"_id": "worn_out", "status": pending, "attempts": email_module.EMAIL_MAX_TOTAL_ATTEMPTS, "expires_at": None},
+        {"_id": "stale_otp", "status": pending, "attempts": 0, "expires_at": now - timedelta(seconds=1)},
+    ], model=email_module.OutboundEmailModel)
+    asyncio.run(EmailQueue.retire(now))
+
+    assert {doc["_id"]: doc["status"] for doc in emails.docs} == {
+        "fresh": pending,
+        "worn_out": email_module.OutboundEmailStatus.FAILED,
+        "stale_otp": email_module.OutboundEmailStatus.EXPIRED,
+    }
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from instalive_live_app.users.utils.google_auth import GoogleTokenVerifier, GoogleAuthError
+from tests.google_stub import GoogleStub, CLIENT_ID
+
+
+def test_access_token_is_verified_once_then_cached():
+    stub = GoogleStub()
+    stub.add_access_token("good-token", "user@example.com")
+    verifier = GoogleTokenVerifier(client_ids=[CLIENT_ID], transport=stub.transport)
+
+    async def main():
+        first = await verifier.verify_access_token("good-token")
+        second = await verifier.verify_access_token("good-token")
+        with pytest.raises(GoogleAuthError):
+            await verifier.verify_access_token("bad-token")
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first["email"] == second["email"] == "user@example.com"
+    # One userinfo call for the good token (then cached), one for the bad one
+    assert len(stub.requests) == 2
+    assert all("access_token" not in str(r.url) for r in stub.requests)
+
+
+def test_id_tokens_are_verified_locally_with_cached_keys():
+    stub = GoogleStub()
+    verifier = GoogleTokenVerifier(client_ids=[CLIENT_ID], transport=stub.transport)
+
+    async def main():
+        claims = [await verifier.verify_id_token(stub.id_token(f"user{i}@example.com")) for i in range(3)]
+        with pytest.raises(GoogleAuthError):
+            await verifier.verify_id_token(stub.id_token("x@example.com", audience="someone-else"))
+        with pytest.raises(GoogleAuthError):
+            await verifier.verify_id_token(stub.id_token("x@example.com", email_verified=False))
+        return claims
+
+    claims = asyncio.run(main())
+    assert [c["email"] for c in claims] == [f"user{i}@example.com" for i in range(3)]
+    # Only the JWKS fetch went over the network
+    assert len(stub.requests) == 1
+
+
+def test_id_tokens_are_rejected_without_configured_client_ids():
+    stub = GoogleStub()
+    verifier = GoogleTokenVerifier(client_ids=[], transport=stub.transport)
+
+    with pytest.raises(GoogleAuthError):
+        asyncio.run(verifier.verify_id_token(stub.id_token("x@example.com", audience="any-other-app")))
+    assert stub.requests == []
@@ -0,0 +1,56 @@
+import asyncio
+from instalive_live_app.chating.utils.connection_manager import ConnectionManager
+from instalive_live_app.chating.utils.heartbeat import HeartbeatScheduler, DEAD_AFTER_SECONDS
+from instalive_live_app.chating.utils.wire import ClientConnection
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed = True
+
+
+def make_manager(n):
+    manager = ConnectionManager()
+    for i in range(n):
+        manager.active_connections[str(i)] = ClientConnection(str(i), FakeWebSocket())
+    return manager
+
+
+def test_pings_are_spread_over_the_interval():
+    manager = make_manager(90)
+    scheduler = HeartbeatScheduler(manager)
+
+    # 30 ticks per round -> 3 connections per tick
+    asyncio.run(scheduler.tick())
+    pinged = [c for c in manager.active_connections.values() if c.websocket.sent]
+    assert len(pinged) == 3
+
+
+def test_dead_connections_are_evicted():
+    manager = make_manager(2)
+    scheduler = HeartbeatScheduler(manager)
+    stale = manager.active_connections["0"]
+    stale.last_seen -= DEAD_AFTER_SECONDS + 1
+
+    asyncio.run(scheduler.tick())
+    asyncio.run(scheduler.tick())
+
+    assert "0" not in manager.active_connections
+    assert stale.websocket.closed
+    assert "1" in manager.active_connections
+
+
+def test_disconnect_keeps_newer_connection():
+    manager = make_manager(1)
+    old = manager.active_connections["0"]
+    manager.active_connections["0"] = ClientConnection("0", FakeWebSocket())
+
+    assert manager.disconnect("0", old) is False
+    assert "0" in manager.active_connections
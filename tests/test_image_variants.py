@@ -0,0 +1,30 @@
+import asyncio
+from PIL import Image
+from instalive_live_app.core.blob_store import local_path
+from instalive_live_app.core.image_variants import ImageVariantService, render_variants
+
+
+def test_only_local_uploads_are_processed():
+    assert local_path("/uploads/profiles/p1.png") == "uploads/profiles/p1.png"
+    assert local_path("https://cdn.example.com/p1.png") is None
+    assert local_path("/uploads/../etc/passwd") is None
+
+
+def test_existing_variants_are_found_on_disk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "chat_1_64.webp").write_bytes(b"x")
+    service = ImageVariantService(workers=1)
+    assert asyncio.run(service.existing("/uploads/chat_1.png")) == {"64": "/uploads/chat_1_64.webp"}
+
+
+def test_variants_are_downscaled_webp_without_upscaling(tmp_path):
+    source = tmp_path / "photo.png"
+    Image.new("RGB", (600, 300), "red").save(source)
+
+    variants = render_variants(str(source), (64, 256, 1024, 2048))
+    # 1024 is the first size >= 600 and keeps the original size; 2048 would be the same file again
+    assert sorted(variants, key=int) == ["64", "256", "1024"]
+    with Image.open(variants["64"]) as small, Image.open(variants["1024"]) as large:
+        assert small.format == "WEBP" and small.size == (64, 32)
+        assert large.size == (600, 300)
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+from instalive_live_app.streaming.utils import leaderboards as leaderboards_module
+from instalive_live_app.streaming.utils.leaderboards import Leaderboards, hosts_key, stream_key, supporters_key
+
+STREAM = uuid.uuid4()
+HOST, ALICE, BOB = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+AT = datetime(2026, 3, 4, 20, tzinfo=timezone.utc)
+
+
+class FakeRoomService:
+    def __init__(self):
+        self.sent = []
+
+    async def send_data(self, request):
+        self.sent.append(request)
+
+
+class FakeLiveKit:
+    def __init__(self):
+        self.room = FakeRoomService()
+
+
+def test_gifts_are_ranked_and_pushed_to_the_room(redis, use_redis, monkeypatch):
+    use_redis(leaderboards_module, redis)
+    livekit = FakeLiveKit()
+    monkeypatch.setattr(leaderboards_module, "get_livekit_api", lambda: livekit)
+
+    async def main():
+        boards = Leaderboards()
+        await boards.record_gift(STREAM, "live_room", ALICE, HOST, 50, at=AT)
+        await boards.record_gift(STREAM, "live_room", BOB, HOST, 80, at=AT)
+        await boards.record_gift(STREAM, "live_room", ALICE, HOST, 40, at=AT)
+        await boards.stop()
+        return (
+            await boards.top(stream_key(STREAM)),
+            await boards.top(hosts_key("week", AT)),
+            await boards.top(supporters_key(HOST), limit=1),
+        )
+
+    stream, hosts, supporters = asyncio.run(main())
+    assert stream == [(ALICE, 90), (BOB, 80)]
+    assert hosts == [(HOST, 170)]
+    assert supporters == [(ALICE, 90)]
+    # Every gift is pushed to the room with the stream's board as it was right after it
+    assert len(livekit.room.sent) == 3
+    last = livekit.room.sent[-1]
+    assert (last.room, last.topic) == ("live_room", "leaderboard")
+    payload = json.loads(last.data)
+    assert payload["sender_id"] == str(ALICE) and payload["sender_total"] == 90
+    assert payload["top"] == [{"user_id": str(ALICE), "coins": 90}, {"user_id": str(BOB), "coins": 80}]
+    if redis:
+        assert asyncio.run(redis.ttl(hosts_key("day", AT))) > 0
+        assert asyncio.run(redis.ttl(supporters_key(HOST))) == -1
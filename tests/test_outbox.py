@@ -0,0 +1,79 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timezone
+from bson import DBRef, json_util
+from instalive_live_app.notifications import outbox as outbox_module
+from instalive_live_app.notifications.models import NotificationModel
+from instalive_live_app.notifications.outbox import NotificationOutbox, JSON_OPTIONS
+
+USER = uuid.uuid4()
+
+
+def use(monkeypatch, collection):
+    async def nothing(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(outbox_module.unread_counter, "incr_many", nothing)
+    monkeypatch.setattr(outbox_module, "push_notifications", nothing)
+    return collection(model=NotificationModel)
+
+
+def batches(notifications) -> list:
+    return [[doc["_id"] for doc in batch] for batch in notifications.inserted]
+
+
+def notification() -> dict:
+    return {"_id": uuid.uuid4(), "user": DBRef("users", USER), "title": "Hi", "body": "",
+            "created_at": datetime.now(timezone.utc)}
+
+
+def test_notifications_queued_together_are_written_in_one_batch(monkeypatch, collection):
+    notifications = use(monkeypatch, collection)
+
+    async def main():
+        box = NotificationOutbox(spill_path=None)
+        await box.start()
+        docs = [notification() for _ in range(3)]
+        for doc in docs:
+            box._queue.put_nowait(doc)
+        await asyncio.sleep(outbox_module.OUTBOX_FLUSH_INTERVAL_SECONDS * 4)
+        await box.stop()
+        return docs
+
+    docs = asyncio.run(main())
+    assert batches(notifications) == [[doc["_id"] for doc in docs]]
+
+
+def test_stop_while_a_batch_is_filling_still_persists_it(monkeypatch, collection, tmp_path):
+    notifications = use(monkeypatch, collection)
+    monkeypatch.setattr(outbox_module, "OUTBOX_FLUSH_INTERVAL_SECONDS", 60)
+    spill = str(tmp_path / "spill")
+
+    async def main():
+        box = NotificationOutbox(spill_path=spill)
+        await box.start()
+        doc = notification()
+        box._spill(doc)
+        box._queue.put_nowait(doc)
+        # The worker has taken it off the queue and is waiting for the batch to fill
+        await asyncio.sleep(0.01)
+        assert box._queue.empty()
+        await box.stop()
+        return doc
+
+    doc = asyncio.run(main())
+    assert batches(notifications) == [[doc["_id"]]]
+    assert not os.listdir(tmp_path)
+
+
+def test_spill_files_of_dead_workers_are_replayed(monkeypatch, collection, tmp_path):
+    notifications = use(monkeypatch, collection)
+    docs = [notification() for _ in range(2)]
+    # No process has this pid
+    dead = tmp_path / "spill.999999999"
+    dead.write_text("".join(json_util.dumps(doc, json_options=JSON_OPTIONS) + "\n" for doc in docs))
+
+    asyncio.run(NotificationOutbox(spill_path=str(tmp_path / "spill")).replay_spill())
+    assert batches(notifications) == [[doc["_id"] for doc in docs]]
+    assert not dead.exists()
@@ -0,0 +1,33 @@
+import asyncio
+from instalive_live_app.chating.utils import presence as presence_module
+from instalive_live_app.chating.utils.presence import PresenceService
+
+
+def test_only_unexpired_heartbeats_count_as_online(redis, use_redis, monkeypatch):
+    use_redis(presence_module, redis)
+    service = PresenceService()
+
+    async def main():
+        # A connection that stopped sending heartbeats
+        monkeypatch.setattr(presence_module, "PRESENCE_TTL_SECONDS", -1)
+        await service.touch(["ghost"])
+        monkeypatch.setattr(presence_module, "PRESENCE_TTL_SECONDS", 90)
+        await service.touch(["alice", "bob", "carol"])
+        await service.remove("carol")
+        seen = (
+            await service.filter_online(["dave", "carol", "bob", "ghost", "alice"]),
+            sorted(await service.online_ids()),
+            await service.is_online("ghost"),
+        )
+        await service.sweep()
+        return seen
+
+    online, page, ghost = asyncio.run(main())
+    # In the order asked for
+    assert online == ["bob", "alice"]
+    assert page == ["alice", "bob"]
+    assert not ghost
+    if redis:
+        assert sorted(asyncio.run(redis.zrange(presence_module.ONLINE_KEY, 0, -1))) == ["alice", "bob"]
+    else:
+        assert sorted(service._local) == ["alice", "bob"]
@@ -0,0 +1,55 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from bson import DBRef
+from instalive_live_app.notifications.models import NotificationModel
+from instalive_live_app.notifications.push import NOTIFICATIONS_EVENT, acknowledge, deliver_pending
+
+USER, OTHER = uuid.uuid4(), uuid.uuid4()
+NOW = datetime.now(timezone.utc)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+def notification(user=USER, age=0, **fields) -> dict:
+    return {"_id": uuid.uuid4(), "user": DBRef("users", user), "type": "SOCIAL", "title": "Hi", "body": "",
+            "is_read": False, "delivered_at": None, "created_at": NOW - timedelta(seconds=age), **fields}
+
+
+def delivered(connection: FakeConnection) -> list:
+    (frame,) = connection.sent
+    assert frame["type"] == NOTIFICATIONS_EVENT
+    return [item["id"] for item in frame["items"]]
+
+
+def test_unacknowledged_notifications_are_sent_again_until_acked(collection):
+    older, newer = notification(age=60), notification()
+    read = notification(is_read=True)
+    collection([older, newer, read, notification(user=OTHER)], model=NotificationModel)
+
+    async def connect() -> FakeConnection:
+        connection = FakeConnection()
+        await deliver_pending(USER, connection)
+        return connection
+
+    async def main():
+        first = await connect()
+        # Dropped before acknowledging: the next connection gets them again
+        second = await connect()
+        # Another user's ids and garbage are ignored
+        await acknowledge(USER, [str(newer["_id"]), "not-a-uuid"])
+        await acknowledge(OTHER, [str(older["_id"])])
+        third = await connect()
+        await acknowledge(USER, [str(older["_id"])])
+        return first, second, third, await connect()
+
+    first, second, third, fourth = asyncio.run(main())
+    assert delivered(first) == delivered(second) == [str(newer["_id"]), str(older["_id"])]
+    assert delivered(third) == [str(older["_id"])]
+    assert fourth.sent == []
@@ -0,0 +1,71 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from livekit import api
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.streaming.utils import reconciler as reconciler_module
+from instalive_live_app.streaming.utils.reconciler import StreamReconciler
+
+NOW = datetime(2026, 3, 4, 20, tzinfo=timezone.utc)
+
+
+class StubLiveKit:
+    """Stands in for the LiveKit server API: list_rooms answers with a fixed set of rooms."""
+
+    def __init__(self, rooms):
+        self.calls = 0
+        self.room = SimpleNamespace(list_rooms=self.list_rooms)
+        self.rooms = rooms
+
+    async def list_rooms(self, request):
+        self.calls += 1
+        return api.ListRoomsResponse(rooms=self.rooms)
+
+
+def stream(room, status="live", age=3600, end_reason=None):
+    return {"_id": uuid.uuid4(), "channel_name": room, "status": status, "end_reason": end_reason,
+            "created_at": (NOW - timedelta(seconds=age)).replace(tzinfo=None),
+            "end_time": NOW - timedelta(minutes=10) if end_reason else None}
+
+
+def test_orphaned_streams_are_ended_and_returning_rooms_resumed(monkeypatch, use_redis, collection):
+    streams = collection([
+        stream("live_a_1"),
+        stream("live_ghost_1"),
+        stream("live_new_1", age=30),
+        stream("live_back_1", status="ended", end_reason="room_finished"),
+        stream("live_stopped_1", status="ended", end_reason="stopped"),
+    ], model=LiveStreamModel)
+    livekit = StubLiveKit([
+        api.Room(name="live_a_1", num_publishers=1),
+        api.Room(name="live_back_1", num_publishers=1),
+        api.Room(name="live_stopped_1", num_publishers=1),
+    ])
+    use_redis(reconciler_module, None)
+    monkeypatch.setattr(reconciler_module, "get_livekit_api", lambda: livekit)
+
+    report = asyncio.run(StreamReconciler().run(now=NOW))
+
+    assert (livekit.calls, len(streams.queries)) == (1, 1)
+    assert (report.rooms, report.live_streams, report.orphaned, report.resumed) == (3, 3, 1, 1)
+    assert report.orphaned_rooms == ["live_ghost_1"] and report.resumed_rooms == ["live_back_1"]
+    status = {doc["channel_name"]: doc["status"] for doc in streams.docs}
+    # Too new to have a room yet, and deliberately stopped, are left alone
+    assert status == {"live_a_1": "live", "live_ghost_1": "ended", "live_new_1": "live",
+                      "live_back_1": "live", "live_stopped_1": "ended"}
+    ghost = next(doc for doc in streams.docs if doc["channel_name"] == "live_ghost_1")
+    assert (ghost["end_time"], ghost["end_reason"]) == (NOW, "orphaned")
+
+
+def test_reports_and_drift_totals_are_shared_through_redis(monkeypatch, fake_redis, use_redis, collection):
+    collection([stream("live_ghost_1")], model=LiveStreamModel)
+    use_redis(reconciler_module, fake_redis)
+    monkeypatch.setattr(reconciler_module, "get_livekit_api", lambda: StubLiveKit([]))
+
+    asyncio.run(StreamReconciler().run(now=NOW))
+    asyncio.run(StreamReconciler().run(now=NOW))
+    # Another worker, which never ran it
+    status = asyncio.run(StreamReconciler().status())
+    assert status["last_report"].orphaned == 0
+    assert status["totals"] == {"runs": 2, "orphaned": 1, "resumed": 0}
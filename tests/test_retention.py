@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from instalive_live_app.core import retention as retention_module
+from instalive_live_app.core.retention import RetentionManager, RetentionPolicy
+
+NOW = datetime.now(timezone.utc)
+
+
+class FakeDb(dict):
+    def __init__(self, collection):
+        super().__init__()
+        self.collection = collection
+
+    def __missing__(self, name):
+        self[name] = self.collection()
+        return self[name]
+
+    async def command(self, command):
+        index = command["index"]
+        for info in self[command["collMod"]].indexes.values():
+            if dict(info["key"]) == index["keyPattern"]:
+                info["expireAfterSeconds"] = index["expireAfterSeconds"]
+
+
+def manager(monkeypatch, db, policies) -> RetentionManager:
+    monkeypatch.setattr(RetentionManager, "db", property(lambda self: db))
+    monkeypatch.setattr(retention_module, "RETENTION_BATCH_SIZE", 2)
+    monkeypatch.setattr(retention_module, "RETENTION_BATCH_PAUSE_SECONDS", 0)
+    return RetentionManager(policies)
+
+
+def test_ttl_indexes_are_filtered_and_other_index_types_left_alone(monkeypatch, collection):
+    db = FakeDb(collection)
+    db["events"] = collection(indexes={
+        "search": {"key": [("_fts", "text"), ("_ftsx", 1)]},
+        "shard": {"key": [("user", "hashed")]},
+        # An unfiltered TTL index from an earlier policy
+        "retention_processed_at": {"key": [("processed_at", 1)], "expireAfterSeconds": 60},
+    })
+    policy = RetentionPolicy(collection="events", time_field="processed_at", max_age_days=30, only={"status": "done"})
+    asyncio.run(manager(monkeypatch, db, [policy]).ensure_indexes())
+
+    indexes = db["events"].indexes
+    assert indexes["retention_processed_at"] == {
+        "key": [("processed_at", 1)], "expireAfterSeconds": 30 * 86400, "partialFilterExpression": {"status": "done"},
+    }
+    assert {"search", "shard"} <= set(indexes)
+
+
+def test_expired_documents_are_archived_in_batches_then_deleted(monkeypatch, collection):
+    old, new = NOW - timedelta(days=100), NOW - timedelta(days=1)
+    db = FakeDb(collection)
+    db["live_comments"] = collection(
+        [{"_id": i, "created_at": old} for i in range(5)] + [{"_id": 5, "created_at": new}]
+    )
+    policy = RetentionPolicy(collection="live_comments", time_field="created_at", max_age_days=90, mode="archive")
+    report = asyncio.run(manager(monkeypatch, db, [policy]).run())
+
+    (comments,) = report.collections
+    assert (comments.archived, comments.deleted, comments.pending, comments.error) == (5, 5, 0, None)
+    assert [doc["_id"] for doc in db["live_comments"].docs] == [5]
+    assert sorted(doc["_id"] for doc in db["live_comments_archive"].docs) == [0, 1, 2, 3, 4]
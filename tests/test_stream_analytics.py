@@ -0,0 +1,46 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from instalive_live_app.streaming.models.analytics import StreamAnalyticsBucketModel
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.streaming.utils.stream_analytics import AnalyticsRecorder, downsample
+
+SESSION = uuid.uuid4()
+HOUR = datetime(2026, 3, 1, 20, tzinfo=timezone.utc)
+
+
+def test_events_are_folded_into_one_upsert_per_stream_hour(collection):
+    buckets = collection(model=StreamAnalyticsBucketModel)
+    collection([{"_id": SESSION, "channel_name": "live_room"}], model=LiveStreamModel)
+    recorder = AnalyticsRecorder()
+    for _ in range(3):
+        recorder.record(SESSION, "likes", at=HOUR + timedelta(minutes=5, seconds=10))
+    recorder.record(str(SESSION), "coins", 50, at=HOUR + timedelta(minutes=7))
+    recorder.gauge_room("live_room", "viewers", 12, at=HOUR + timedelta(minutes=5))
+    recorder.gauge_room("live_room", "viewers", 9, at=HOUR + timedelta(minutes=5, seconds=30))
+
+    assert asyncio.run(recorder.flush()) == 1
+    ((query, update),), = buckets.bulk_writes
+    assert query == {"session_id": SESSION, "hour": HOUR}
+    assert update["$inc"] == {"minutes.5.likes": 3, "totals.likes": 3, "minutes.7.coins": 50, "totals.coins": 50}
+    assert update["$max"] == {"minutes.5.viewers": 12, "totals.viewers": 12}
+    # Nothing new, nothing written
+    assert asyncio.run(recorder.flush()) == 0
+
+
+def test_ranges_are_downsampled_with_viewers_carried_forward():
+    docs = [{
+        "hour": HOUR.replace(tzinfo=None),
+        "minutes": {
+            "0": {"viewers": 4, "joins": 4},
+            "2": {"likes": 5},
+            "6": {"viewers": 10, "joins": 6, "paid": 2},
+            "12": {"viewers": 3},
+        },
+    }]
+    points = downsample(docs, HOUR, HOUR + timedelta(minutes=15), 300)
+    assert [p["t"] for p in points] == [HOUR + timedelta(minutes=m) for m in (0, 5, 10)]
+    assert [p["joins"] for p in points] == [4, 6, 0]
+    assert [p["likes"] for p in points] == [5, 0, 0]
+    # Highest count in each window, including the one carried in from before the window
+    assert [p["viewers"] for p in points] == [4, 10, 10]
@@ -0,0 +1,16 @@
+import re
+from instalive_live_app.streaming.utils.stream_search import text_pipeline, substring_pipeline, SEARCH_MAX_LIMIT
+
+
+def test_substring_fallback_matches_user_input_literally():
+    match = substring_pipeline("a.*(b+)+$", skip=0, limit=20)[0]["$match"]
+    pattern = match["$or"][0]["title"]["$regex"]
+    assert match["status"] == "live"
+    assert re.search(pattern, "title with a.*(b+)+$ in it")
+    assert not re.search(pattern, "abbbb")
+
+
+def test_text_search_is_limited_to_live_streams_and_paginated():
+    pipeline = text_pipeline("gaming", skip=40, limit=SEARCH_MAX_LIMIT)
+    assert pipeline[0]["$match"] == {"status": "live", "$text": {"$search": "gaming"}}
+    assert {"$skip": 40} in pipeline and {"$limit": SEARCH_MAX_LIMIT} in pipeline
@@ -0,0 +1,116 @@
+import json
+import time
+import uuid
+import asyncio
+import hmac
+import hashlib
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from types import SimpleNamespace
+from pymongo.errors import DuplicateKeyError
+from instalive_live_app.finance.routers import stripe_routers
+from instalive_live_app.finance.utils import stripe_events
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+def signed(event: dict):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return payload, {"stripe-signature": f"t={timestamp},v1={signature}", "content-type": "application/json"}
+
+
+def test_webhook_records_each_event_once_and_wakes_the_worker(monkeypatch):
+    recorded, wakeups = {}, []
+
+    async def fake_record_event(event_id, event_type, payload):
+        if event_id in recorded:
+            return False
+        recorded[event_id] = (event_type, payload)
+        return True
+
+    monkeypatch.setattr(stripe_routers, "STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET)
+    monkeypatch.setattr(stripe_routers, "record_event", fake_record_event)
+    monkeypatch.setattr(stripe_routers.stripe_event_worker, "notify", lambda: wakeups.append(1))
+
+    app = FastAPI()
+    app.include_router(stripe_routers.router)
+    client = TestClient(app)
+
+    payment_intent = {"id": "pi_1", "object": "payment_intent", "status": "succeeded",
+                      "amount": 500, "metadata": {"user_id": "u1", "tokens": "50"}}
+    payload, headers = signed({"id": "evt_1", "object": "event", "type": "payment_intent.succeeded",
+                               "data": {"object": payment_intent}})
+
+    assert client.post("/finance/stripe/webhook", content=payload, headers=headers).json() == {"status": "accepted"}
+    # Stripe redelivers the same event
+    assert client.post("/finance/stripe/webhook", content=payload, headers=headers).json() == {"status": "already_processed"}
+    assert recorded["evt_1"] == ("payment_intent.succeeded", payment_intent)
+    assert len(wakeups) == 1
+
+    # Events we don't act on are recorded for deduplication only, without their object
+    payload, ignored_headers = signed({"id": "evt_2", "object": "event", "type": "customer.created",
+                                       "data": {"object": {"id": "cus_1", "object": "customer"}}})
+    assert client.post("/finance/stripe/webhook", content=payload, headers=ignored_headers).status_code == 200
+    assert recorded["evt_2"] == ("customer.created", None)
+
+    headers["stripe-signature"] = "t=1,v1=deadbeef"
+    assert client.post("/finance/stripe/webhook", content=payload, headers=headers).status_code == 400
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update):
+        doc = self.docs.setdefault(query["_id"], {"coins": 0, "applied_stripe_events": []})
+        if event_id := query.get("applied_stripe_events", {}).get("$ne"):
+            if event_id in doc["applied_stripe_events"]:
+                return
+            doc["applied_stripe_events"] = (doc["applied_stripe_events"] + [event_id])[-stripe_events.APPLIED_EVENTS_KEPT:]
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] += amount
+        doc.update(update.get("$set", {}))
+
+
+def test_replayed_events_are_credited_once_even_after_the_marker_is_gone(monkeypatch):
+    users, transactions = FakeCollection(), FakeCollection()
+    user = SimpleNamespace(id=uuid.uuid4(), email="user@example.com")
+
+    class FakeTransaction(SimpleNamespace):
+        get_motor_collection = staticmethod(lambda: transactions)
+
+        async def insert(self):
+            if self.id in transactions.docs:
+                raise DuplicateKeyError("duplicate")
+            transactions.docs[self.id] = {"applied": self.applied}
+
+    async def get_user(user_id):
+        return user
+
+    async def notify(**kwargs):
+        pass
+
+    monkeypatch.setattr(stripe_events.UserModel, "get", get_user)
+    monkeypatch.setattr(stripe_events.UserModel, "get_motor_collection", classmethod(lambda cls: users))
+    monkeypatch.setattr(stripe_events, "TransactionModel", FakeTransaction)
+    monkeypatch.setattr(stripe_events, "send_notification", notify)
+
+    payment_intent = {"id": "pi_1", "status": "succeeded", "amount": 500,
+                      "metadata": {"user_id": str(user.id), "tokens": "50"}}
+    asyncio.run(stripe_events.credit_payment_intent("evt_1", payment_intent))
+    # Later events push evt_1 out of the user's marker window
+    users.docs[user.id]["applied_stripe_events"] = []
+    asyncio.run(stripe_events.credit_payment_intent("evt_1", payment_intent))
+    assert users.docs[user.id]["coins"] == 50
+
+    # An attempt that stopped after recording the top-up is finished by the retry
+    interrupted = uuid.uuid5(stripe_events._NAMESPACE, "evt_2")
+    transactions.docs[interrupted] = {"applied": False}
+    asyncio.run(stripe_events.credit_payment_intent("evt_2", payment_intent))
+    assert users.docs[user.id]["coins"] == 100
+    assert transactions.docs[interrupted]["applied"] is True
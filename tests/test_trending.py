@@ -0,0 +1,62 @@
+import asyncio
+import time
+import uuid
+import pytest
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.streaming.utils import trending as trending_module
+from instalive_live_app.streaming.utils.trending import TrendingRanker
+
+MUSIC, GAMING, ENDED = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+
+def ranker(redis, use_redis, collection) -> TrendingRanker:
+    use_redis(trending_module, redis)
+    collection([
+        {"_id": MUSIC, "status": "live", "category": "Music", "current_viewers": 0},
+        {"_id": GAMING, "status": "live", "category": "Gaming", "current_viewers": 40},
+    ], model=LiveStreamModel)
+    return TrendingRanker(weights=dict(trending_module.DEFAULT_WEIGHTS))
+
+
+def test_streams_are_ranked_by_decayed_events_and_audience(redis, use_redis, collection):
+    trending = ranker(redis, use_redis, collection)
+
+    async def main():
+        for _ in range(5):
+            await trending.bump(MUSIC, "Music", "join")
+        await trending.bump(GAMING, "Gaming", "like")
+        await trending.bump(ENDED, "Music", "coins", 10_000)
+        # Events count right away
+        before_tick = await trending.top_ids(limit=3)
+        await trending.tick()
+        return before_tick, await trending.top_ids(limit=3), await trending.top_ids("music")
+
+    before_tick, after_tick, music = asyncio.run(main())
+    assert before_tick == [ENDED, MUSIC, GAMING]
+    # The tick drops ended streams and adds the audience: log1p(40) * 3 beats five joins
+    assert after_tick == [GAMING, MUSIC]
+    assert music == [MUSIC]
+    if redis:
+        assert asyncio.run(redis.zscore(trending_module.EVENTS_KEY, str(ENDED))) is None
+
+
+def test_a_bump_long_after_the_last_tick_rescales_instead_of_overflowing(fake_redis, use_redis, collection):
+    trending = ranker(fake_redis, use_redis, collection)
+    month_ago = time.time() - 30 * 86400
+
+    async def main():
+        await fake_redis.set(trending_module.EPOCH_KEY, str(month_ago))
+        await fake_redis.zadd(trending_module.EVENTS_KEY, {str(ENDED): 1000.0})
+        await trending.bump(MUSIC, "Music", "join")
+        return await fake_redis.zrange(trending_module.EVENTS_KEY, 0, -1, withscores=True)
+
+    events = dict(asyncio.run(main()))
+    assert events[str(MUSIC)] == pytest.approx(1.0, rel=1e-3)
+    assert events[str(ENDED)] == 0
+    assert float(asyncio.run(fake_redis.get(trending_module.EPOCH_KEY))) > month_ago
+
+    trending.local.epoch = month_ago
+    trending.local.scores = {str(ENDED): 1000.0}
+    trending.local.bump(str(MUSIC), "Music", 1.0)
+    assert trending.local.top(None, 2) == [str(MUSIC), str(ENDED)]
+    assert trending.local.events[str(MUSIC)] == pytest.approx(1.0, rel=1e-3)
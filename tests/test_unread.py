@@ -0,0 +1,56 @@
+import asyncio
+import uuid
+from instalive_live_app.notifications import unread as unread_module
+from instalive_live_app.notifications.unread import UnreadCounter
+
+ALICE, BOB = uuid.uuid4(), uuid.uuid4()
+
+
+def counter(monkeypatch, use_redis, redis, unread, recounts) -> UnreadCounter:
+    """A counter over `unread`, the number of unread notifications per user in Mongo."""
+    async def count(self, user_id):
+        recounts.append(user_id)
+        return unread[user_id]
+    use_redis(unread_module, redis)
+    monkeypatch.setattr(UnreadCounter, "_count", count)
+    return UnreadCounter()
+
+
+def test_counts_come_from_mongo_without_redis(monkeypatch, use_redis):
+    unread, recounts = {ALICE: 3}, []
+    unread_counter = counter(monkeypatch, use_redis, None, unread, recounts)
+
+    async def main():
+        await unread_counter.incr_many({ALICE: 1})
+        first = await unread_counter.get(ALICE)
+        unread[ALICE] = 0
+        return first, await unread_counter.get(ALICE)
+
+    assert asyncio.run(main()) == (3, 0)
+    assert recounts == [ALICE, ALICE]
+
+
+def test_cached_counts_follow_writes_and_recount_once_dropped(monkeypatch, use_redis, fake_redis):
+    unread, recounts = {ALICE: 3, BOB: 5}, []
+    unread_counter = counter(monkeypatch, use_redis, fake_redis, unread, recounts)
+
+    async def main():
+        # Not cached yet: the increment is skipped rather than starting from zero
+        await unread_counter.incr_many({ALICE: 2, BOB: 1})
+        seen = [await unread_counter.get(ALICE)]
+        await unread_counter.incr_many({ALICE: 2})
+        seen.append(await unread_counter.get(ALICE))
+        for _ in range(6):
+            await unread_counter.decr(ALICE)
+        # Never below zero
+        seen.append(await unread_counter.get(ALICE))
+        await unread_counter.reset(BOB)
+        seen.append(await unread_counter.get(BOB))
+        unread[ALICE] = 7
+        await unread_counter.invalidate([ALICE])
+        seen.append(await unread_counter.get(ALICE))
+        return seen
+
+    assert asyncio.run(main()) == [3, 5, 0, 0, 7]
+    # Alice on her first read and after the invalidation; Bob was reset, not counted
+    assert recounts == [ALICE, ALICE]
@@ -0,0 +1,73 @@
+import io
+import os
+import asyncio
+import hashlib
+import pytest
+from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from instalive_live_app.core.models import BlobModel
+from instalive_live_app.core.uploads import save_upload, UploadSizeLimitMiddleware
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+def upload(data: bytes, filename: str = "photo.png") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+class FakeBlobs:
+    def __init__(self):
+        self.refcounts = {}
+
+    async def update_one(self, query, update, upsert=False):
+        sha = query["sha256"]
+        self.refcounts[sha] = self.refcounts.get(sha, 0) + update["$inc"]["refcount"]
+
+
+@pytest.fixture
+def blobs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fake = FakeBlobs()
+    monkeypatch.setattr(BlobModel, "get_motor_collection", classmethod(lambda cls: fake))
+    return fake
+
+
+def test_upload_is_stored_once_under_its_hash_and_sniffed_type(tmp_path, blobs):
+    sha = hashlib.sha256(PNG).hexdigest()
+    url = asyncio.run(save_upload(upload(PNG, "evil.html")))
+    assert url == f"/blobs/{sha}.png"
+    assert (tmp_path / "blobs" / sha[:2] / sha[2:4] / f"{sha}.png").read_bytes() == PNG
+
+    # The same bytes again are another reference to the same file
+    assert asyncio.run(save_upload(upload(PNG, "copy.png"))) == url
+    assert blobs.refcounts == {sha: 2}
+    assert os.listdir(tmp_path / "blobs" / "tmp") == []
+
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(save_upload(upload(b"<html></html>", "photo.png")))
+    assert rejected.value.status_code == 400
+
+
+def test_oversized_upload_is_aborted_without_leaving_files(tmp_path, blobs):
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(save_upload(upload(PNG + b"\x00" * 300_000), max_bytes=200_000))
+    assert rejected.value.status_code == 413
+    assert os.listdir(tmp_path / "blobs" / "tmp") == []
+    assert blobs.refcounts == {}
+
+
+def test_declared_oversized_body_is_rejected_before_the_endpoint(monkeypatch):
+    app = FastAPI()
+    reached = []
+
+    @app.post("/upload")
+    async def endpoint():
+        reached.append(True)
+        return {}
+
+    app.add_middleware(UploadSizeLimitMiddleware, routes={"/upload": 1024})
+    client = TestClient(app)
+    response = client.post("/upload", content=b"x" * 200_000)
+    assert response.status_code == 413
+    assert not reached
+    assert client.post("/upload", content=b"x" * 10).status_code == 200
@@ -0,0 +1,35 @@
+from instalive_live_app.users.models.user_models import UserModel
+from instalive_live_app.users.utils.search_prefixes import user_search_prefixes, query_prefixes
+from instalive_live_app.users.utils.user_search import prefix_filter, TypeaheadCache
+
+
+def test_prefixes_cover_names_and_email_local_part():
+    prefixes = user_search_prefixes("Zoë", "Van-Dyke", "zoe.vd99@example.com")
+    for expected in ("z", "zo", "zoe", "van", "dyke", "vd99"):
+        assert expected in prefixes
+    # The email domain would make everyone on gmail match "gmail"
+    assert "example" not in prefixes and "com" not in prefixes
+
+
+def test_queries_match_every_word_by_prefix():
+    assert query_prefixes("  ZOË  van ") == ["zoe", "van"]
+    assert prefix_filter("zo") == {"search_prefixes": "zo"}
+    assert prefix_filter("zoe van") == {"search_prefixes": {"$all": ["zoe", "van"]}}
+    assert prefix_filter("zoe.vd99@example.com") == {"search_prefixes": {"$all": ["zoe", "vd99"]}}
+    assert prefix_filter(".*") is None
+
+
+def test_prefixes_follow_the_model_on_save():
+    user = UserModel.model_construct(first_name="Ana", last_name=None, email="ana@example.com")
+    user.update_search_prefixes()
+    assert user.search_prefixes == ["a", "an", "ana"]
+
+
+def test_typeahead_cache_evicts_least_recently_used():
+    cache = TypeaheadCache(size=2, ttl=60)
+    cache.put(("a", 10), [{"id": 1}])
+    cache.put(("b", 10), [{"id": 2}])
+    cache.get(("a", 10))
+    cache.put(("c", 10), [{"id": 3}])
+    assert cache.get(("b", 10)) is None
+    assert cache.get(("a", 10)) == [{"id": 1}]
@@ -0,0 +1,34 @@
+import asyncio
+from instalive_live_app.streaming.models.streaming import LiveStreamModel
+from instalive_live_app.streaming.utils import viewer_tracker as tracker_module
+from instalive_live_app.streaming.utils.viewer_tracker import ViewerTracker
+
+ROOM = "live_3f2b8a0e-0000-4000-8000-000000000001_1700000000"
+HOST = "3f2b8a0e-0000-4000-8000-000000000001"
+
+
+async def session(tracker: ViewerTracker):
+    await tracker.joined(ROOM, HOST)
+    for identity in ["a", "b", "c"]:
+        await tracker.joined(ROOM, identity)
+    await tracker.left(ROOM, "a")
+    await tracker.left(ROOM, "b")
+    await tracker.joined(ROOM, "a")
+    flushed = await tracker.flush()
+    # Nothing changed since, so nothing is written
+    return flushed, await tracker.flush()
+
+
+def test_counts_are_flushed_once_per_change(redis, use_redis, collection):
+    use_redis(tracker_module, redis)
+    streams = collection(model=LiveStreamModel)
+    tracker = ViewerTracker()
+    assert asyncio.run(session(tracker)) == (1, 0)
+    assert streams.bulk_writes == [[(
+        {"channel_name": ROOM},
+        {"$set": {"current_viewers": 2}, "$max": {"peak_viewers": 3, "unique_viewers": 3}},
+    )]]
+
+    assert asyncio.run(tracker.finish(ROOM)) == (2, 3, 3)
+    if redis:
+        assert asyncio.run(redis.keys("live:*")) == []
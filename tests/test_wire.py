@@ -0,0 +1,41 @@
+import msgpack
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from instalive_live_app.chating.utils.wire import ClientConnection, OutboundFrame, decode_frame, negotiate_encoding
+
+
+def echo_client() -> TestClient:
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def echo(websocket: WebSocket):
+        encoding, subprotocol = negotiate_encoding(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        frame = decode_frame(await websocket.receive())
+        await ClientConnection("alice", websocket, encoding).send_json({"echo": frame, "encoding": encoding})
+        await websocket.close()
+
+    return TestClient(app)
+
+
+def test_clients_get_frames_in_the_encoding_they_negotiated():
+    client = echo_client()
+    with client.websocket_connect("/ws") as ws:
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"echo": {"type": "ping"}, "encoding": "json"}
+
+    with client.websocket_connect("/ws?encoding=msgpack") as ws:
+        # Either encoding is accepted from the client, whatever it negotiated
+        ws.send_json({"type": "ping"})
+        assert msgpack.unpackb(ws.receive_bytes()) == {"echo": {"type": "ping"}, "encoding": "msgpack"}
+
+    with client.websocket_connect("/ws", subprotocols=["other", "instalive.msgpack"]) as ws:
+        assert ws.accepted_subprotocol == "instalive.msgpack"
+        ws.send_bytes(msgpack.packb({"type": "pong", "data": b"\x00"}))
+        assert msgpack.unpackb(ws.receive_bytes()) == {"echo": {"type": "pong", "data": b"\x00"}, "encoding": "msgpack"}
+
+
+def test_a_frame_is_encoded_once_per_format_for_all_recipients():
+    frame = OutboundFrame(text='{"type": "message", "id": 1}')
+    assert frame.binary is frame.binary
+    assert msgpack.unpackb(frame.binary) == frame.payload == {"type": "message", "id": 1}